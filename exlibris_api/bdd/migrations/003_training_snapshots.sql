@@ -0,0 +1,15 @@
+-- Marqueurs de modification pour les snapshots d'entraînement incrémentaux
+-- (services/training_snapshot.py) : seules les lignes insérées ou modifiées
+-- depuis le snapshot précédent sont relues.
+
+ALTER TABLE Evaluation
+    ADD COLUMN date_derniere_maj DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY ix_evaluation_date_derniere_maj (date_derniere_maj);
+
+ALTER TABLE Livre
+    ADD COLUMN date_derniere_maj DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY ix_livre_date_derniere_maj (date_derniere_maj);
+
+ALTER TABLE Utilisateur
+    ADD COLUMN date_derniere_maj DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    ADD KEY ix_utilisateur_date_derniere_maj (date_derniere_maj);
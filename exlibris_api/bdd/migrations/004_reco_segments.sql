@@ -0,0 +1,15 @@
+-- Recommandations précalculées par segment démographique (tranche d'âge, pays)
+-- pour les utilisateurs sans historique : scripts/precompute_reco_segments.py
+-- les remplit, /me/recommendations les lit au lieu de scorer 500 candidats.
+
+CREATE TABLE IF NOT EXISTS RecommandationSegment (
+    version_modele VARCHAR(64) NOT NULL,
+    tranche_age VARCHAR(16) NOT NULL,
+    pays VARCHAR(100) NOT NULL,
+    rang SMALLINT NOT NULL,
+    livre_isbn VARCHAR(13) NOT NULL,
+    score FLOAT NOT NULL,
+    date_calcul DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    PRIMARY KEY (version_modele, tranche_age, pays, rang)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
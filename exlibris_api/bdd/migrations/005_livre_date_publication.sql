@@ -0,0 +1,5 @@
+-- Livres sans date de publication retrouvés par index (IS NULL) au lieu
+-- d'un parcours complet de Livre : scripts/backfill_publication_dates.py.
+
+ALTER TABLE Livre
+    ADD KEY ix_livre_date_publication (date_publication);
@@ -52,4 +52,43 @@ SMTP_PASSWORD: str = _get_env("SMTP_PASSWORD", "")
 SMTP_USE_TLS: bool = _get_env("SMTP_USE_TLS", "true").lower() == "true"
 
 MAIL_FROM: str = _get_env("MAIL_FROM", "no-reply@exlibris.local")
-MAIL_ENABLED: bool = _get_env("MAIL_ENABLED", "false").lower() == "true"
\ No newline at end of file
+MAIL_ENABLED: bool = _get_env("MAIL_ENABLED", "false").lower() == "true"
+
+# répertoire des artefacts ML (vide = exlibris_api/ml)
+ML_DIR: str = _get_env("ML_DIR", "")
+# eager = modèles chargés au démarrage (bloquant) ; background = chargés par
+# une tâche de fond après le démarrage ; lazy = au premier appel d'un endpoint ML
+ML_LOAD_MODE: str = _get_env("ML_LOAD_MODE", "eager").lower()
+
+# sert reco_scorer.npz (NumPy) au lieu du pipeline sklearn quand il existe
+ML_COMPILED_SCORER: bool = _get_env("ML_COMPILED_SCORER", "true").lower() == "true"
+
+RECO_CANDIDATES_LIMIT: int = int(_get_env("RECO_CANDIDATES_LIMIT", "500"))
+RECO_HYBRID_CONTENT_WEIGHT: float = float(_get_env("RECO_HYBRID_CONTENT_WEIGHT", "0.5"))
+
+# N = pool de N process dédiés (défaut 1 : predict_proba / TF-IDF hors du GIL
+# du process API) ; 0 = inférence dans le process API (threadpool), pour le dev
+ML_INFERENCE_WORKERS: int = int(_get_env("ML_INFERENCE_WORKERS", "1"))
+ML_INFERENCE_MAX_IN_FLIGHT: int = int(_get_env("ML_INFERENCE_MAX_IN_FLIGHT", "0"))
+ML_INFERENCE_MAX_QUEUE: int = int(_get_env("ML_INFERENCE_MAX_QUEUE", "256"))
+
+# micro-batching des /me/recommendations concurrents (0 ms = désactivé)
+ML_BATCH_MAX_WAIT_MS: float = float(_get_env("ML_BATCH_MAX_WAIT_MS", "2"))
+ML_BATCH_MAX_ROWS: int = int(_get_env("ML_BATCH_MAX_ROWS", "4096"))
+
+# cache des /me/recommendations par utilisateur (TTL 0 = désactivé)
+RECO_CACHE_TTL_SECONDS: float = float(_get_env("RECO_CACHE_TTL_SECONDS", "300"))
+RECO_CACHE_MAX_USERS: int = int(_get_env("RECO_CACHE_MAX_USERS", "10000"))
+RECO_CACHE_DEPTH: int = int(_get_env("RECO_CACHE_DEPTH", "50"))
+
+# suivi de ml/CURRENT pour recharger les modèles à chaud (0 = désactivé)
+ML_REGISTRY_POLL_SECONDS: float = float(_get_env("ML_REGISTRY_POLL_SECONDS", "30"))
+
+# snapshots Parquet des données d'entraînement (vide = exlibris_api/data/snapshots)
+TRAINING_SNAPSHOT_DIR: str = _get_env("TRAINING_SNAPSHOT_DIR", "")
+
+# /me/recommendations (mode gbm) servies depuis RecommandationSegment pour les
+# utilisateurs qui ont au plus RECO_SEGMENT_MAX_OWNED livres en collection
+RECO_SEGMENTS_ENABLED: bool = _get_env("RECO_SEGMENTS_ENABLED", "true").lower() == "true"
+RECO_SEGMENT_MAX_OWNED: int = int(_get_env("RECO_SEGMENT_MAX_OWNED", "5"))
+RECO_SEGMENT_DEPTH: int = int(_get_env("RECO_SEGMENT_DEPTH", "100"))
@@ -4,10 +4,11 @@ from pymysql.cursors import Cursor
 from core.config import DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME
 
 
-def get_db_connection() -> pymysql.connections.Connection:
+def get_db_connection(local_infile: bool = False) -> pymysql.connections.Connection:
     """
     Retourne une connexion MariaDB/PyMySQL.
     Lève une RuntimeError claire si la connexion échoue.
+    local_infile : autorise LOAD DATA LOCAL INFILE (imports en masse).
     """
     try:
         conn = pymysql.connect(
@@ -18,6 +19,7 @@ def get_db_connection() -> pymysql.connections.Connection:
             database=DB_NAME,
             cursorclass=Cursor,
             autocommit=False,
+            local_infile=local_infile,
         )
         return conn
     except Exception as exc:
@@ -3,6 +3,7 @@ from typing import Optional
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
+from core.database import get_db_connection
 from core.security import decode_access_token
 
 
@@ -26,4 +27,22 @@ def get_current_user_id(
     except ValueError:
         raise HTTPException(status_code=401, detail="Token invalide ou expiré")
     except Exception:
-        raise HTTPException(status_code=401, detail="Token invalide ou expiré")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Token invalide ou expiré")
+
+def get_current_admin_id(current_user_id: int = Depends(get_current_user_id)) -> int:
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT role FROM Utilisateur WHERE id_utilisateur = %s",
+            (current_user_id,),
+        )
+        row = cur.fetchone()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur MariaDB: {e}")
+    finally:
+        conn.close()
+
+    if not row or row[0] != "admin":
+        raise HTTPException(status_code=403, detail="Accès réservé aux administrateurs")
+    return current_user_id
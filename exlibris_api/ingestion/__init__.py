@@ -0,0 +1,17 @@
+"""
+Ingestion du catalogue (livres) et des notes, en flux :
+
+    source (CSV / JSONL / Parquet)  -> sources.py
+      -> mapping des colonnes       -> mapping.py
+      -> nettoyage                  -> cleaning.py
+      -> dédoublonnage des ISBN     -> dedup.py
+      -> batchs -> sink             -> sinks.py (MariaDB, MariaDB bulk, SQLite, notes)
+
+pipeline.py enchaîne les étapes avec des générateurs (mémoire bornée par la
+taille de batch), compte lignes et temps par étape, et gère le checkpoint.
+parallel.py : variante multi-processus pour les gros CSV.
+
+CLI : python -m scripts.ingest (depuis exlibris_api/). Remplace
+peuplement.py, import_preprocessed_books.py et moha/import_livres.py, gardés
+comme raccourcis.
+"""
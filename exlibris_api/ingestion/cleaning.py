@@ -0,0 +1,137 @@
+"""
+Nettoyage : champs canoniques (mapping.map_row) -> tuples prêts pour les sinks.
+
+Fonctions pures, sans accès base : elles tournent aussi dans les workers du
+mode parallèle.
+"""
+import hashlib
+from datetime import date, datetime
+
+LIVRE_COLUMNS = (
+    "isbn", "titre", "auteur", "date_publication",
+    "resume", "editeur", "langue", "categorie_id",
+    "statut", "image_petite", "image_moyenne", "image_grande",
+)
+# dans les tuples livre, cette position porte le NOM de catégorie (résolu par
+# le sink, en une fois par batch) ou directement un id si la source le donne
+CATEGORY_POS = LIVRE_COLUMNS.index("categorie_id")
+
+STATUTS = ("disponible", "indisponible")
+DEFAULT_LANGUE = "fr"
+
+
+def clean_str(x):
+    if x is None:
+        return None
+    x = str(x).strip()
+    return x if x != "" else None
+
+
+def make_fake_isbn(title, author, publisher):
+    """
+    Si la source n'a pas d'ISBN fiable : on crée un identifiant stable (13 chars)
+    à partir d'un hash. (Ce n'est pas un vrai ISBN, mais unique et stable.)
+    """
+    base = f"{title}|{author}|{publisher}".encode("utf-8", errors="ignore")
+    h = hashlib.sha1(base).hexdigest()  # 40 chars
+    digits = "".join([c for c in h if c.isdigit()])  # garder chiffres
+    if len(digits) < 13:
+        digits = (digits + "0" * 13)[:13]
+    return digits[:13]
+
+
+def to_date(value):
+    """AAAA-MM-JJ, AAAA (aussi 2001 ou 2001.0 numériques) ou date -> "AAAA-MM-JJ", sinon None."""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    v = clean_str(value)
+    if v is None:
+        return None
+    # essaie YYYY-MM-DD
+    try:
+        datetime.strptime(v, "%Y-%m-%d")
+        return v
+    except ValueError:
+        pass
+    # essaie YYYY (éventuellement "2001.0" venant d'une colonne float)
+    if v.endswith(".0"):
+        v = v[:-2]
+    if len(v) == 4 and v.isdigit() and v != "0000":
+        return f"{v}-01-01"
+    return None
+
+
+def to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def to_age(value):
+    age = to_int(value)
+    return age if age is not None and 0 < age <= 150 else None
+
+
+def to_note(value, keep_zero=False):
+    """Note Book-Crossing 0..10 ; 0 = interaction implicite -> NULL (ignorée par train_reco) sauf keep_zero."""
+    note = to_int(value)
+    if note is None or not 0 <= note <= 10 or (note == 0 and not keep_zero):
+        return None
+    return note
+
+
+def clean_book(m: dict):
+    """
+    Champs canoniques -> tuple Livre dans l'ordre de LIVRE_COLUMNS (catégorie :
+    voir CATEGORY_POS). None si la ligne est inutilisable (pas de titre).
+    """
+    title = clean_str(m.get("titre"))
+    # si pas de titre, on skip (inutile)
+    if not title:
+        return None
+    author = clean_str(m.get("auteur"))
+    publisher = clean_str(m.get("editeur"))
+
+    # ISBN si présent, sinon hash stable
+    isbn = clean_str(m.get("isbn"))
+    if not isbn or len(isbn) < 10:
+        isbn = make_fake_isbn(title or "", author or "", publisher or "")
+
+    category = to_int(m.get("categorie_id"))
+    if category is None:
+        category = clean_str(m.get("categorie"))
+        category = category[:100] if category else None  # Categorie.nomcat VARCHAR(100)
+
+    statut = clean_str(m.get("statut"))
+    langue = clean_str(m.get("langue"))
+
+    return (
+        isbn[:13],
+        title[:255],
+        (author or "")[:255],
+        to_date(m.get("date_publication")),
+        clean_str(m.get("resume")),
+        (publisher or "")[:255],
+        (langue or DEFAULT_LANGUE)[:50],
+        category,
+        statut if statut in STATUTS else "disponible",
+        clean_str(m.get("image_petite")),
+        clean_str(m.get("image_moyenne")),
+        clean_str(m.get("image_grande")),
+    )
+
+
+def clean_rating(m: dict, keep_zero=False):
+    """
+    Champs canoniques -> (user_id externe, isbn, note, age, pays), l'ISBN
+    calculé comme pour le livre. None sans utilisateur ou sans titre.
+    """
+    ext = clean_str(m.get("user_id"))
+    book = clean_book(m)
+    if not ext or book is None:
+        return None
+    pays = clean_str(m.get("pays"))
+    return ext, book[0], to_note(m.get("note"), keep_zero), to_age(m.get("age")), pays[:100] if pays else None
@@ -0,0 +1,67 @@
+"""
+Dédoublonnage des ISBN en flux.
+
+Preprocessed_data.csv a une ligne par note : le même livre revient des
+dizaines de fois. On ne garde que sa 1re apparition, avant la résolution des
+catégories et l'envoi en base.
+"""
+import hashlib
+import math
+import sys
+
+DEDUP_KINDS = ("set", "bloom", "none")
+
+
+class SeenIsbns:
+    """
+    ISBN déjà envoyés. Par défaut un set exact (~100 octets par ISBN). Avec
+    `expected` (nombre de livres distincts attendu), un filtre de Bloom de
+    taille fixe (~29 bits par livre à error_rate=1e-6) : un faux positif fait
+    sauter un livre jamais vu, avec une probabilité `error_rate` par livre.
+    """
+
+    def __init__(self, expected=None, error_rate=1e-6):
+        self.expected = expected
+        if expected is None:
+            self._seen = set()
+            return
+        self.n_bits = max(8, int(-expected * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / expected * math.log(2)))
+        self._bits = bytearray((self.n_bits + 7) // 8)
+
+    def add(self, isbn):
+        """True si l'ISBN est nouveau (et le marque vu), False si déjà vu."""
+        if self.expected is None:
+            if isbn in self._seen:
+                return False
+            self._seen.add(isbn)
+            return True
+        # double hachage : h1 + i * h2 (Kirsch-Mitzenmacher)
+        digest = hashlib.blake2b(isbn.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        new = False
+        for i in range(self.n_hashes):
+            bit = (h1 + i * h2) % self.n_bits
+            byte, mask = bit >> 3, 1 << (bit & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                new = True
+        return new
+
+    def nbytes(self):
+        if self.expected is not None:
+            return len(self._bits)
+        return sys.getsizeof(self._seen) + sum(sys.getsizeof(isbn) for isbn in self._seen)
+
+
+def make_dedup(kind="set", expected_books=None):
+    """kind : "none", "set" (exact) ou "bloom" (mémoire fixe, `expected_books` requis)."""
+    if kind == "none":
+        return None
+    if kind == "bloom":
+        if not expected_books:
+            raise ValueError("le filtre de Bloom a besoin du nombre de livres attendu (expected_books)")
+        return SeenIsbns(expected=expected_books)
+    if kind != "set":
+        raise ValueError(f"dédoublonnage inconnu: {kind} ({', '.join(DEDUP_KINDS)})")
+    return SeenIsbns()
@@ -0,0 +1,58 @@
+"""
+Mapping des colonnes source -> champs canoniques.
+
+Chaque champ accepte plusieurs noms de colonne (Preprocessed_data.csv,
+export de Livre, anciens CSV du projet) ; la première valeur non vide gagne.
+Une colonne non prévue se branche avec --map champ=colonne.
+"""
+
+# champ -> colonnes acceptées, par ordre de priorité
+BOOK_FIELDS = {
+    "isbn": ("isbn",),
+    "titre": ("book_title", "title", "titre"),
+    "auteur": ("book_author", "author", "auteur"),
+    "editeur": ("publisher", "editeur"),
+    "resume": ("Summary", "summary", "resume"),
+    "categorie": ("Category", "category", "categorie"),
+    "categorie_id": ("categorie_id",),
+    "langue": ("Language", "language", "langue"),
+    "date_publication": ("date_publication", "publication_date", "year_of_publication",
+                         "annee_publication", "year"),
+    "statut": ("statut",),
+    "image_petite": ("img_s", "image_petite"),
+    "image_moyenne": ("img_m", "image_moyenne", "image"),
+    "image_grande": ("img_l", "image_grande"),
+}
+
+# une note a aussi besoin des champs livre : l'ISBN peut être un hash du titre
+RATING_FIELDS = {
+    **BOOK_FIELDS,
+    "user_id": ("user_id",),
+    "note": ("rating", "note"),
+    "age": ("age",),
+    "pays": ("country", "pays"),
+}
+
+
+def with_overrides(fields: dict, overrides) -> dict:
+    """Copie de `fields` où chaque "champ=colonne" de `overrides` passe en priorité."""
+    fields = dict(fields)
+    for item in overrides or ():
+        field, sep, column = item.partition("=")
+        if not sep or field not in fields:
+            raise ValueError(f"mapping invalide: {item!r} (champs: {', '.join(fields)})")
+        fields[field] = (column,) + tuple(c for c in fields[field] if c != column)
+    return fields
+
+
+def map_row(row: dict, fields: dict = BOOK_FIELDS) -> dict:
+    """Champ canonique -> première valeur non vide parmi ses colonnes (None sinon)."""
+    mapped = {}
+    for field, columns in fields.items():
+        value = None
+        for column in columns:
+            value = row.get(column)
+            if value not in (None, ""):
+                break
+        mapped[field] = value if value != "" else None
+    return mapped
@@ -0,0 +1,167 @@
+"""
+Ingestion parallèle d'un gros CSV de livres dans MariaDB :
+  - sources.split_csv découpe le fichier en plages d'octets
+  - `jobs` processus parsent, mappent et nettoient les plages
+  - le processus principal dédoublonne (dans l'ordre du fichier), résout les
+    catégories de chaque plage en une fois (seule écriture dans Categorie,
+    committée avant l'envoi aux writers) et répartit les livres par
+    crc32(isbn) % writers
+  - `writers` threads, un MariaDBSink (une connexion) chacun, insèrent par
+    batch : deux writers ne touchent jamais le même ISBN, donc pas de conflit
+    de verrous, et les doublons d'un ISBN restent dans l'ordre du fichier
+dry_run : tout sauf l'écriture (mesure du débit amont, sans base).
+Pas de checkpoint dans ce mode (les writers committent dans le désordre).
+"""
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from core.database import get_db_connection
+from ingestion.cleaning import clean_book
+from ingestion.dedup import make_dedup
+from ingestion.mapping import BOOK_FIELDS, map_row, with_overrides
+from ingestion.pipeline import DEFAULT_BATCH_SIZE, StageCounter, report
+from ingestion.sinks import CategoryResolver, MariaDBSink, RejectFile
+from ingestion.sources import CHUNK_BYTES, read_csv_range, split_csv
+
+
+def parse_range(task):
+    """Worker : (lignes lues, livres nettoyés) d'une plage d'octets."""
+    path, header, start, end, delimiter, fields = task
+    read, books = 0, []
+    for row in read_csv_range(path, header, start, end, delimiter):
+        read += 1
+        book = clean_book(map_row(row, fields))
+        if book is not None:
+            books.append(book)
+    return read, books
+
+
+def writer_loop(sink, batches, stats):
+    """Thread writer : un batch (même partition d'ISBN) à la fois ; sink None en dry run."""
+    try:
+        for batch in iter(batches.get, None):
+            if stats.get("erreur"):
+                continue  # writer arrêté : on vide la file pour ne pas bloquer la lecture
+            try:
+                if sink:
+                    sink.write(batch)
+                else:
+                    stats["inserted"] += len(batch)
+            except Exception as e:
+                stats["erreur"] = e
+    finally:
+        if sink:
+            sink.close()
+
+
+def run_parallel(path, delimiter=",", batch_size=DEFAULT_BATCH_SIZE, limit=None, jobs=None, writers=4,
+                 chunk_bytes=CHUNK_BYTES, dry_run=False, dedup="set", expected_books=None, mapping=None):
+    jobs = jobs or os.cpu_count() or 1
+    fields = with_overrides(BOOK_FIELDS, mapping)
+    seen = make_dedup(dedup, expected_books)
+    print(f"📂 Ingestion parallèle: {path}")
+    print(f"➡️ jobs={jobs} writers={writers} batch_size={batch_size} chunk={chunk_bytes // 1024} Ko"
+          + (" (dry run)" if dry_run else ""))
+
+    t0 = time.perf_counter()
+    conn = None if dry_run else get_db_connection()
+    categories = CategoryResolver(conn.cursor() if conn else None)
+
+    rejects = None if dry_run else RejectFile(f"{path}.rejets.csv")
+    # connexions ouvertes ici : une erreur de connexion arrête l'import avant de lire le fichier
+    sinks = [None if dry_run else MariaDBSink(rejects=rejects, verbose=False) for _ in range(writers)]
+    writer_stats = [sink.stats if sink else {"inserted": 0, "rejected": 0} for sink in sinks]
+    # files bornées : la lecture attend les writers (mémoire bornée)
+    queues = [queue.Queue(maxsize=4) for _ in range(writers)]
+    threads = [threading.Thread(target=writer_loop, args=(sink, q, st), daemon=True)
+               for sink, q, st in zip(sinks, queues, writer_stats)]
+    for t in threads:
+        t.start()
+    pending = [[] for _ in range(writers)]
+    c_parse = StageCounter("lecture+nettoyage")
+    c_dedup = StageCounter("dédoublonnage+catégories")
+    c_sink = StageCounter(f"écriture (mariadb x{writers})")
+    read = cleaned = 0
+
+    try:
+        header, ranges = split_csv(path, chunk_bytes)
+        tasks = iter([(path, header, start, end, delimiter, fields) for start, end in ranges])
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            # fenêtre de 2 plages par worker : les résultats sont consommés dans l'ordre du fichier
+            window = [pool.submit(parse_range, t) for _, t in zip(range(2 * jobs), tasks)]
+            while window:
+                if any(st.get("erreur") for st in writer_stats):
+                    # un writer est arrêté : inutile de lire le reste du fichier, l'erreur remonte après join
+                    for f in window:
+                        f.cancel()
+                    break
+                t_wait = time.perf_counter()
+                n, books = window.pop(0).result()
+                c_parse.seconds += time.perf_counter() - t_wait
+                nxt = next(tasks, None)
+                if nxt is not None:
+                    window.append(pool.submit(parse_range, nxt))
+
+                if limit and read + n >= limit:
+                    # dernière plage : on s'arrête à `limit` lignes (approximation, les
+                    # lignes sans titre de la plage ne sont pas situées)
+                    n, books = limit - read, books[:limit - read]
+                    for f in window:
+                        f.cancel()
+                    window = []
+                read += n
+                cleaned += len(books)
+                c_parse.rows += len(books)
+
+                t_stage = time.perf_counter()
+                if seen is not None:
+                    books = [b for b in books if seen.add(b[0])]
+                c_dedup.rows += len(books)
+                books = categories.resolve(books)
+                c_dedup.seconds += time.perf_counter() - t_stage
+
+                t_stage = time.perf_counter()
+                for book in books:
+                    w = zlib.crc32(book[0].encode()) % writers
+                    pending[w].append(book)
+                    if len(pending[w]) >= batch_size:
+                        queues[w].put(pending[w])
+                        pending[w] = []
+                c_sink.seconds += time.perf_counter() - t_stage  # attente des writers (files pleines)
+    finally:
+        for q, part in zip(queues, pending):
+            if part:
+                q.put(part)
+            q.put(None)
+        t_stage = time.perf_counter()
+        for t in threads:
+            t.join()
+        c_sink.seconds += time.perf_counter() - t_stage
+        if rejects:
+            rejects.close()
+        if conn:
+            conn.close()
+
+    for st in writer_stats:
+        if st.get("erreur"):
+            raise st["erreur"]
+    c_sink.rows = c_dedup.rows
+    stats = {
+        "kind": "books",
+        "sink": f"parallel x{jobs}/{writers}",
+        "lues": read,
+        "skipped": read - cleaned,
+        "doublons": cleaned - c_dedup.rows if seen is not None else 0,
+        "secondes": time.perf_counter() - t0,
+        "inserted": sum(st["inserted"] for st in writer_stats),
+        "rejected": sum(st["rejected"] for st in writer_stats),
+    }
+    # temps propres déjà séparés : on les présente comme des compteurs cumulés pour report()
+    c_dedup.seconds += c_parse.seconds
+    stats["etapes"] = {c.name: (c.rows, c.seconds) for c in (c_parse, c_dedup, c_sink)}
+    report(stats, [c_parse, c_dedup, c_sink], seen)
+    return stats
@@ -0,0 +1,188 @@
+"""
+Pipeline d'ingestion : source -> mapping -> nettoyage -> dédoublonnage -> batchs -> sink.
+
+Chaque étape est un générateur : une seule ligne à la fois en vol, plus le
+batch en cours, quelle que soit la taille du fichier. Chaque étape est
+comptée (lignes, temps) pour le rapport de fin.
+
+Checkpoint (<source>.checkpoint.json) : après chaque batch d'un sink
+`resumable`, la position source du dernier enregistrement lu ; resume=True
+repart de là. Les ISBN vus avant l'arrêt ne sont pas mémorisés et peuvent
+être renvoyés une fois (upsert, sans effet).
+"""
+import json
+import os
+import time
+from datetime import datetime
+from itertools import islice
+
+from ingestion.cleaning import clean_book, clean_rating
+from ingestion.dedup import make_dedup
+from ingestion.mapping import BOOK_FIELDS, RATING_FIELDS, map_row, with_overrides
+from ingestion.sources import open_source, source_size
+
+DEFAULT_BATCH_SIZE = 2000
+
+
+class StageCounter:
+    """Lignes sorties d'une étape et temps cumulé passé à les produire (étapes amont comprises)."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.seconds = 0.0
+
+    def wrap(self, iterable):
+        it = iter(iterable)
+        clock = time.perf_counter
+        while True:
+            t0 = clock()
+            try:
+                item = next(it)
+            except StopIteration:
+                self.seconds += clock() - t0
+                return
+            self.seconds += clock() - t0
+            self.rows += 1
+            yield item
+
+
+def batched(iterable, size):
+    it = iter(iterable)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+# ----------------------------
+# Checkpoint
+# ----------------------------
+def checkpoint_path(path):
+    return f"{path}.checkpoint.json"
+
+
+def load_checkpoint(path, fmt=None):
+    """Checkpoint d'un import interrompu, ou None ; SystemExit si la source a changé depuis."""
+    try:
+        with open(checkpoint_path(path), encoding="utf-8") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return None
+    if state.get("taille") != source_size(path, fmt):
+        raise SystemExit(f"❌ {path} a changé depuis le checkpoint (taille), reprise impossible")
+    return state
+
+
+def save_checkpoint(path, fmt, position, rows_read):
+    """Tout ce qui précède `position` est en base (ou rejeté)."""
+    state = {
+        "source": os.path.abspath(path),
+        "taille": source_size(path, fmt),
+        "position": position,
+        "lues": rows_read,
+        "date": datetime.now().isoformat(timespec="seconds"),
+    }
+    tmp = checkpoint_path(path) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, checkpoint_path(path))  # atomique : jamais de checkpoint à moitié écrit
+
+
+# ----------------------------
+# Exécution
+# ----------------------------
+def run(path, sink, kind="books", fmt=None, delimiter=",", batch_size=DEFAULT_BATCH_SIZE, limit=None,
+        dedup="set", expected_books=None, resume=False, mapping=None, keep_zero=False):
+    """
+    Ingestion de `path` dans `sink` ; kind : "books" (Livre) ou "ratings"
+    (Evaluation, sink RatingsSink). Retourne les stats (compteurs par étape,
+    compteurs du sink, secondes). Le sink est fermé à la fin.
+    """
+    if kind not in ("books", "ratings"):
+        raise ValueError(f"type d'ingestion inconnu: {kind}")
+    fields = with_overrides(BOOK_FIELDS if kind == "books" else RATING_FIELDS, mapping)
+    seen = make_dedup(dedup, expected_books) if kind == "books" else None
+
+    start, read_before = 0, 0
+    if resume and sink.resumable:
+        state = load_checkpoint(path, fmt)
+        if state:
+            start, read_before = state["position"], state["lues"]
+            print(f"↩️ Reprise à la position {start} ({read_before} lignes déjà traitées, {state['date']})")
+
+    print(f"📂 Ingestion {kind}: {path} -> {sink.name} (batch_size={batch_size})")
+    position = {"source": start}
+
+    def positions(records):
+        for pos, row in records:
+            position["source"] = pos
+            yield row
+
+    # étapes : chaque compteur englobe le temps des étapes en amont
+    c_source, c_mapping, c_clean = StageCounter("source"), StageCounter("mapping"), StageCounter("nettoyage")
+    c_dedup = StageCounter("dédoublonnage")
+    counters = [c_source, c_mapping, c_clean]
+
+    rows = c_source.wrap(islice(positions(open_source(path, fmt, delimiter, start)), limit))
+    mapped = c_mapping.wrap(map_row(row, fields) for row in rows)
+    if kind == "books":
+        cleaned = c_clean.wrap(b for b in map(clean_book, mapped) if b is not None)
+    else:
+        cleaned = c_clean.wrap(r for r in (clean_rating(m, keep_zero) for m in mapped) if r is not None)
+    if seen is not None:
+        cleaned = c_dedup.wrap(b for b in cleaned if seen.add(b[0]))
+        counters.append(c_dedup)
+
+    c_sink = StageCounter(f"écriture ({sink.name})")
+    t0 = time.perf_counter()
+    try:
+        for batch in batched(cleaned, batch_size):
+            t_write = time.perf_counter()
+            sink.write(batch)
+            c_sink.seconds += time.perf_counter() - t_write
+            c_sink.rows += len(batch)
+            if sink.resumable:
+                save_checkpoint(path, fmt, position["source"], read_before + c_source.rows)
+        t_write = time.perf_counter()
+    finally:
+        sink.close()
+    c_sink.seconds += time.perf_counter() - t_write  # finalisation (fusion du mode bulk)
+    counters.append(c_sink)
+    seconds = time.perf_counter() - t0
+
+    if sink.resumable and position["source"] >= source_size(path, fmt):
+        if os.path.exists(checkpoint_path(path)):
+            os.remove(checkpoint_path(path))  # source entièrement importée
+    elif sink.resumable:
+        save_checkpoint(path, fmt, position["source"], read_before + c_source.rows)  # arrêt sur limit
+
+    stats = {
+        "kind": kind,
+        "sink": sink.name,
+        "lues": c_source.rows,
+        "skipped": c_mapping.rows - c_clean.rows,
+        "doublons": c_clean.rows - c_dedup.rows if seen is not None else 0,
+        "secondes": seconds,
+        "etapes": {c.name: (c.rows, c.seconds) for c in counters},
+        **sink.stats,
+    }
+    report(stats, counters, seen)
+    return stats
+
+
+def report(stats, counters, seen=None):
+    """Débit par étape (temps propre = temps cumulé moins celui de l'étape amont)."""
+    print(f"{'étape':<24} {'lignes':>10} {'s':>8} {'lignes/s':>10}")
+    upstream = 0.0
+    for c in counters:
+        own = c.seconds - upstream if not c.name.startswith("écriture") else c.seconds
+        upstream = c.seconds
+        print(f"{c.name:<24} {c.rows:>10} {own:>8.2f} {c.rows / max(own, 1e-9):>10.0f}")
+    if seen is not None:
+        books = stats["lues"] - stats["skipped"]
+        kept = books - stats["doublons"]
+        print(f"🧹 dédoublonnage: {books} lignes -> {kept} livres "
+              f"(-{stats['doublons'] / max(books, 1):.1%}, x{books / max(kept, 1):.1f}), "
+              f"{seen.nbytes() / 1e6:.1f} Mo")
+    counts = ", ".join(f"{k}={stats[k]}" for k in ("inserted", "ignored", "rejected", "utilisateurs") if k in stats)
+    print(f"✅ Terminé. {counts}, skipped={stats['skipped']} "
+          f"en {stats['secondes']:.1f} s ({stats['lues'] / max(stats['secondes'], 1e-9):.0f} lignes/s)")
@@ -0,0 +1,396 @@
+"""
+Sinks : reçoivent les batchs nettoyés (write) et les écrivent.
+
+  - MariaDBSink      : executemany INSERT ... ON DUPLICATE KEY UPDATE, commit
+                       par batch, bisection des batchs refusés (rejets en CSV)
+  - MariaDBBulkSink  : TSV temporaire -> LOAD DATA LOCAL INFILE -> une fusion
+                       set-based dans Livre, au close()
+  - SQLiteSink       : base SQLite de moha/ (schéma moha/schema.sql)
+  - RatingsSink      : notes -> Evaluation, utilisateurs fantômes en bloc
+
+`resumable` : le sink committe chaque batch, le pipeline peut donc écrire un
+checkpoint après chaque write().
+"""
+import csv
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+import pymysql
+from pymysql import MySQLError
+
+from core.database import get_db_connection
+from ingestion.cleaning import CATEGORY_POS, LIVRE_COLUMNS
+
+SINKS = ("mariadb", "mariadb-bulk", "sqlite")
+
+# ON DUPLICATE KEY UPDATE pour éviter que ça casse sur ISBN déjà présent
+UPSERT_UPDATE = """
+    ON DUPLICATE KEY UPDATE
+        titre=VALUES(titre),
+        auteur=VALUES(auteur),
+        date_publication=VALUES(date_publication),
+        resume=VALUES(resume),
+        editeur=VALUES(editeur),
+        langue=VALUES(langue),
+        categorie_id=VALUES(categorie_id),
+        statut=VALUES(statut),
+        image_moyenne=VALUES(image_moyenne)
+"""
+
+INSERT_LIVRE = f"""
+    INSERT INTO Livre ({", ".join(LIVRE_COLUMNS)})
+    VALUES ({", ".join(["%s"] * len(LIVRE_COLUMNS))})
+    {UPSERT_UPDATE}
+"""
+
+
+class RejectFile:
+    """Lignes refusées par la base (CSV, colonnes Livre + erreur), en ajout : survit aux reprises."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()  # partagé par les writers du mode parallèle
+        new = not os.path.exists(path)
+        self._f = open(path, "a", encoding="utf-8", newline="")
+        self._w = csv.writer(self._f)
+        if new:
+            self._w.writerow(LIVRE_COLUMNS + ("erreur",))
+
+    def write(self, row, error):
+        with self._lock:
+            self._w.writerow(tuple("" if v is None else v for v in row) + (str(error),))
+            self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+
+class CategoryResolver:
+    """
+    Nom de catégorie -> id, résolu une fois par batch : les noms absents du
+    cache sont créés en un INSERT IGNORE multi-lignes (ux_categorie_nomcat :
+    sans effet si une autre connexion l'a créée entre-temps), puis relus en un
+    SELECT. Commit immédiat : un rollback de batch Livre ne doit pas laisser
+    dans le cache un id annulé. Sans curseur (dry run) : ids locaux.
+    """
+
+    def __init__(self, cur=None):
+        self.cur = cur
+        self.cache = {}  # nom en minuscules -> id
+        if cur is not None:
+            cur.execute("SELECT id, nomcat FROM Categorie")
+            self.cache = {name.lower(): cid for cid, name in cur.fetchall()}
+
+    def _create(self, names):
+        missing = {n.lower(): n for n in names if n.lower() not in self.cache}
+        if not missing:
+            return
+        if self.cur is None:
+            for key in missing:
+                self.cache[key] = len(self.cache) + 1
+            return
+        self.cur.executemany("INSERT IGNORE INTO Categorie (nomcat) VALUES (%s)", [(n,) for n in missing.values()])
+        self.cur.execute(
+            f"SELECT id, nomcat FROM Categorie WHERE nomcat IN ({', '.join(['%s'] * len(missing))})",
+            list(missing.values()),
+        )
+        self.cache.update({name.lower(): cid for cid, name in self.cur.fetchall()})
+        self.cur.connection.commit()
+
+    def resolve(self, books):
+        """Batch de livres avec l'id de catégorie à la place du nom (les ids déjà numériques sont gardés)."""
+        names = {b[CATEGORY_POS] for b in books if isinstance(b[CATEGORY_POS], str)}
+        if not names:
+            return books
+        self._create(names)
+        return [
+            b[:CATEGORY_POS] + (self.cache.get(b[CATEGORY_POS].lower()),) + b[CATEGORY_POS + 1:]
+            if isinstance(b[CATEGORY_POS], str) else b
+            for b in books
+        ]
+
+
+class MariaDBSink:
+    """Livre, par batch : une requête multi-lignes (executemany) et un commit par batch."""
+
+    name = "mariadb"
+    resumable = True
+
+    def __init__(self, conn=None, rejects=None, verbose=True):
+        self.conn = conn or get_db_connection()
+        self.cur = self.conn.cursor()
+        self.categories = CategoryResolver(self.cur)
+        self.rejects = rejects
+        self.verbose = verbose
+        self.stats = {"inserted": 0, "rejected": 0}
+
+    def write(self, batch):
+        self._flush(self.categories.resolve(batch))
+
+    def _flush(self, batch):
+        """
+        Insère un batch et commit. Si la base refuse le batch, il est coupé en
+        deux récursivement : seules les lignes fautives vont dans les rejets,
+        le reste est inséré. Une ligne fautive dans 2000 coûte
+        ~2 x log2(2000) petits allers-retours. OperationalError (connexion
+        perdue, deadlock...) n'est pas une erreur de données : elle remonte,
+        l'import s'arrête et reprend au checkpoint.
+        """
+        try:
+            self.cur.executemany(INSERT_LIVRE, batch)
+            self.conn.commit()
+            self.stats["inserted"] += len(batch)
+            if self.verbose:
+                print(f"✔ batch inséré: +{len(batch)} (total {self.stats['inserted']})")
+        except pymysql.err.OperationalError:
+            self.conn.rollback()
+            raise
+        except MySQLError as e:
+            self.conn.rollback()
+            if len(batch) == 1:
+                self.stats["rejected"] += 1
+                if self.rejects:
+                    self.rejects.write(batch[0], e)
+                print(f"⚠️ ligne rejetée (isbn={batch[0][0]}): {e}")
+                return
+            mid = len(batch) // 2
+            self._flush(batch[:mid])
+            self._flush(batch[mid:])
+
+    def close(self):
+        self.cur.close()
+        self.conn.close()
+
+
+# ----------------------------
+# Bulk : TSV + LOAD DATA LOCAL INFILE
+# ----------------------------
+_TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def tsv_field(value):
+    """Champ au format par défaut de LOAD DATA (échappement \\, NULL = \\N)."""
+    if value is None:
+        return "\\N"
+    return str(value).translate(_TSV_ESCAPES)
+
+
+# colonnes du TSV : celles de Livre, la catégorie en nom (résolu en SQL) ou en id
+STAGING_COLUMNS = LIVRE_COLUMNS[:CATEGORY_POS] + ("categorie", "categorie_id") + LIVRE_COLUMNS[CATEGORY_POS + 1:]
+
+# seq : garde l'ordre du fichier pour que la fusion donne le même résultat
+# que MariaDBSink quand un ISBN apparaît plusieurs fois (la dernière ligne gagne)
+STAGING_DDL = """
+    CREATE TEMPORARY TABLE livre_import (
+        seq              INT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+        isbn             VARCHAR(13) NOT NULL,
+        titre            VARCHAR(255) NOT NULL,
+        auteur           VARCHAR(255) NULL,
+        date_publication DATE NULL,
+        resume           TEXT NULL,
+        editeur          VARCHAR(255) NULL,
+        langue           VARCHAR(50) NULL,
+        categorie        VARCHAR(100) NULL,
+        categorie_id     INT NULL,
+        statut           VARCHAR(20) NOT NULL,
+        image_petite     TEXT NULL,
+        image_moyenne    TEXT NULL,
+        image_grande     TEXT NULL
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+"""
+
+
+class MariaDBBulkSink:
+    """
+    write() : les lignes sont ajoutées à un TSV temporaire (en flux).
+    close() :
+      1. LOAD DATA LOCAL INFILE dans la table temporaire livre_import
+      2. catégories manquantes : un INSERT IGNORE ... SELECT DISTINCT
+      3. une seule fusion INSERT INTO Livre ... SELECT ... JOIN Categorie ... ON DUPLICATE KEY UPDATE
+    Tout est dans une transaction : en cas d'erreur, rien n'est écrit dans Livre.
+    """
+
+    name = "mariadb-bulk"
+    resumable = False
+
+    def __init__(self, conn=None):
+        # local_infile : le serveur doit aussi l'autoriser (local_infile=ON)
+        self.conn = conn or get_db_connection(local_infile=True)
+        fd, self.tsv_path = tempfile.mkstemp(prefix="livres_", suffix=".tsv")
+        self._f = os.fdopen(fd, "w", encoding="utf-8", newline="")
+        self.rows = 0
+        self.stats = {"inserted": 0, "rejected": 0}
+
+    def write(self, batch):
+        for book in batch:
+            category = book[CATEGORY_POS]
+            name, cid = (None, category) if isinstance(category, int) else (category, None)
+            row = book[:CATEGORY_POS] + (name, cid) + book[CATEGORY_POS + 1:]
+            self._f.write("\t".join(tsv_field(v) for v in row))
+            self._f.write("\n")
+        self.rows += len(batch)
+
+    def close(self):
+        self._f.close()
+        cur = self.conn.cursor()
+        try:
+            t0 = time.perf_counter()
+            cur.execute("DROP TEMPORARY TABLE IF EXISTS livre_import")
+            cur.execute(STAGING_DDL)
+            loaded = cur.execute(f"""
+                LOAD DATA LOCAL INFILE %s
+                INTO TABLE livre_import
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+                LINES TERMINATED BY '\\n'
+                ({", ".join(STAGING_COLUMNS)})
+            """, (self.tsv_path,))
+            t_load = time.perf_counter() - t0
+            print(f"✔ LOAD DATA: {loaded} lignes en {t_load:.1f} s ({loaded / max(t_load, 1e-9):.0f} lignes/s)")
+
+            t0 = time.perf_counter()
+            cur.execute("""
+                INSERT IGNORE INTO Categorie (nomcat)
+                SELECT DISTINCT categorie FROM livre_import WHERE categorie IS NOT NULL
+            """)
+            select = ", ".join(
+                "COALESCE(s.categorie_id, c.id)" if col == "categorie_id" else f"s.{col}" for col in LIVRE_COLUMNS
+            )
+            cur.execute(f"""
+                INSERT INTO Livre ({", ".join(LIVRE_COLUMNS)})
+                SELECT {select}
+                FROM livre_import s
+                LEFT JOIN Categorie c ON c.nomcat = s.categorie
+                ORDER BY s.seq
+                {UPSERT_UPDATE}
+            """)
+            cur.execute("DROP TEMPORARY TABLE livre_import")
+            self.conn.commit()
+            print(f"✔ fusion dans Livre: {loaded} lignes en {time.perf_counter() - t0:.1f} s")
+            self.stats["inserted"] += loaded
+        except Exception as e:
+            self.conn.rollback()
+            self.stats["rejected"] += self.rows
+            print(f"⚠️ import bulk annulé ({self.rows} lignes): {e}")
+            raise  # l'appelant (rapport, --compare, cron) doit voir l'échec
+        finally:
+            cur.close()
+            self.conn.close()
+            os.remove(self.tsv_path)
+
+
+class SQLiteSink:
+    """
+    Livre de la base SQLite de moha/ : annee_publication (entier) et
+    categorie (texte) à la place de date_publication / categorie_id.
+    INSERT OR IGNORE : un ISBN déjà présent est gardé tel quel.
+    """
+
+    name = "sqlite"
+    resumable = True
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path)
+        self.stats = {"inserted": 0, "rejected": 0}
+
+    def write(self, batch):
+        rows = [
+            (isbn, titre, auteur or None, int(date_pub[:4]) if date_pub else None, editeur or None, resume,
+             langue, categorie if isinstance(categorie, str) else None, img_s, img_m, img_l)
+            for (isbn, titre, auteur, date_pub, resume, editeur, langue, categorie, _,
+                 img_s, img_m, img_l) in batch
+        ]
+        cur = self.conn.executemany("""
+            INSERT OR IGNORE INTO Livre (
+                isbn, titre, auteur, annee_publication, editeur, resume,
+                langue, categorie, image_petite, image_moyenne, image_grande
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+        self.conn.commit()
+        self.stats["inserted"] += cur.rowcount
+
+    def close(self):
+        self.conn.close()
+
+
+# ----------------------------
+# Notes -> Evaluation
+# ----------------------------
+# Utilisateurs "fantômes" créés pour les user_id de la source : email réservé
+# (.invalid), pas de mot_de_passe_hash ni d'email vérifié -> connexion impossible
+SHADOW_EMAIL = "import-{}@exlibris.invalid"
+SHADOW_EMAIL_LIKE = "import-%@exlibris.invalid"
+
+
+class RatingsSink:
+    """
+    Batchs de (user_id externe, isbn, note, age, pays) (cleaning.clean_rating).
+    Par batch : utilisateurs fantômes manquants (un INSERT IGNORE multi-lignes,
+    idempotent grâce à ux_utilisateur_email, puis un SELECT), puis un
+    INSERT IGNORE multi-lignes dans Evaluation : (utilisateur, livre) déjà
+    noté (ux_evaluation_user_livre) ou livre absent de Livre -> ignoré.
+    Relançable : les utilisateurs fantômes existants sont relus au départ.
+    """
+
+    name = "ratings"
+    resumable = True
+
+    def __init__(self, conn=None, verbose=True):
+        self.conn = conn or get_db_connection()
+        self.cur = self.conn.cursor()
+        self.verbose = verbose
+        self.users = self._load_shadow_users()
+        self.stats = {"inserted": 0, "ignored": 0, "utilisateurs": 0}
+
+    def _load_shadow_users(self):
+        """user_id externe -> id_utilisateur, pour les utilisateurs fantômes déjà créés."""
+        self.cur.execute("SELECT id_utilisateur, email FROM Utilisateur WHERE email LIKE %s", (SHADOW_EMAIL_LIKE,))
+        prefix, suffix = SHADOW_EMAIL.split("{}")
+        return {email[len(prefix):-len(suffix)]: uid for uid, email in self.cur.fetchall()}
+
+    def _create_users(self, batch):
+        missing = {}
+        for ext, _, _, age, pays in batch:
+            if ext not in self.users and ext not in missing:
+                # pas de mot de passe : mot_de_passe_hash reste NULL
+                missing[ext] = (f"lecteur_{ext}"[:150], SHADOW_EMAIL.format(ext), "", age, pays)
+        if not missing:
+            return
+        self.cur.executemany("""
+            INSERT IGNORE INTO Utilisateur (nom_utilisateur, email, mot_de_passe, age, pays)
+            VALUES (%s, %s, %s, %s, %s)
+        """, list(missing.values()))
+        self.stats["utilisateurs"] += self.cur.rowcount
+        emails = [user[1] for user in missing.values()]
+        self.cur.execute(
+            f"SELECT id_utilisateur, email FROM Utilisateur WHERE email IN ({', '.join(['%s'] * len(emails))})",
+            emails,
+        )
+        by_email = {email: uid for uid, email in self.cur.fetchall()}
+        for ext, user in missing.items():
+            self.users[ext] = by_email[user[1]]
+
+    def write(self, batch):
+        try:
+            self._create_users(batch)
+            self.cur.executemany("""
+                INSERT IGNORE INTO Evaluation (utilisateur_id, livre_isbn, note)
+                VALUES (%s, %s, %s)
+            """, [(self.users[ext], isbn, note) for ext, isbn, note, _, _ in batch])
+            inserted = self.cur.rowcount
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.stats["inserted"] += inserted
+        self.stats["ignored"] += len(batch) - inserted
+        if self.verbose:
+            print(f"✔ notes: {self.stats['inserted']} insérées, {self.stats['ignored']} ignorées")
+
+    def close(self):
+        self.cur.close()
+        self.conn.close()
@@ -0,0 +1,141 @@
+"""
+Sources : lignes brutes (dict colonne -> valeur) avec leur position dans le
+fichier, pour le checkpoint :
+  - CSV / JSONL : offset en octets de la fin de l'enregistrement
+  - Parquet     : nombre de lignes lues
+Une position renvoyée peut être repassée en `start` pour reprendre juste après.
+"""
+import csv
+import io
+import json
+import os
+from pathlib import Path
+
+FORMATS = ("csv", "jsonl", "parquet")
+
+# taille des plages d'octets du mode parallèle
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def detect_format(path) -> str:
+    suffix = Path(path).suffix.lower()
+    if suffix in (".jsonl", ".ndjson"):
+        return "jsonl"
+    if suffix in (".parquet", ".pq"):
+        return "parquet"
+    return "csv"
+
+
+def read_csv(path, delimiter=",", start=0):
+    """
+    (offset de fin d'enregistrement, ligne dict), lu en binaire pour connaître
+    la position. `start` : offset d'un début d'enregistrement, 0 = juste après
+    l'entête. Un enregistrement peut tenir sur plusieurs lignes (retour à la
+    ligne entre guillemets).
+    """
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8", errors="ignore")], delimiter=delimiter))
+        if start:
+            f.seek(start)
+        pos = f.tell()
+        parts = []
+        in_quotes = False
+        for line in f:
+            pos += len(line)
+            parts.append(line)
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            if in_quotes:
+                continue
+            text = b"".join(parts).decode("utf-8", errors="ignore")
+            parts = []
+            values = next(csv.reader([text], delimiter=delimiter), None)
+            if values:
+                yield pos, dict(zip(header, values))
+
+
+def read_jsonl(path, start=0):
+    """(offset de fin de ligne, objet) ; les lignes vides ou invalides sont ignorées."""
+    with open(path, "rb") as f:
+        if start:
+            f.seek(start)
+        pos = f.tell()
+        for line in f:
+            pos += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(row, dict):
+                yield pos, row
+
+
+def read_parquet(path, start=0, batch_rows=10000):
+    """(lignes lues, ligne dict), par record batch : seules `batch_rows` lignes sont en mémoire."""
+    import pyarrow.parquet as pq
+
+    pos = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_rows):
+        if pos + batch.num_rows <= start:
+            pos += batch.num_rows
+            continue
+        for row in batch.to_pylist():
+            pos += 1
+            if pos > start:
+                yield pos, row
+
+
+def open_source(path, fmt=None, delimiter=",", start=0):
+    fmt = fmt or detect_format(path)
+    if fmt == "csv":
+        return read_csv(path, delimiter, start)
+    if fmt == "jsonl":
+        return read_jsonl(path, start)
+    if fmt == "parquet":
+        return read_parquet(path, start)
+    raise ValueError(f"format inconnu: {fmt} ({', '.join(FORMATS)})")
+
+
+def source_size(path, fmt=None):
+    """Position de fin de fichier (octets, ou lignes pour Parquet) : fin de l'import."""
+    if (fmt or detect_format(path)) == "parquet":
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+    return os.path.getsize(path)
+
+
+def split_csv(path, chunk_bytes=CHUNK_BYTES):
+    """
+    (entête, [(début, fin), ...]) : plages d'octets d'environ `chunk_bytes`,
+    coupées sur des fins de ligne hors guillemets (un résumé peut contenir
+    des retours à la ligne). Un seul passage séquentiel, sans parsing CSV.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as f:
+        header = f.readline()
+        start = pos = f.tell()
+        in_quotes = False
+        for line in f:
+            if line.count(b'"') % 2:
+                in_quotes = not in_quotes
+            pos += len(line)
+            if not in_quotes and pos - start >= chunk_bytes:
+                ranges.append((start, pos))
+                start = pos
+    if start < size:
+        ranges.append((start, size))
+    return header, ranges
+
+
+def read_csv_range(path, header, start, end, delimiter=","):
+    """Lignes dict d'une plage de split_csv (worker du mode parallèle)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    text = (header + data).decode("utf-8", errors="ignore")
+    return csv.DictReader(io.StringIO(text, newline=""), delimiter=delimiter)
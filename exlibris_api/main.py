@@ -1,57 +1,176 @@
 from fastapi import FastAPI, HTTPException, Query, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import joblib
-from pathlib import Path
-import pandas as pd
-import json
-from scipy.sparse import load_npz
-from sklearn.metrics.pairwise import linear_kernel
 from core.database import get_db_connection
-from core.config import DB_NAME, ALLOWED_ORIGINS
-from dependencies.auth import get_current_user_id
+from core.config import (
+    DB_NAME,
+    ALLOWED_ORIGINS,
+    RECO_CANDIDATES_LIMIT,
+    RECO_HYBRID_CONTENT_WEIGHT,
+    ML_INFERENCE_WORKERS,
+    ML_INFERENCE_MAX_IN_FLIGHT,
+    ML_INFERENCE_MAX_QUEUE,
+    ML_BATCH_MAX_WAIT_MS,
+    ML_BATCH_MAX_ROWS,
+    ML_REGISTRY_POLL_SECONDS,
+    ML_LOAD_MODE,
+    RECO_SEGMENTS_ENABLED,
+    RECO_SEGMENT_MAX_OWNED,
+    RECO_SEGMENT_DEPTH,
+)
+from dependencies.auth import get_current_admin_id, get_current_user_id
 from routers.auth import router as auth_router
 from routers.exchanges import router as exchanges_router
 from routers.payments import router as payments_router
 from routers.stripe import router as stripe_router
+from services.inference_pool import InferenceExecutor, InferenceOverloaded
+from services.micro_batch import MicroBatcher
+from services.reco_cache import RECO_CACHE
+from services.reco_segments import SEGMENT_SQL, age_bucket
+from services.ml_models import ML_DIR, ModelBundle, load_model_bundle
+from services.model_registry import (
+    RegistryError,
+    current_release_dir,
+    current_version,
+    list_releases,
+    previous_version,
+    release_dir,
+    set_current,
+)
+from starlette.concurrency import run_in_threadpool
 from contextlib import asynccontextmanager
+import asyncio
+import sys
+import time
+
+import pymysql
+
 
-ML_PIPELINE = None
-ML_PATH = Path(__file__).parent / "ml" / "reco_pipeline.pkl"
+def _scoring():
+    """services.reco_scoring (numpy, pandas, scipy) n'est importé qu'au premier appel ML."""
+    import services.reco_scoring as reco_scoring
+    return reco_scoring
 
-TFIDF_VECT = None
-TFIDF_MATRIX = None
-TFIDF_META = None
 
-TFIDF_VECT_PATH = Path(__file__).parent / "ml" / "tfidf_vectorizer.pkl"
-TFIDF_MATRIX_PATH = Path(__file__).parent / "ml" / "tfidf_matrix.npz"
-TFIDF_META_PATH = Path(__file__).parent / "ml" / "tfidf_meta.json"
+# artefacts ML (remplacés d'un bloc au démarrage)
+ML_MODELS = ModelBundle()
+
+# calculs ML (predict_proba, produits TF-IDF) isolés du trafic CRUD
+ML_EXECUTOR = InferenceExecutor(
+    workers=ML_INFERENCE_WORKERS,
+    max_in_flight=ML_INFERENCE_MAX_IN_FLIGHT,
+    max_queue=ML_INFERENCE_MAX_QUEUE,
+)
+
+# regroupe les /me/recommendations simultanés en un seul predict_proba
+ML_RECO_BATCHER = MicroBatcher(
+    ML_EXECUTOR,
+    "services.reco_scoring:score_candidates_batch",
+    max_batch_rows=ML_BATCH_MAX_ROWS,
+    max_wait_ms=ML_BATCH_MAX_WAIT_MS,
+)
+
+# une seule bascule de modèles à la fois (watcher / endpoints admin)
+ML_SWAP_LOCK = asyncio.Lock()
+
+# premier chargement des modèles (mode eager, tâche de fond ou premier appel ML)
+ML_LOAD_LOCK = asyncio.Lock()
+ML_STATE = {"mode": ML_LOAD_MODE, "status": "idle", "load_seconds": None, "error": None}
+ML_TASKS: list = []
+
+# /me/recommendations servies depuis RecommandationSegment vs scorées en direct
+RECO_SEGMENT_STATS = {"segment": 0, "live": 0}
+
+
+async def _ensure_models() -> None:
+    """Charge les modèles une seule fois, même avec des requêtes concurrentes."""
+    global ML_MODELS
+
+    if ML_STATE["status"] == "ready":
+        return
+    async with ML_LOAD_LOCK:
+        if ML_STATE["status"] == "ready":
+            return
+        ML_STATE.update(status="loading", error=None)
+        t0 = time.perf_counter()
+        try:
+            bundle = await run_in_threadpool(load_model_bundle)
+            ML_EXECUTOR.start(bundle)
+        except Exception as e:
+            # les endpoints ML répondent 503 ; nouvel essai au prochain appel
+            ML_STATE.update(status="failed", error=str(e))
+            print(f"[ML] Chargement impossible: {e}")
+            return
+        ML_MODELS = bundle
+        ML_STATE.update(status="ready", load_seconds=round(time.perf_counter() - t0, 3))
+        if ML_REGISTRY_POLL_SECONDS > 0:
+            ML_TASKS.append(asyncio.create_task(_watch_registry()))
+
+
+async def _swap_models(version: Optional[str] = None) -> str:
+    """
+    Charge une version (checksums vérifiés) puis la substitue à ML_MODELS.
+    Sans `version`, prend celle de ml/CURRENT ; sinon ml/CURRENT est
+    repointé vers `version` une fois le chargement réussi (rollback).
+    Les requêtes en cours gardent leur référence à l'ancien bundle ; en
+    mode process, le nouveau pool est prêt avant que l'ancien soit arrêté.
+    """
+    global ML_MODELS
+
+    async with ML_SWAP_LOCK:
+        target_dir = release_dir(ML_DIR, version) if version else current_release_dir(ML_DIR)
+        bundle = await run_in_threadpool(load_model_bundle, target_dir, True, True)
+        if bundle.version != ML_MODELS.version:
+            await ML_EXECUTOR.reload(bundle, target_dir)
+            previous, ML_MODELS = ML_MODELS.version, bundle
+            RECO_CACHE.clear()
+            print(f"[ML] Modèles basculés: {previous or '-'} -> {bundle.version}")
+        if version:
+            set_current(ML_DIR, version)
+        return bundle.version
+
+
+async def _watch_registry():
+    """Suit ml/CURRENT : chaque worker uvicorn converge vers la version publiée."""
+    while True:
+        await asyncio.sleep(ML_REGISTRY_POLL_SECONDS)
+        try:
+            version = current_version(ML_DIR)
+            if version and version != ML_MODELS.version:
+                await _swap_models()
+        except Exception as e:
+            print(f"[ML] Rechargement impossible: {e}")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global ML_PIPELINE, TFIDF_VECT, TFIDF_MATRIX, TFIDF_META
+    if ML_LOAD_MODE == "eager":
+        await _ensure_models()
+    elif ML_LOAD_MODE == "background":
+        # le worker accepte le trafic non-ML pendant le chargement
+        ML_TASKS.append(asyncio.create_task(_ensure_models()))
 
-    try:
-        ML_PIPELINE = joblib.load(ML_PATH)
-        print("[ML] reco_pipeline chargé.")
-    except Exception as e:
-        ML_PIPELINE = None
-        print(f"[ML] Impossible de charger le modèle: {e}")
+    yield
+
+    for task in ML_TASKS:
+        task.cancel()
+    ML_EXECUTOR.shutdown()
 
+
+async def _run_inference(fn, *args):
     try:
-        TFIDF_VECT = joblib.load(TFIDF_VECT_PATH)
-        TFIDF_MATRIX = load_npz(TFIDF_MATRIX_PATH)
-        with open(TFIDF_META_PATH, "r", encoding="utf-8") as f:
-            TFIDF_META = json.load(f)
-        print("[ML] TFIDF modèle livres chargé.")
-    except Exception as e:
-        TFIDF_VECT = None
-        TFIDF_MATRIX = None
-        TFIDF_META = None
-        print(f"[ML] Impossible de charger TFIDF: {e}")
+        return await ML_EXECUTOR.submit(fn, *args)
+    except InferenceOverloaded:
+        raise HTTPException(status_code=503, detail="Service de recommandation saturé, réessayez")
 
-    yield
+
+async def _run_batched(batcher: MicroBatcher, job, rows: int):
+    try:
+        return await batcher.submit(job, rows)
+    except InferenceOverloaded:
+        raise HTTPException(status_code=503, detail="Service de recommandation saturé, réessayez")
 
 
 app = FastAPI(
@@ -119,11 +238,25 @@ class SimilarBookOut(BaseModel):
     image: Optional[str] = None
     similarity: float
 
+class SemanticBookOut(BaseModel):
+    isbn: str
+    titre: str
+    auteur: str
+    editeur: Optional[str] = None
+    categorie: Optional[str] = None
+    langue: Optional[str] = None
+    image: Optional[str] = None
+    score: float
+
 class RecommendationOut(BaseModel):
     isbn: str
     titre: str
     auteur: str
     score: float
+    # mode hybride uniquement : détail des deux signaux + celui qui domine
+    score_gbm: Optional[float] = None
+    score_contenu: Optional[float] = None
+    signal: Optional[str] = None
 
 
 # --------------------------------------------------------------------
@@ -133,11 +266,13 @@ class RecommendationOut(BaseModel):
 # Sécurité / Dépendance user courant
 # --------------------------------------------------------------------
 
-@app.get("/me/recommendations", response_model=List[RecommendationOut])
-def me_recommendations(limit: int = 10, current_user_id: int = Depends(get_current_user_id)):
-    if ML_PIPELINE is None:
-        raise HTTPException(status_code=503, detail="Modèle IA non disponible")
-
+def _fetch_reco_inputs(current_user_id: int, with_ratings: bool, segment_version: Optional[str] = None):
+    """
+    Profil, collection, notes (optionnel) et candidats depuis MariaDB.
+    Avec `segment_version`, un utilisateur qui a au plus RECO_SEGMENT_MAX_OWNED
+    livres reçoit le classement précalculé de son segment (hors livres
+    possédés) à la place des candidats : books vaut alors None.
+    """
     conn = get_db_connection()
     cur = conn.cursor()
 
@@ -161,91 +296,252 @@ def me_recommendations(limit: int = 10, current_user_id: int = Depends(get_curre
         """, (current_user_id,))
         owned = {r[0] for r in cur.fetchall()}
 
+        # Démarrage à froid : classement du segment (tranche d'âge, pays), sans modèle
+        segment = None
+        if segment_version and len(owned) <= RECO_SEGMENT_MAX_OWNED:
+            try:
+                cur.execute(SEGMENT_SQL, (segment_version, age_bucket(age), pays))
+                segment = [r for r in cur.fetchall() if r[0] not in owned] or None
+            except pymysql.MySQLError:
+                # migration 004 pas encore appliquée : scoring complet
+                segment = None
+
+        # Notes (profil de contenu du mode hybride)
+        ratings = {}
+        if with_ratings:
+            cur.execute("""
+                SELECT livre_isbn, note FROM Evaluation WHERE utilisateur_id = %s
+            """, (current_user_id,))
+            ratings = {r[0]: r[1] for r in cur.fetchall()}
+
         # Candidats: derniers livres (tu peux changer la stratégie)
-        cur.execute("""
-            SELECT
-                l.isbn, l.titre, COALESCE(l.auteur, ''),
-                COALESCE(l.langue, 'UNK'),
-                COALESCE(c.nomcat, 'UNK') AS categorie,
-                COALESCE(YEAR(l.date_publication), 0) AS annee_publication,
-                COALESCE(l.resume, '') AS resume
-            FROM Livre l
-            LEFT JOIN Categorie c ON c.id = l.categorie_id
-            ORDER BY l.date_publication DESC
-            LIMIT 500
-        """)
-        books = cur.fetchall()
+        books = None
+        if segment is None:
+            cur.execute(_scoring().CANDIDATES_SQL, (RECO_CANDIDATES_LIMIT,))
+            books = cur.fetchall()
 
+    except HTTPException:
+        raise
     except Exception as e:
         conn.close()
         raise HTTPException(status_code=500, detail=f"Erreur MariaDB: {e}")
 
     conn.close()
+    return age, pays, owned, ratings, books, segment
+
+
+@app.get("/me/recommendations", response_model=List[RecommendationOut])
+async def me_recommendations(
+    limit: int = 10,
+    mode: str = Query(
+        default="gbm",
+        pattern="^(gbm|hybrid)$",
+        description="gbm = modèle démographique seul ; hybrid = GBM + similarité TF-IDF au profil",
+    ),
+    content_weight: float = Query(
+        default=RECO_HYBRID_CONTENT_WEIGHT,
+        ge=0.0,
+        le=1.0,
+        description="Poids du signal contenu en mode hybride (0 = GBM seul, 1 = contenu seul)",
+    ),
+    current_user_id: int = Depends(get_current_user_id),
+):
+    await _ensure_models()
+    if ML_MODELS.pipeline is None:
+        raise HTTPException(status_code=503, detail="Modèle IA non disponible")
+
+    hybrid = mode == "hybrid"
+    if hybrid and not ML_MODELS.has_tfidf:
+        raise HTTPException(status_code=503, detail="Modèle TF-IDF non disponible")
+
+    limit = max(1, limit)
+    variant = (ML_MODELS.version, mode, round(content_weight, 3) if hybrid else None)
+    cached = RECO_CACHE.get(current_user_id, variant, limit)
+    if cached is not None:
+        return cached
+    # une écriture pendant le calcul ne doit pas laisser un résultat périmé en cache
+    generation = RECO_CACHE.generation(current_user_id)
+
+    # le classement d'un segment ne vaut que pour le GBM seul (pas de profil de contenu)
+    segment_version = ML_MODELS.version if RECO_SEGMENTS_ENABLED and not hybrid else None
+    age, pays, owned, ratings, books, segment = await run_in_threadpool(
+        _fetch_reco_inputs, current_user_id, hybrid, segment_version
+    )
+
+    if segment is not None and len(segment) >= limit:
+        RECO_SEGMENT_STATS["segment"] += 1
+        items = [
+            RecommendationOut(isbn=r[0], titre=r[1], auteur=r[2], score=round(float(r[3]), 4))
+            for r in segment
+        ]
+        # classement tronqué à RECO_SEGMENT_DEPTH : un limit plus grand repasse par le modèle
+        RECO_CACHE.put(current_user_id, variant, items, complete=False, generation=generation)
+        return items[:limit]
+    if books is None:
+        # segment trop court pour ce limit : scoring complet
+        age, pays, owned, ratings, books, _ = await run_in_threadpool(
+            _fetch_reco_inputs, current_user_id, hybrid
+        )
+    RECO_SEGMENT_STATS["live"] += 1
 
     # Filtrer déjà en collection
     candidates = [b for b in books if b[0] not in owned]
     if not candidates:
+        RECO_CACHE.put(current_user_id, variant, [], complete=True, generation=generation)
         return []
 
-    # Construire DataFrame batch pour le pipeline
-    X = pd.DataFrame([{
-        "age": age,
-        "pays": pays,
-        "langue": b[3],
-        "categorie": b[4],
-        "annee_publication": int(b[5] or 0),
-        "resume": b[6],
-    } for b in candidates])
-
-    proba = ML_PIPELINE.predict_proba(X)[:, 1]
-
-    scored = []
-    for i, b in enumerate(candidates):
-        scored.append((b[0], b[1], b[2], float(proba[i])))
+    weights = _scoring().profile_weights(owned, ratings) if hybrid else None
+    scores, proba, content, dominant = await _run_batched(
+        ML_RECO_BATCHER, (age, pays, candidates, weights, content_weight), len(candidates)
+    )
 
-    scored.sort(key=lambda x: x[3], reverse=True)
-    top = scored[:max(1, limit)]
+    # on classe (et met en cache) au moins `depth` éléments pour servir les limit suivants
+    order = _scoring().top_k(scores, max(limit, RECO_CACHE.depth))
+    if not hybrid:
+        items = [
+            RecommendationOut(
+                isbn=candidates[i][0],
+                titre=candidates[i][1],
+                auteur=candidates[i][2],
+                score=round(float(proba[i]), 4),
+            )
+            for i in order
+        ]
+    else:
+        items = [
+            RecommendationOut(
+                isbn=candidates[i][0],
+                titre=candidates[i][1],
+                auteur=candidates[i][2],
+                score=round(float(scores[i]), 4),
+                score_gbm=round(float(proba[i]), 4),
+                score_contenu=round(float(content[i]), 4),
+                signal=str(dominant[i]),
+            )
+            for i in order
+        ]
 
-    return [
-        RecommendationOut(isbn=s[0], titre=s[1], auteur=s[2], score=round(s[3], 4))
-        for s in top
-    ]
+    RECO_CACHE.put(current_user_id, variant, items, complete=len(items) == len(candidates), generation=generation)
+    return items[:limit]
 
 @app.get("/reco/similar", response_model=List[SimilarBookOut])
-def reco_similar(isbn: str, limit: int = 6):
-    if TFIDF_MATRIX is None or TFIDF_META is None:
+async def reco_similar(
+    isbn: str,
+    limit: int = 6,
+    widen: bool = Query(
+        default=False,
+        description="Chercher dans tout le corpus au lieu de la partition (langue/catégorie) du livre",
+    ),
+):
+    await _ensure_models()
+    if not ML_MODELS.has_tfidf:
         raise HTTPException(status_code=503, detail="Modèle TF-IDF non disponible")
 
-    # retrouver l'index du livre dans meta
-    idx = None
-    for i, item in enumerate(TFIDF_META):
-        if str(item.get("isbn")) == str(isbn):
-            idx = i
-            break
-
-    if idx is None:
+    # par défaut: uniquement la partition du livre (même langue, voire même catégorie)
+    similar = await _run_inference(_scoring().similar_books, isbn, limit, widen)
+    if similar is None:
         raise HTTPException(status_code=404, detail="ISBN introuvable dans l'index TF-IDF")
 
-    sims = linear_kernel(TFIDF_MATRIX[idx], TFIDF_MATRIX).flatten()
-    order = sims.argsort()[::-1]
-
-    results = []
-    for j in order:
-        if j == idx:
-            continue
-        it = TFIDF_META[int(j)]
-        results.append(SimilarBookOut(
+    return [
+        SimilarBookOut(
             isbn=it.get("isbn", ""),
             titre=it.get("titre", ""),
             auteur=it.get("auteur", ""),
             editeur=it.get("editeur", None),
             image=it.get("image", None),
-            similarity=float(sims[int(j)]),
-        ))
-        if len(results) >= max(1, limit):
-            break
+            similarity=sim,
+        )
+        for it, sim in similar
+    ]
+
+
+@app.get("/ml/versions")
+def ml_versions(admin_id: int = Depends(get_current_admin_id)):
+    """Versions publiées (manifest sans les checksums), courante et servie par ce worker."""
+    return {
+        "current": current_version(ML_DIR),
+        "served": ML_MODELS.version,
+        "releases": [
+            {k: v for k, v in m.items() if k != "checksums"}
+            for m in list_releases(ML_DIR)
+        ],
+    }
+
+
+@app.post("/ml/reload")
+async def ml_reload(admin_id: int = Depends(get_current_admin_id)):
+    """Recharge la version pointée par ml/CURRENT sans redémarrer."""
+    await _ensure_models()
+    try:
+        version = await _swap_models()
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"ok": True, "version": version}
+
+
+@app.post("/ml/rollback")
+async def ml_rollback(
+    version: Optional[str] = Query(default=None, description="Version cible (défaut: la précédente)"),
+    admin_id: int = Depends(get_current_admin_id),
+):
+    """
+    Repointe ml/CURRENT vers `version` (ou la version précédente) et la
+    charge ; les autres workers suivent via le watcher.
+    """
+    await _ensure_models()
+    target = version or previous_version(ML_DIR, ML_MODELS.version)
+    if not target:
+        raise HTTPException(status_code=404, detail="Aucune version précédente")
+    if target not in {m["version"] for m in list_releases(ML_DIR)}:
+        raise HTTPException(status_code=404, detail=f"Version inconnue: {target}")
+    try:
+        await _swap_models(target)
+    except RegistryError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"ok": True, "version": target}
+
+
+@app.get("/ready")
+def readiness():
+    """
+    Ce qui est chargé dans ce worker (modèles, modules lourds).
+    503 tant que les modèles ne sont pas prêts, sauf en mode lazy où le
+    worker sert le trafic non-ML sans eux.
+    """
+    ready = ML_STATE["status"] == "ready" or (ML_LOAD_MODE == "lazy" and ML_STATE["status"] != "failed")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "ml": {
+                **ML_STATE,
+                "version": ML_MODELS.version or None,
+                "pipeline": ML_MODELS.pipeline is not None,
+                "scorer": ML_MODELS.scorer is not None,
+                "tfidf": ML_MODELS.has_tfidf,
+                "partitions": len(ML_MODELS.tfidf_partitions),
+            },
+            "modules": {m: m in sys.modules for m in ("numpy", "scipy", "pandas", "sklearn", "joblib")},
+        },
+    )
 
-    return results
+
+@app.get("/ml/metrics")
+def ml_metrics(admin_id: int = Depends(get_current_admin_id)):
+    """Exécuteur d'inférence (file, latences), micro-batches, cache et segments des recommandations (admin)."""
+    return {
+        "model_loading": ML_STATE,
+        "model_version": ML_MODELS.version,
+        "inference": ML_EXECUTOR.metrics(),
+        "reco_batching": ML_RECO_BATCHER.metrics(),
+        "reco_cache": RECO_CACHE.metrics(),
+        "reco_segments": {
+            "enabled": RECO_SEGMENTS_ENABLED,
+            "max_owned": RECO_SEGMENT_MAX_OWNED,
+            "depth": RECO_SEGMENT_DEPTH,
+            **RECO_SEGMENT_STATS,
+        },
+    }
 
 
 # --------------------------------------------------------------------
@@ -397,6 +693,37 @@ def search_livres(
     ]
 
 
+@app.get("/livres/semantic", response_model=List[SemanticBookOut])
+async def semantic_search_livres(
+    q: str = Query(..., description="Texte libre, ex: roman policier à Paris"),
+    limit: int = Query(default=20, le=100, description="Nombre maximum de livres renvoyés"),
+):
+    """
+    Recherche par pertinence (TF-IDF titre/auteur/éditeur/résumé/catégorie)
+    sans passer par MariaDB : la requête est projetée avec le vectorizer
+    chargé au démarrage puis comparée à la matrice TF-IDF.
+
+    /livres/semantic?q=roman policier à Paris
+    """
+    await _ensure_models()
+    if ML_MODELS.tfidf_vect is None or not ML_MODELS.has_tfidf:
+        raise HTTPException(status_code=503, detail="Modèle TF-IDF non disponible")
+
+    return [
+        SemanticBookOut(
+            isbn=it.get("isbn", ""),
+            titre=it.get("titre", ""),
+            auteur=it.get("auteur", ""),
+            editeur=it.get("editeur") or None,
+            categorie=it.get("categorie") or None,
+            langue=it.get("langue") or None,
+            image=it.get("image") or None,
+            score=round(score, 4),
+        )
+        for it, score in await _run_inference(_scoring().semantic_search, q, limit)
+    ]
+
+
 # --------------------------------------------------------------------
 # Collection utilisateur (stockée en base, table Collection)
 # --------------------------------------------------------------------
@@ -528,6 +855,7 @@ def add_collection(item: AddItem, current_user_id: int = Depends(get_current_use
         raise HTTPException(status_code=500, detail=f"Erreur MariaDB: {e}")
 
     conn.close()
+    RECO_CACHE.invalidate_user(current_user_id)
     return {"ok": True}
 
 
@@ -563,6 +891,7 @@ def remove_collection(
             status_code=404, detail="Livre non présent dans la collection"
         )
 
+    RECO_CACHE.invalidate_user(current_user_id)
     return {"ok": True}
 
 
@@ -996,6 +1325,7 @@ def add_or_update_rating(body: RatingBody, current_user_id: int = Depends(get_cu
         raise HTTPException(status_code=500, detail=f"Erreur MariaDB: {e}")
 
     conn.close()
+    RECO_CACHE.invalidate_user(current_user_id)
     return RatingOut(isbn=body.isbn, note=body.note, avis=body.avis)
 
 
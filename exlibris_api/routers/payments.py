@@ -10,6 +10,7 @@ from schemas.payment import (
     ExchangePaymentOut,
     row_to_exchange_payment,
 )
+from services.reco_cache import RECO_CACHE
 
 
 router = APIRouter(tags=["payments"])
@@ -497,6 +498,8 @@ def confirm_exchange_reception(
     finally:
         conn.close()
 
+    # les collections des deux utilisateurs ont changé
+    RECO_CACHE.invalidate_user(demandeur_id, destinataire_id)
     return row_to_exchange(row)
 
 
@@ -0,0 +1,120 @@
+"""
+Complète date_publication des livres où elle est NULL avec une date stable
+(dérivée du SHA-1 de l'ISBN) et réaliste : 10 % 1950-1989, 35 % 1990-2009,
+55 % 2010-2024.
+
+  1. une requête sur l'index ix_livre_date_publication pour les ISBN à NULL
+  2. toutes les dates calculées en une passe NumPy
+  3. écriture par chunks : INSERT multi-lignes dans une table temporaire,
+     puis un UPDATE Livre JOIN ... par chunk, commit par chunk
+
+Relançable : seuls les livres encore à NULL sont relus et mis à jour.
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.backfill_publication_dates
+    python -m scripts.backfill_publication_dates --chunk-size 50000 --dry-run
+
+La migration bdd/migrations/005_livre_date_publication.sql doit être appliquée.
+"""
+import argparse
+import hashlib
+import time
+
+import numpy as np
+
+from core.database import get_db_connection
+
+DEFAULT_CHUNK_SIZE = 10000
+
+# (part cumulée, première année, dernière année)
+ERAS = ((0.10, 1950, 1989), (0.45, 1990, 2009), (1.00, 2010, 2024))
+
+
+def stable_dates(isbns):
+    """Dates 'AAAA-MM-JJ' (tableau NumPy), la même pour un ISBN donné d'un lancement à l'autre."""
+    if not isbns:
+        return np.array([], dtype=str)
+    digests = b"".join(hashlib.sha1(isbn.encode("utf-8", errors="ignore")).digest() for isbn in isbns)
+    words = np.frombuffer(digests, dtype="<u4").reshape(-1, 5).astype(np.int64)
+
+    # années pondérées (beaucoup de récents)
+    p = words[:, 0] / 2**32
+    era = np.searchsorted([share for share, _, _ in ERAS], p, side="right")
+    first = np.array([lo for _, lo, _ in ERAS])[era]
+    span = np.array([hi - lo + 1 for _, lo, hi in ERAS])[era]
+    year = first + words[:, 1] % span
+    month = words[:, 2] % 12
+    day = words[:, 3] % 28  # safe pour tous les mois
+
+    dates = (year - 1970).astype("M8[Y]").astype("M8[M]") + month.astype("m8[M]")
+    return (dates.astype("M8[D]") + day.astype("m8[D]")).astype(str)
+
+
+def backfill_publication_dates(conn, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """Nombre de livres mis à jour."""
+    cur = conn.cursor()
+    try:
+        t0 = time.perf_counter()
+        cur.execute("SELECT isbn FROM Livre WHERE date_publication IS NULL")
+        isbns = [r[0] for r in cur.fetchall()]
+        if not isbns:
+            print("✅ date_publication déjà renseignée pour tous les livres.")
+            return 0
+        dates = stable_dates(isbns)
+        print(f"🛠️ date_publication manquante: {len(isbns)} livres "
+              f"(lecture + calcul en {time.perf_counter() - t0:.1f} s)")
+        if dry_run:
+            for isbn, d in list(zip(isbns, dates))[:5]:
+                print(f"  {isbn} -> {d}")
+            return 0
+
+        cur.execute("DROP TEMPORARY TABLE IF EXISTS livre_date_import")
+        cur.execute("""
+            CREATE TEMPORARY TABLE livre_date_import (
+                isbn             VARCHAR(13) NOT NULL PRIMARY KEY,
+                date_publication DATE NOT NULL
+            ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+        """)
+        updated = 0
+        t0 = time.perf_counter()
+        for start in range(0, len(isbns), chunk_size):
+            rows = list(zip(isbns[start:start + chunk_size], dates[start:start + chunk_size].tolist()))
+            cur.executemany("INSERT INTO livre_date_import (isbn, date_publication) VALUES (%s, %s)", rows)
+            # IS NULL : une date saisie entre-temps n'est pas écrasée
+            cur.execute("""
+                UPDATE Livre l
+                JOIN livre_date_import d ON d.isbn = l.isbn
+                SET l.date_publication = d.date_publication
+                WHERE l.date_publication IS NULL
+            """)
+            updated += cur.rowcount
+            cur.execute("DELETE FROM livre_date_import")
+            conn.commit()
+            done = start + len(rows)
+            elapsed = time.perf_counter() - t0
+            print(f"  ...progress {done}/{len(isbns)} (updated={updated}, {done / max(elapsed, 1e-9):.0f} lignes/s)")
+        cur.execute("DROP TEMPORARY TABLE livre_date_import")
+        print(f"✅ dates ajoutées: {updated} en {time.perf_counter() - t0:.1f} s")
+        return updated
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Complète date_publication (NULL) dans Livre")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="livres par UPDATE")
+    parser.add_argument("--dry-run", action="store_true", help="compte et affiche quelques dates, sans écrire")
+    args = parser.parse_args(argv)
+
+    conn = get_db_connection()
+    try:
+        backfill_publication_dates(conn, args.chunk_size, args.dry_run)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
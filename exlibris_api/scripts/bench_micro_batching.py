@@ -0,0 +1,116 @@
+"""
+Benchmark du micro-batching de /me/recommendations.
+
+Simule N clients concurrents qui demandent chacun un scoring GBM de
+--candidates lignes, avec et sans micro-batching (plusieurs attentes
+maximales), et affiche débit (req/s), latence p50/p95 et taille moyenne
+des lots. Les candidats sont synthétiques (mêmes colonnes que
+CANDIDATES_SQL) : pas besoin de MariaDB, seulement de ml/reco_pipeline.pkl.
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.bench_micro_batching
+    python -m scripts.bench_micro_batching --concurrency 1 8 32 --wait-ms 0 1 2 5 --workers 2
+"""
+import argparse
+import asyncio
+import random
+import time
+from pathlib import Path
+
+import numpy as np
+
+from services.inference_pool import InferenceExecutor
+from services.micro_batch import MicroBatcher
+from services.ml_models import load_model_bundle
+from services.reco_scoring import score_candidates_batch
+
+LANGUES = ["fr", "en", "es", "de", "it", "UNK"]
+CATEGORIES = ["Fiction", "Romance", "History", "Science", "Juvenile Fiction", "UNK"]
+PAYS = ["france", "usa", "canada", "spain", "germany", "UNK"]
+WORDS = "livre roman histoire amour guerre enfant science voyage mystère famille ville nuit".split()
+
+
+def make_candidates(n: int, rng: random.Random) -> list:
+    return [
+        (
+            f"978{rng.randrange(10**9, 10**10)}",
+            "Titre",
+            "Auteur",
+            rng.choice(LANGUES),
+            rng.choice(CATEGORIES),
+            rng.randrange(1950, 2024),
+            " ".join(rng.choices(WORDS, k=30)),
+        )
+        for _ in range(n)
+    ]
+
+
+async def run_config(bundle, workers: int, ml_dir: Path, wait_ms: float, max_rows: int,
+                     concurrency: int, requests: int, candidates: list) -> dict:
+    executor = InferenceExecutor(workers=workers, max_in_flight=0, max_queue=10**6)
+    executor.start(bundle, ml_dir)
+    batcher = MicroBatcher(executor, score_candidates_batch, max_batch_rows=max_rows, max_wait_ms=wait_ms)
+    try:
+        # chauffe (process workers / caches sklearn)
+        await batcher.submit((30, "france", candidates, None, 0.0), len(candidates))
+
+        latencies = []
+        remaining = requests
+
+        async def client(i: int):
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                job = (20 + i % 50, PAYS[i % len(PAYS)], candidates, None, 0.0)
+                t0 = time.perf_counter()
+                await batcher.submit(job, len(candidates))
+                latencies.append(time.perf_counter() - t0)
+
+        warm = batcher.metrics()
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - t0
+    finally:
+        executor.shutdown()
+
+    lat = np.array(latencies) * 1000
+    m = batcher.metrics()
+    # lot de chauffe exclu
+    batches = m["batches"] - warm["batches"]
+    return {
+        "req_s": len(latencies) / elapsed,
+        "p50": float(np.percentile(lat, 50)),
+        "p95": float(np.percentile(lat, 95)),
+        "jobs_per_batch": (m["jobs"] - warm["jobs"]) / max(batches, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ml-dir", type=Path, default=None, help="défaut: version courante du registre")
+    parser.add_argument("--candidates", type=int, default=500, help="lignes par requête (RECO_CANDIDATES_LIMIT)")
+    parser.add_argument("--requests", type=int, default=400, help="requêtes par configuration")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--wait-ms", type=float, nargs="+", default=[0.0, 1.0, 2.0, 5.0],
+                        help="attente max du batcher (0 = sans micro-batching)")
+    parser.add_argument("--max-rows", type=int, default=4096)
+    parser.add_argument("--workers", type=int, default=0, help="ML_INFERENCE_WORKERS")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    bundle = load_model_bundle(args.ml_dir)
+    if bundle.pipeline is None:
+        raise SystemExit(f"reco_pipeline.pkl introuvable dans {bundle.ml_dir}")
+    candidates = make_candidates(args.candidates, random.Random(args.seed))
+
+    print(f"{args.candidates} lignes/requête, {args.requests} requêtes, workers={args.workers}, max_rows={args.max_rows}")
+    print(f"{'clients':>7} {'wait_ms':>7} {'req/s':>8} {'p50(ms)':>8} {'p95(ms)':>8} {'jobs/lot':>8}")
+    for concurrency in args.concurrency:
+        for wait_ms in args.wait_ms:
+            r = asyncio.run(run_config(bundle, args.workers, bundle.ml_dir, wait_ms, args.max_rows,
+                                       concurrency, args.requests, candidates))
+            print(f"{concurrency:>7} {wait_ms:>7.1f} {r['req_s']:>8.1f} {r['p50']:>8.1f} {r['p95']:>8.1f} {r['jobs_per_batch']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
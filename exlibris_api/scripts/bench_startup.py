@@ -0,0 +1,135 @@
+"""
+Benchmark du démarrage d'un worker API selon ML_LOAD_MODE.
+
+Pour chaque mode (eager / background / lazy), dans un sous-processus neuf :
+  - import_ms   : `import main`
+  - startup_ms  : lifespan (ce que uvicorn attend avant d'accepter le trafic)
+  - ready_ms    : jusqu'à ce que /ready réponde 200
+  - first_ml_ms : premier /livres/semantic (charge les modèles en mode lazy)
+  - RSS après démarrage, et si numpy/pandas/sklearn sont importés
+
+--importtime affiche en plus les modules les plus coûteux de
+`python -X importtime -c "import main"`, et --ref <commit> fait la même
+mesure sur une autre révision (worktree git temporaire) pour comparer
+avant / après.
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.bench_startup
+    python -m scripts.bench_startup --importtime --ref HEAD~1
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+WORKER_CODE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t_import = time.perf_counter() - t0
+
+from fastapi.testclient import TestClient
+
+t0 = time.perf_counter()
+with TestClient(main.app) as client:
+    t_startup = time.perf_counter() - t0
+    heavy_after_startup = [m for m in ("numpy", "pandas", "sklearn") if m in sys.modules]
+    with open("/proc/self/status") as f:
+        rss = next(int(l.split()[1]) for l in f if l.startswith("VmRSS"))
+    while client.get("/ready").status_code != 200 and time.perf_counter() - t0 < 120:
+        time.sleep(0.005)
+    t_ready = time.perf_counter() - t0
+    t1 = time.perf_counter()
+    status = client.get("/livres/semantic", params={"q": "roman histoire"}).status_code
+    t_first = time.perf_counter() - t1
+
+print(json.dumps({
+    "import_ms": 1000 * t_import,
+    "startup_ms": 1000 * t_startup,
+    "ready_ms": 1000 * t_ready,
+    "first_ml_ms": 1000 * t_first,
+    "first_ml_status": status,
+    "rss_mb": rss / 1024,
+    "heavy": heavy_after_startup,
+}))
+"""
+
+
+def run_mode(mode: str, cwd: Path) -> dict:
+    env = {**os.environ, "ML_LOAD_MODE": mode, "ML_REGISTRY_POLL_SECONDS": "0"}
+    out = subprocess.run(
+        [sys.executable, "-c", WORKER_CODE],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def importtime(cwd: Path, top: int) -> tuple[float, list]:
+    """(ms total pour `import main`, [(ms cumulés, module)] les plus lourds)."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=cwd, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, cumulative_us, name = line.replace("import time:", "|", 1).split("|")
+        # le nom garde son indentation (profondeur d'import)
+        rows.append((int(cumulative_us) / 1000, name[1:].rstrip()))
+    total = next(ms for ms, name in rows if name == "main")
+    # modules de premier niveau sous main (indentation = profondeur d'import)
+    direct = sorted(((ms, n.strip()) for ms, n in rows if n.startswith("  ") and not n.startswith("   ")),
+                    reverse=True)
+    return total, direct[:top]
+
+
+def print_importtime(label: str, cwd: Path, top: int) -> None:
+    total, direct = importtime(cwd, top)
+    print(f"\n-X importtime ({label}) : import main = {total:.0f} ms")
+    for ms, name in direct:
+        print(f"  {ms:>8.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", default=["eager", "background", "lazy"])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--importtime", action="store_true", help="détail -X importtime de `import main`")
+    parser.add_argument("--top", type=int, default=12)
+    parser.add_argument("--ref", help="révision git à comparer (import uniquement)")
+    args = parser.parse_args()
+
+    print(f"{'mode':<11} {'import':>8} {'startup':>8} {'ready':>8} {'1er ML':>8} {'RSS MB':>7}  modules lourds après démarrage")
+    for mode in args.modes:
+        runs = [run_mode(mode, BASE_DIR) for _ in range(args.repeat)]
+        med = {k: sorted(r[k] for r in runs)[len(runs) // 2]
+               for k in ("import_ms", "startup_ms", "ready_ms", "first_ml_ms", "rss_mb")}
+        print(
+            f"{mode:<11} {med['import_ms']:>8.0f} {med['startup_ms']:>8.0f} {med['ready_ms']:>8.0f} "
+            f"{med['first_ml_ms']:>8.0f} {med['rss_mb']:>7.0f}  {','.join(runs[-1]['heavy']) or '-'}"
+        )
+
+    if args.importtime:
+        print_importtime("arbre courant", BASE_DIR, args.top)
+
+    if args.ref:
+        repo = Path(subprocess.run(["git", "rev-parse", "--show-toplevel"], cwd=BASE_DIR,
+                                   capture_output=True, text=True, check=True).stdout.strip())
+        with tempfile.TemporaryDirectory() as tmp:
+            worktree = Path(tmp) / "ref"
+            subprocess.run(["git", "worktree", "add", "--detach", str(worktree), args.ref],
+                           cwd=repo, capture_output=True, check=True)
+            try:
+                print_importtime(args.ref, worktree / BASE_DIR.relative_to(repo), args.top)
+            finally:
+                subprocess.run(["git", "worktree", "remove", "--force", str(worktree)], cwd=repo, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Benchmark démarrage / mémoire résidente de l'index TF-IDF par worker.
+
+Compare, dans un sous-processus neuf par mesure (comme un worker uvicorn) :
+  - legacy : tfidf_matrix.npz + tfidf_meta.json (copiés en mémoire)
+  - binary : ml/tfidf_index/ (.npy en mmap + méta colonnaires)
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.bench_tfidf_startup
+    python -m scripts.bench_tfidf_startup --synthetic-books 200000
+"""
+import argparse
+import json
+import random
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ML_DIR = BASE_DIR / "ml"
+
+WORKER_CODE = r"""
+import json, sys, time
+t0 = time.perf_counter()
+from services.tfidf_store import load_legacy_tfidf, load_tfidf_matrix, load_tfidf_meta
+t_import = time.perf_counter() - t0
+
+mode, matrix_path, meta_path, index_dir = sys.argv[1:5]
+t0 = time.perf_counter()
+if mode == "legacy":
+    matrix, meta = load_legacy_tfidf(matrix_path, meta_path)
+else:
+    matrix = load_tfidf_matrix(index_dir)
+    meta = load_tfidf_meta(index_dir)
+t_load = time.perf_counter() - t0
+
+# une requête type /reco/similar pour toucher les données réellement utilisées
+t0 = time.perf_counter()
+isbn = meta[len(meta) // 2]["isbn"]
+idx = meta.index_of(isbn)
+sims = (matrix[idx] @ matrix.T).toarray().ravel()
+top = sims.argsort()[::-1][:7]
+_ = [meta[int(j)] for j in top]
+t_query = time.perf_counter() - t0
+
+status = {}
+with open("/proc/self/status") as f:
+    for line in f:
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "RssAnon", "RssFile"):
+            status[key] = int(value.split()[0])
+print(json.dumps({"import_s": t_import, "load_s": t_load, "query_s": t_query, **status}))
+"""
+
+
+def make_synthetic(n_books: int, n_terms: int = 10000, terms_per_doc: int = 60):
+    import numpy as np
+    from scipy.sparse import random as sparse_random
+    from sklearn.preprocessing import normalize
+
+    rng = np.random.default_rng(42)
+    matrix = sparse_random(
+        n_books, n_terms, density=terms_per_doc / n_terms,
+        format="csr", dtype=np.float64, random_state=rng,
+    )
+    matrix = normalize(matrix)
+    records = [
+        {
+            "isbn": f"{i:013d}",
+            "titre": f"Livre synthétique {i} " + "x" * random.randint(5, 60),
+            "auteur": f"Auteur {i % 5000}",
+            "editeur": f"Editeur {i % 800}",
+            "image": f"http://images.amazon.com/images/P/{i:010d}.01.MZZZZZZZ.jpg",
+        }
+        for i in range(n_books)
+    ]
+    return matrix, records
+
+
+def prepare_artifacts(args, work_dir: Path):
+    from scipy.sparse import save_npz
+    from services.tfidf_store import save_tfidf_index
+
+    if args.synthetic_books:
+        matrix, records = make_synthetic(args.synthetic_books)
+    else:
+        from scipy.sparse import load_npz
+        matrix = load_npz(ML_DIR / "tfidf_matrix.npz")
+        with open(ML_DIR / "tfidf_meta.json", "r", encoding="utf-8") as f:
+            records = json.load(f)
+
+    matrix_path = work_dir / "tfidf_matrix.npz"
+    meta_path = work_dir / "tfidf_meta.json"
+    index_dir = work_dir / "tfidf_index"
+    save_npz(matrix_path, matrix)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+    save_tfidf_index(index_dir, matrix, records)
+    return matrix_path, meta_path, index_dir
+
+
+def run_worker(mode, matrix_path, meta_path, index_dir) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", WORKER_CODE, mode, str(matrix_path), str(meta_path), str(index_dir)],
+        cwd=BASE_DIR, check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic-books", type=int, default=0,
+                        help="génère un corpus synthétique de N livres au lieu de ml/")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=4,
+                        help="nombre de workers uvicorn pour l'estimation totale")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = prepare_artifacts(args, Path(tmp))
+
+        results = {}
+        for mode in ("legacy", "binary"):
+            runs = [run_worker(mode, *paths) for _ in range(args.repeat)]
+            best = min(runs, key=lambda r: r["load_s"])
+            results[mode] = best
+
+        print(f"{'mode':<8} {'load(ms)':>9} {'query(ms)':>10} {'RSS(MB)':>9} {'anon(MB)':>9} {'file(MB)':>9}")
+        for mode, r in results.items():
+            print(
+                f"{mode:<8} {r['load_s'] * 1000:>9.1f} {r['query_s'] * 1000:>10.1f} "
+                f"{r.get('VmRSS', 0) / 1024:>9.1f} {r.get('RssAnon', 0) / 1024:>9.1f} "
+                f"{r.get('RssFile', 0) / 1024:>9.1f}"
+            )
+
+        legacy, binary = results["legacy"], results["binary"]
+        # Les pages mmap (RssFile) sont partagées via le page cache : seule la
+        # mémoire anonyme est payée par chaque worker.
+        saved_per_worker = (legacy.get("RssAnon", 0) - binary.get("RssAnon", 0)) / 1024
+        print()
+        print(f"Démarrage: x{legacy['load_s'] / max(binary['load_s'], 1e-9):.1f} plus rapide")
+        print(f"Mémoire privée économisée par worker: {saved_per_worker:.1f} MB "
+              f"(~{saved_per_worker * args.workers:.1f} MB pour {args.workers} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Évaluation hors-ligne du recommandeur hybride (GBM + contenu TF-IDF).
+
+Pour chaque utilisateur ayant assez de notes, une partie des livres aimés
+(note >= --like-threshold) est cachée. Le profil est construit avec le
+reste, puis on classe les candidats (derniers livres + livres cachés) pour
+plusieurs poids de contenu et on mesure precision@k et la latence.
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.eval_hybrid_reco --k 10 --weights 0 0.25 0.5 0.75 1
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from core.database import get_db_connection
+from services.reco_scoring import (
+    CANDIDATES_SQL,
+    blend_scores,
+    content_scores,
+    gbm_scores,
+    profile_vector,
+    profile_weights,
+)
+from services.model_registry import current_release_dir
+from services.tfidf_store import load_tfidf_matrix, load_tfidf_meta
+
+ML_DIR = Path(__file__).resolve().parent.parent / "ml"
+
+
+def load_eval_data(min_ratings: int, candidates_limit: int):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            """
+            SELECT e.utilisateur_id, e.livre_isbn, e.note,
+                   COALESCE(u.age, 0), COALESCE(u.pays, 'UNK')
+            FROM Evaluation e
+            JOIN Utilisateur u ON u.id_utilisateur = e.utilisateur_id
+            WHERE e.utilisateur_id IN (
+                SELECT utilisateur_id FROM Evaluation
+                GROUP BY utilisateur_id HAVING COUNT(*) >= %s
+            )
+            """,
+            (min_ratings,),
+        )
+        users = defaultdict(lambda: {"ratings": {}, "age": 0, "pays": "UNK"})
+        for uid, isbn, note, age, pays in cur.fetchall():
+            users[uid]["ratings"][isbn] = note
+            users[uid]["age"] = int(age)
+            users[uid]["pays"] = str(pays)
+
+        cur.execute(CANDIDATES_SQL, (candidates_limit,))
+        pool = list(cur.fetchall())
+
+        cur.execute(
+            """
+            SELECT l.isbn, l.titre, COALESCE(l.auteur, ''),
+                   COALESCE(l.langue, 'UNK'), COALESCE(c.nomcat, 'UNK'),
+                   COALESCE(YEAR(l.date_publication), 0), COALESCE(l.resume, '')
+            FROM Livre l
+            LEFT JOIN Categorie c ON c.id = l.categorie_id
+            WHERE l.isbn IN (SELECT DISTINCT livre_isbn FROM Evaluation)
+            """
+        )
+        rated_books = {r[0]: r for r in cur.fetchall()}
+    finally:
+        conn.close()
+    return users, pool, rated_books
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--weights", type=float, nargs="+", default=[0.0, 0.25, 0.5, 0.75, 1.0],
+                        help="poids du signal contenu à évaluer (0 = GBM seul)")
+    parser.add_argument("--min-ratings", type=int, default=10)
+    parser.add_argument("--holdout", type=float, default=0.3, help="part des livres aimés cachés")
+    parser.add_argument("--like-threshold", type=int, default=4, help="même cible que train_reco.py")
+    parser.add_argument("--candidates", type=int, default=500)
+    parser.add_argument("--max-users", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    release = current_release_dir(ML_DIR)
+    pipeline = joblib.load(release / "reco_pipeline.pkl")
+    matrix = load_tfidf_matrix(release / "tfidf_index")
+    meta = load_tfidf_meta(release / "tfidf_index")
+
+    users, pool, rated_books = load_eval_data(args.min_ratings, args.candidates)
+    rng = random.Random(args.seed)
+    user_ids = sorted(users)
+    rng.shuffle(user_ids)
+    user_ids = user_ids[: args.max_users]
+
+    hits = defaultdict(list)
+    latencies = defaultdict(list)
+    evaluated = 0
+
+    for uid in user_ids:
+        u = users[uid]
+        liked = [isbn for isbn, note in u["ratings"].items() if note is not None and note >= args.like_threshold]
+        n_hidden = int(len(liked) * args.holdout)
+        if n_hidden == 0:
+            continue
+        hidden = set(rng.sample(liked, n_hidden))
+        visible = {isbn: note for isbn, note in u["ratings"].items() if isbn not in hidden}
+
+        candidates = [b for b in pool if b[0] not in visible]
+        seen = {b[0] for b in candidates}
+        candidates += [rated_books[i] for i in hidden if i in rated_books and i not in seen]
+        if len(candidates) < args.k:
+            continue
+        evaluated += 1
+
+        # le GBM ne dépend pas du poids : mesuré une fois, ajouté à chaque latence
+        t0 = time.perf_counter()
+        proba = gbm_scores(pipeline, u["age"], u["pays"], candidates)
+        t_gbm = time.perf_counter() - t0
+
+        for w in args.weights:
+            t0 = time.perf_counter()
+            if w > 0:
+                profile = profile_vector(matrix, meta, profile_weights(set(), visible))
+                content = content_scores(matrix, meta, profile, [b[0] for b in candidates])
+            else:
+                content = np.zeros(len(candidates))
+            scores, _ = blend_scores(proba, content, w)
+            top = np.argsort(-scores, kind="stable")[: args.k]
+            latencies[w].append(t_gbm + time.perf_counter() - t0)
+            hits[w].append(sum(1 for i in top if candidates[i][0] in hidden) / args.k)
+
+    if not evaluated:
+        raise SystemExit("Pas assez d'utilisateurs avec des notes pour évaluer.")
+
+    print(f"Utilisateurs évalués: {evaluated}  (k={args.k}, candidats≈{args.candidates})")
+    print(f"{'w_contenu':>9} {'P@' + str(args.k):>8} {'p50(ms)':>9} {'p95(ms)':>9}")
+    for w in args.weights:
+        lat = np.array(latencies[w]) * 1000
+        print(f"{w:>9.2f} {np.mean(hits[w]):>8.4f} {np.percentile(lat, 50):>9.2f} {np.percentile(lat, 95):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Ingestion du catalogue et des notes (package ingestion/).
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.ingest books data/Preprocessed_data.csv
+    python -m scripts.ingest books livres.csv --delimiter ";"            # export de Livre
+    python -m scripts.ingest books livres.parquet --sink mariadb-bulk     # LOAD DATA + fusion
+    python -m scripts.ingest books data.csv --sink sqlite --sqlite-path moha/exlibris.db
+    python -m scripts.ingest books data.csv --resume                      # reprend au checkpoint
+    python -m scripts.ingest books data.csv --jobs 4 --writers 4          # CSV en parallèle
+    python -m scripts.ingest books data.csv --scaling 1,2,4 --dry-run     # montée en charge
+    python -m scripts.ingest books data.csv --compare                     # mariadb vs mariadb-bulk
+    python -m scripts.ingest books data.jsonl --map titre=name            # colonne non prévue
+    python -m scripts.ingest ratings data/Preprocessed_data.csv           # notes -> Evaluation
+
+Connexion MariaDB : DB_HOST, DB_USER... (core/config.py).
+Importer les livres avant les notes (clé étrangère Evaluation -> Livre).
+"""
+import argparse
+
+from ingestion.dedup import DEDUP_KINDS
+from ingestion.parallel import run_parallel
+from ingestion.pipeline import DEFAULT_BATCH_SIZE, run
+from ingestion.sinks import SINKS, MariaDBBulkSink, MariaDBSink, RatingsSink, RejectFile, SQLiteSink
+from ingestion.sources import FORMATS, detect_format
+
+
+def make_sink(name, path, sqlite_path=None):
+    if name == "mariadb":
+        return MariaDBSink(rejects=RejectFile(f"{path}.rejets.csv"))
+    if name == "mariadb-bulk":
+        return MariaDBBulkSink()
+    if name == "sqlite":
+        if not sqlite_path:
+            raise SystemExit("--sqlite-path est requis avec --sink sqlite")
+        return SQLiteSink(sqlite_path)
+    raise SystemExit(f"sink inconnu: {name} ({', '.join(SINKS)})")
+
+
+def run_books(args, sink_name=None):
+    sink = make_sink(sink_name or args.sink, args.path, args.sqlite_path)
+    try:
+        return run(args.path, sink, "books", args.format, args.delimiter, args.batch_size, args.limit,
+                   args.dedup, args.expected_books, args.resume, args.map)
+    finally:
+        if isinstance(sink, MariaDBSink) and sink.rejects:
+            sink.rejects.close()
+
+
+def run_scaling(args):
+    """Débit du mode parallèle pour chaque valeur de jobs (writers = jobs si non précisé)."""
+    jobs_list = [int(j) for j in args.scaling.split(",")]
+    results = [
+        run_parallel(args.path, args.delimiter, args.batch_size, args.limit, jobs=j, writers=args.writers or j,
+                     dry_run=args.dry_run, dedup=args.dedup, expected_books=args.expected_books, mapping=args.map)
+        for j in jobs_list
+    ]
+    base = results[0]["lues"] / max(results[0]["secondes"], 1e-9)
+    print("\n jobs   lignes     secondes   lignes/s   accélération")
+    for j, r in zip(jobs_list, results):
+        rate = r["lues"] / max(r["secondes"], 1e-9)
+        print(f" {j:<6} {r['lues']:>9} {r['secondes']:>10.1f} {rate:>10.0f} {rate / max(base, 1e-9):>10.2f}x")
+
+
+def run_compare(args):
+    """Les deux sinks MariaDB sur la même entrée (mariadb d'abord : le bulk fusionne sur des ISBN déjà présents)."""
+    results = [run_books(args, name) for name in ("mariadb", "mariadb-bulk")]
+    print("\n sink           lignes     secondes   lignes/s")
+    for r in results:
+        print(f" {r['sink']:<13} {r['lues']:>9} {r['secondes']:>10.1f} {r['lues'] / max(r['secondes'], 1e-9):>10.0f}")
+
+
+def check_args(parser, args):
+    """Refuse les combinaisons qu'un des modes ignorerait (parser.error : message et sortie en erreur)."""
+    parallel = args.jobs is not None or args.scaling
+    if args.dry_run and not parallel:
+        parser.error("--dry-run n'existe qu'en mode parallèle (--jobs ou --scaling)")
+    if args.writers is not None and not parallel:
+        parser.error("--writers n'existe qu'en mode parallèle (--jobs ou --scaling)")
+    if args.jobs is not None and args.scaling:
+        parser.error("--scaling fixe lui-même les valeurs de --jobs")
+    if args.kind == "ratings" and (parallel or args.compare or args.sink not in (None, "mariadb")):
+        parser.error("ratings : uniquement le sink mariadb (pas de --jobs, --scaling, --compare ni --sink)")
+    if parallel:
+        if (args.format or detect_format(args.path)) != "csv":
+            parser.error("--jobs / --scaling : source CSV uniquement")
+        if args.sink not in (None, "mariadb"):
+            parser.error("--jobs / --scaling : sink mariadb uniquement")
+        if args.resume or args.compare:
+            parser.error("--jobs / --scaling : incompatibles avec --resume et --compare")
+    if args.compare and (args.sink is not None or args.resume):
+        parser.error("--compare lance les sinks mariadb et mariadb-bulk : sans --sink ni --resume")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("kind", choices=("books", "ratings"), help="livres -> Livre, notes -> Evaluation")
+    parser.add_argument("path", help="fichier source (CSV, JSONL ou Parquet)")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="défaut: d'après l'extension")
+    parser.add_argument("--delimiter", default=",", help="séparateur CSV")
+    parser.add_argument("--map", action="append", default=[], metavar="CHAMP=COLONNE",
+                        help="colonne source d'un champ (répétable), voir ingestion/mapping.py")
+    parser.add_argument("--sink", choices=SINKS, default=None, help="défaut: mariadb")
+    parser.add_argument("--sqlite-path", default=None, help="base SQLite (--sink sqlite)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--limit", type=int, default=None, help="n'importe que les N premières lignes")
+    parser.add_argument("--dedup", choices=DEDUP_KINDS, default="set",
+                        help="écarte les ISBN déjà vus (set exact, ou filtre de Bloom à mémoire fixe)")
+    parser.add_argument("--expected-books", type=int, default=None,
+                        help="nombre de livres distincts attendu (taille du filtre de Bloom)")
+    parser.add_argument("--resume", action="store_true", help="reprend au checkpoint <source>.checkpoint.json")
+    parser.add_argument("--keep-zero", action="store_true",
+                        help="ratings : garde les notes 0 (implicites) au lieu de NULL")
+    parser.add_argument("--jobs", type=int, default=None,
+                        help="books, CSV -> MariaDB : N processus de parsing (0 = nombre de CPU)")
+    parser.add_argument("--writers", type=int, default=None,
+                        help="connexions d'écriture en mode parallèle (défaut: 4, ou jobs avec --scaling)")
+    parser.add_argument("--scaling", default=None, help="benchmark du mode parallèle, ex: 1,2,4,8 (valeurs de --jobs)")
+    parser.add_argument("--dry-run", action="store_true", help="mode parallèle sans écriture en base")
+    parser.add_argument("--compare", action="store_true", help="compare les sinks mariadb et mariadb-bulk")
+    args = parser.parse_args(argv)
+    check_args(parser, args)
+    args.sink = args.sink or "mariadb"
+
+    if args.kind == "ratings":
+        run(args.path, RatingsSink(), "ratings", args.format, args.delimiter, args.batch_size, args.limit,
+            resume=args.resume, mapping=args.map, keep_zero=args.keep_zero)
+    elif args.scaling:
+        run_scaling(args)
+    elif args.jobs is not None:
+        run_parallel(args.path, args.delimiter, args.batch_size, args.limit, jobs=args.jobs,
+                     writers=args.writers or 4, dry_run=args.dry_run, dedup=args.dedup,
+                     expected_books=args.expected_books, mapping=args.map)
+    elif args.compare:
+        run_compare(args)
+    else:
+        run_books(args)
+
+
+if __name__ == "__main__":
+    main()
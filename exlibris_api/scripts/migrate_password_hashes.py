@@ -1,43 +1,100 @@
+"""
+Migre les mots de passe en clair (mot_de_passe) vers mot_de_passe_hash (bcrypt).
+
+Par chunks de --chunk-size utilisateurs, dans l'ordre des id (keyset) :
+hachage réparti sur --jobs processus (bcrypt est volontairement lent, un
+cœur par hash), puis un seul UPDATE ... CASE pour tout le chunk et un commit.
+Une interruption ne perd que le chunk en cours : relancer reprend
+d'elle-même (seuls les mot_de_passe_hash encore NULL sont relus), --after-id
+évite de reparcourir le début de la table.
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.migrate_password_hashes
+    python -m scripts.migrate_password_hashes --jobs 16 --chunk-size 2000 --after-id 500000
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 from core.database import get_db_connection
 from core.security import hash_password
 
+DEFAULT_CHUNK_SIZE = 1000
 
-def migrate_password_hashes() -> None:
-    conn = get_db_connection()
-    cur = conn.cursor()
+SELECT_SQL = """
+    SELECT id_utilisateur, mot_de_passe
+    FROM Utilisateur
+    WHERE id_utilisateur > %s
+      AND mot_de_passe_hash IS NULL
+      AND mot_de_passe IS NOT NULL
+      AND mot_de_passe <> ''
+    ORDER BY id_utilisateur
+    LIMIT %s
+"""
 
-    try:
-        cur.execute("""
-            SELECT id_utilisateur, mot_de_passe
-            FROM Utilisateur
-            WHERE mot_de_passe_hash IS NULL
-              AND mot_de_passe IS NOT NULL
-        """)
-        rows = cur.fetchall()
 
-        migrated_count = 0
+def update_chunk(cur, ids, hashes) -> int:
+    """Un UPDATE pour tout le chunk ; IS NULL : un hash posé entre-temps (inscription, /auth) est gardé."""
+    cases = " ".join(["WHEN %s THEN %s"] * len(ids))
+    params = [v for pair in zip(ids, hashes) for v in pair] + list(ids)
+    cur.execute(f"""
+        UPDATE Utilisateur
+        SET mot_de_passe_hash = CASE id_utilisateur {cases} END
+        WHERE id_utilisateur IN ({", ".join(["%s"] * len(ids))})
+          AND mot_de_passe_hash IS NULL
+    """, params)
+    return cur.rowcount
 
-        for user_id, plain_password in rows:
-            hashed = hash_password(plain_password)
 
-            cur.execute("""
-                UPDATE Utilisateur
-                SET mot_de_passe_hash = %s
-                WHERE id_utilisateur = %s
-            """, (hashed, user_id))
+def migrate_password_hashes(conn=None, jobs=None, chunk_size=DEFAULT_CHUNK_SIZE, after_id=0, hasher=hash_password):
+    """Nombre de mots de passe migrés. `hasher` doit être picklable (exécuté dans les workers)."""
+    jobs = jobs or os.cpu_count() or 1
+    conn = conn or get_db_connection()
+    cur = conn.cursor()
+    last_id = after_id
+    migrated_count = 0
+    t0 = time.perf_counter()
 
-            migrated_count += 1
+    try:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            while True:
+                cur.execute(SELECT_SQL, (last_id, chunk_size))
+                rows = cur.fetchall()
+                if not rows:
+                    break
+                ids = [user_id for user_id, _ in rows]
+                # chunksize : quelques tâches par worker, pas un aller-retour par mot de passe
+                hashes = list(pool.map(hasher, [pwd for _, pwd in rows],
+                                       chunksize=max(1, len(rows) // (4 * jobs))))
+                try:
+                    migrated_count += update_chunk(cur, ids, hashes)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                last_id = ids[-1]
+                elapsed = time.perf_counter() - t0
+                print(f"[..] {migrated_count} migré(s), dernier id {last_id} "
+                      f"({migrated_count / max(elapsed, 1e-9):.0f} utilisateurs/s)")
 
-        conn.commit()
-        print(f"[OK] {migrated_count} mot(s) de passe migré(s).")
+        print(f"[OK] {migrated_count} mot(s) de passe migré(s) en {time.perf_counter() - t0:.1f} s "
+              f"({jobs} processus).")
+        return migrated_count
 
     except Exception as exc:
-        conn.rollback()
-        print(f"[ERREUR] Migration annulée: {exc}")
+        print(f"[ERREUR] Migration interrompue après l'id {last_id} "
+              f"(relancer avec --after-id {last_id} pour reprendre): {exc}")
         raise
     finally:
+        cur.close()
         conn.close()
 
 
 if __name__ == "__main__":
-    migrate_password_hashes()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Migration mot_de_passe -> mot_de_passe_hash (bcrypt)")
+    parser.add_argument("--jobs", type=int, default=None, help="processus de hachage (défaut: nombre de CPU)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="utilisateurs par UPDATE/commit")
+    parser.add_argument("--after-id", type=int, default=0, help="reprend après cet id_utilisateur")
+    args = parser.parse_args()
+    migrate_password_hashes(jobs=args.jobs, chunk_size=args.chunk_size, after_id=args.after_id)
@@ -0,0 +1,120 @@
+"""
+Précalcule les recommandations de démarrage à froid par segment
+(tranche d'âge, pays) dans RecommandationSegment (migration 004).
+
+Pour la version de modèle courante du registre : un scoring GBM du pool de
+candidats (CANDIDATES_SQL, RECO_CANDIDATES_LIMIT livres) par segment
+présent dans Utilisateur, à l'âge représentatif de la tranche, puis les
+--depth meilleurs livres par segment. Les lignes des versions plus
+anciennes que la précédente sont supprimées.
+
+À relancer après chaque publication de modèle et quand le pool de
+candidats change (nouveaux livres), par ex. en cron.
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.precompute_reco_segments
+    python -m scripts.precompute_reco_segments --depth 100 --min-users 5
+"""
+import argparse
+import time
+
+from core.config import RECO_CANDIDATES_LIMIT, RECO_SEGMENT_DEPTH
+from core.database import get_db_connection
+from services.ml_models import ML_DIR, load_model_bundle
+from services.model_registry import previous_version
+from services.reco_scoring import CANDIDATES_SQL, score_candidates_batch, top_k
+from services.reco_segments import age_bucket, representative_ages
+
+INSERT_SQL = """
+    INSERT INTO RecommandationSegment (version_modele, tranche_age, pays, rang, livre_isbn, score)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+
+def load_segments(cur, min_users: int) -> dict:
+    """(tranche, pays) -> nombre d'utilisateurs, pour les segments d'au moins `min_users` utilisateurs."""
+    cur.execute("""
+        SELECT COALESCE(age, 0), COALESCE(pays, 'UNK'), COUNT(*)
+        FROM Utilisateur
+        GROUP BY 1, 2
+    """)
+    segments = {}
+    for age, pays, n in cur.fetchall():
+        key = (age_bucket(int(age)), str(pays or "UNK"))
+        segments[key] = segments.get(key, 0) + int(n)
+    return {key: n for key, n in segments.items() if n >= min_users}
+
+
+def rank_segments(bundle, candidates: list, segments, depth: int, batch_rows: int = 4096) -> list:
+    """
+    Lignes (tranche, pays, rang, isbn, score) : les `depth` meilleurs
+    candidats de chaque segment. Plusieurs segments par predict_proba
+    (jusqu'à `batch_rows` lignes), comme le micro-batching de l'API.
+    """
+    ages = representative_ages()
+    segments = list(segments)
+    per_batch = max(1, batch_rows // max(1, len(candidates)))
+    rows = []
+    for start in range(0, len(segments), per_batch):
+        chunk = segments[start:start + per_batch]
+        jobs = [(ages[bucket], pays, candidates, None, 0.0) for bucket, pays in chunk]
+        for (bucket, pays), (scores, _, _, _) in zip(chunk, score_candidates_batch(bundle, jobs)):
+            for rank, i in enumerate(top_k(scores, depth), start=1):
+                rows.append((bucket, pays, rank, candidates[i][0], round(float(scores[i]), 6)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depth", type=int, default=RECO_SEGMENT_DEPTH, help="livres classés par segment")
+    parser.add_argument("--min-users", type=int, default=1, help="ignore les segments plus petits")
+    parser.add_argument("--batch-rows", type=int, default=4096, help="lignes par predict_proba")
+    args = parser.parse_args()
+
+    bundle = load_model_bundle()
+    if bundle.gbm_model is None:
+        raise SystemExit(f"reco_pipeline.pkl introuvable dans {bundle.ml_dir}")
+    version = bundle.version
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    try:
+        t0 = time.perf_counter()
+        cur.execute(CANDIDATES_SQL, (RECO_CANDIDATES_LIMIT,))
+        candidates = cur.fetchall()
+        segments = load_segments(cur, args.min_users)
+        if not candidates or not segments:
+            raise SystemExit("Aucun candidat ou aucun utilisateur : rien à précalculer.")
+        t_load = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        rows = rank_segments(bundle, candidates, segments, args.depth, args.batch_rows)
+        t_score = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        cur.execute("DELETE FROM RecommandationSegment WHERE version_modele = %s", (version,))
+        for start in range(0, len(rows), 5000):
+            cur.executemany(INSERT_SQL, [(version, *r) for r in rows[start:start + 5000]])
+        # on garde la version précédente : les workers API peuvent encore la servir
+        keep = [v for v in (version, previous_version(ML_DIR, version)) if v]
+        cur.execute(
+            f"DELETE FROM RecommandationSegment WHERE version_modele NOT IN ({', '.join(['%s'] * len(keep))})",
+            keep,
+        )
+        conn.commit()
+        t_write = time.perf_counter() - t0
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    users = sum(segments.values())
+    print(f"✅ Version {version} : {len(segments)} segments ({users} utilisateurs), "
+          f"{len(candidates)} candidats, {len(rows)} lignes")
+    print(f"   lecture {t_load:.1f} s, scoring {t_score:.1f} s "
+          f"({len(segments) * len(candidates) / max(t_score, 1e-9):.0f} lignes/s), écriture {t_write:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
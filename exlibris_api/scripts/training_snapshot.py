@@ -0,0 +1,90 @@
+"""
+Gestion des snapshots Parquet des données d'entraînement.
+
+Usage (depuis exlibris_api/) :
+    python -m scripts.training_snapshot refresh          # delta depuis le dernier snapshot
+    python -m scripts.training_snapshot refresh --full   # export complet (prend en compte les suppressions)
+    python -m scripts.training_snapshot list
+    python -m scripts.training_snapshot compact          # fusionne les parts du dernier snapshot
+    python -m scripts.training_snapshot prune --keep 5
+
+Puis :
+    python train_reco.py --snapshot                      # dernier snapshot
+    python train_reco.py --snapshot 20260101T120000-ab12cd34
+    python train_reco_content.py --snapshot
+
+La migration bdd/migrations/003_training_snapshots.sql doit être appliquée.
+"""
+import argparse
+
+from core.database import get_db_connection
+from services.ml_models import ML_DIR
+from services.model_registry import list_releases
+from services.training_snapshot import (
+    SNAPSHOT_DIR,
+    compact,
+    current_snapshot_id,
+    list_snapshots,
+    parts_nbytes,
+    prune,
+    refresh,
+)
+
+
+def pinned_by_releases() -> set:
+    """Snapshots cités par une version du registre ML (à garder pour la reproductibilité)."""
+    pinned = set()
+    for manifest in list_releases(ML_DIR):
+        for component in manifest.get("stats", {}).values():
+            if isinstance(component, dict) and component.get("snapshot"):
+                pinned.add(component["snapshot"])
+    return pinned
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_refresh = sub.add_parser("refresh", help="exporte les lignes nouvelles/modifiées")
+    p_refresh.add_argument("--full", action="store_true", help="export complet au lieu d'un delta")
+    p_refresh.add_argument("--chunk-size", type=int, default=50000, help="lignes lues par paquet depuis MariaDB")
+    p_refresh.add_argument("--margin", type=int, default=300,
+                           help="marge (s) retirée au marqueur date_derniere_maj du delta suivant")
+
+    sub.add_parser("list", help="liste les snapshots")
+
+    p_compact = sub.add_parser("compact", help="fusionne les parts d'un snapshot en une base")
+    p_compact.add_argument("snapshot", nargs="?", default=None)
+
+    p_prune = sub.add_parser("prune", help="supprime les anciens snapshots et les parts orphelines")
+    p_prune.add_argument("--keep", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == "refresh":
+        conn = get_db_connection()
+        try:
+            refresh(conn, full=args.full, chunk_size=args.chunk_size, margin_seconds=args.margin)
+        finally:
+            conn.close()
+
+    elif args.command == "list":
+        current = current_snapshot_id()
+        pinned = pinned_by_releases()
+        print(f"{SNAPSHOT_DIR}")
+        for m in list_snapshots():
+            flags = ("*" if m["id"] == current else " ") + ("p" if m["id"] in pinned else " ")
+            rows = ", ".join(f"{k} +{v}" for k, v in m["lignes"].items())
+            print(f"{flags} {m['id']}  {m['type']:<7} {len(m['parts']):>3} part(s) "
+                  f"{parts_nbytes(m['id']) / 1e6:>8.1f} Mo  {rows}")
+        print("(* courant, p cité par une version du registre ML)")
+
+    elif args.command == "compact":
+        compact(args.snapshot)
+
+    elif args.command == "prune":
+        removed = prune(keep=args.keep, protect=pinned_by_releases())
+        print(f"{len(removed)} snapshot(s) supprimé(s)")
+
+
+if __name__ == "__main__":
+    main()
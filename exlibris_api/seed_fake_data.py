@@ -1,299 +1,339 @@
-import random
-import string
-import hashlib
-from datetime import date
-from argon2 import PasswordHasher
-import pymysql
+"""
+Données de test réalistes et reproductibles : utilisateurs, amitiés,
+collections, souhaits, évaluations et échanges, de quelques dizaines à
+plusieurs millions d'utilisateurs.
+
+Usage (depuis exlibris_api/) :
+    python seed_fake_data.py                                   # 30 utilisateurs
+    python seed_fake_data.py --users 1000000 --exchanges 200000 --seed 7
+
+Même graine + même catalogue -> mêmes données. Relançable : les utilisateurs
+générés ont un email seed<i>.<prenom>.<nom>@test.com (INSERT IGNORE sur
+ux_utilisateur_email), les autres tables ont des clés uniques, sauf Echange
+dont seules les lignes manquantes sont ajoutées.
+
+Tirages NumPy vectorisés par bloc de BLOCK_USERS utilisateurs (mémoire
+bornée, un générateur par (graine, table, bloc) : les utilisateurs du bloc 12
+ne dépendent pas de --users), un seul hash de mot de passe pour tous, inserts
+multi-lignes par batch avec un commit par batch.
+"""
+import argparse
+import re
+import time
+
+import numpy as np
 from pymysql import MySQLError
 
-DB = dict(
-    host="87.106.141.247",
-    port=3306,
-    user="exlibris",
-    password="exlibris2b",
-    database="exlibris",
-    charset="utf8mb4",
-    cursorclass=pymysql.cursors.Cursor
-)
-PASSWORD_HASHER = PasswordHasher()
+from core.database import get_db_connection
+from core.security import hash_password
+from scripts.backfill_publication_dates import backfill_publication_dates
 
+BLOCK_USERS = 50_000
+DEFAULT_BATCH_SIZE = 5000
 
-def hash_password(password: str) -> str:
-    return PASSWORD_HASHER.hash(password)
+SEED_EMAIL = "seed{}.{}.{}@test.com"
+SEED_EMAIL_LIKE = "seed%@test.com"
 
-def conn():
-    return pymysql.connect(**DB)
+# Données "réalistes" pour une appli de lecture/échange (France majoritaire + un peu de diversité)
+FIRST_NAMES_M = ["Simon", "Mathieu", "Mohammed", "Abdoul", "Habib", "Lucas", "Hugo", "Nicolas", "Yanis", "Karim"]
+FIRST_NAMES_F = ["Inès", "Alice", "Sarah", "Yasmine", "Lina", "Emma", "Chloé", "Nora", "Mariam", "Camille"]
+LAST_NAMES = ["Rossi", "Martin", "Bernard", "Dubois", "Moreau", "Laurent", "Simon", "Garcia", "Lambert", "Fontaine"]
+COUNTRIES = ["France", "Belgique", "Suisse", "Maroc", "Algérie", "Tunisie", "Italie", "Espagne", "Portugal"]
+COUNTRY_WEIGHTS = [65, 5, 5, 6, 6, 4, 3, 3, 3]  # France majoritaire
 
-def fetch_all_isbns(cur, limit=10000):
-    cur.execute("SELECT isbn FROM Livre WHERE isbn IS NOT NULL LIMIT %s", (limit,))
-    return [r[0] for r in cur.fetchall()]
+# Distribution réaliste des notes 0..10
+NOTE_WEIGHTS = [1, 1, 2, 3, 6, 10, 14, 18, 18, 10, 5]
 
-def fetch_user_ids(cur):
-    cur.execute("SELECT id_utilisateur FROM Utilisateur")
-    return [r[0] for r in cur.fetchall()]
+ECHANGE_STATUTS = [
+    "demande_envoyee", "demande_acceptee", "paiement_en_attente", "paiement_effectue",
+    "expedition_confirmee", "reception_confirmee", "demande_refusee", "annule", "termine",
+]
+ECHANGE_WEIGHTS = [20, 10, 5, 5, 5, 5, 10, 10, 30]
 
-def fetch_existing_emails(cur):
-    cur.execute("SELECT email FROM Utilisateur")
-    return {r[0] for r in cur.fetchall()}
+# flux de tirages indépendants (un par table)
+USERS, FRIENDS, CONTENT, EXCHANGES, POPULARITY = range(5)
 
-def random_password(length=10):
-    chars = string.ascii_letters + string.digits
-    return "".join(random.choice(chars) for _ in range(length))
 
-def ensure_users(cur, target_users=30):
-    """
-    Crée des utilisateurs réalistes jusqu'à atteindre target_users
-    (sans supprimer ni modifier ceux existants).
-    """
-    existing_ids = fetch_user_ids(cur)
-    existing_emails = fetch_existing_emails(cur)
-    need = max(0, target_users - len(existing_ids))
-    if need == 0:
-        return existing_ids
-
-    # Données "réalistes" pour une appli de lecture/échange (France majoritaire + un peu de diversité)
-    first_names_m = ["Simon", "Mathieu", "Mohammed", "Abdoul", "Habib", "Lucas", "Hugo", "Nicolas", "Yanis", "Karim"]
-    first_names_f = ["Inès", "Alice", "Sarah", "Yasmine", "Lina", "Emma", "Chloé", "Nora", "Mariam", "Camille"]
-    last_names = ["Rossi", "Martin", "Bernard", "Dubois", "Moreau", "Laurent", "Simon", "Garcia", "Lambert", "Fontaine"]
-
-    # Pays cohérents avec ton champ (pays texte)
-    countries = ["France", "Belgique", "Suisse", "Maroc", "Algérie", "Tunisie", "Italie", "Espagne", "Portugal"]
-    country_weights = [65, 5, 5, 6, 6, 4, 3, 3, 3]  # France majoritaire
-
-    # Sexe
-    sexes = [("Homme", first_names_m), ("Femme", first_names_f)]
-
-    # Rôle : très peu d’admin
-    def pick_role():
-        return "admin" if random.random() < 0.05 else "lecteur"
-
-    created_ids = []
-    for _ in range(need):
-        sexe, pool = random.choice(sexes)
-        prenom = random.choice(pool)
-        nom = random.choice(last_names)
-        username = f"{prenom}{nom}{random.randint(10,999)}"
-
-        # Email unique
-        base_email = f"{prenom.lower()}.{nom.lower()}@test.com"
-        email = base_email
-        k = 1
-        while email in existing_emails:
-            k += 1
-            email = f"{prenom.lower()}.{nom.lower()}{k}@test.com"
-        existing_emails.add(email)
-
-        age = random.randint(18, 45)
-        pays = random.choices(countries, weights=country_weights, k=1)[0]
-        role = pick_role()
-
-        # Mot de passe simple pour proto
-        mdp = hash_password("pass")  # ou hash_password(random_password())
-
-        cur.execute("""
-            INSERT INTO Utilisateur (nom_utilisateur, email, mot_de_passe, age, sexe, pays, role)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (username, email, mdp, age, sexe, pays, role))
-
-        created_ids.append(cur.lastrowid)
-
-    return existing_ids + created_ids
-
-def stable_random_date_from_isbn(isbn: str) -> str:
-    """
-    Donne une date YYYY-MM-DD stable à partir de l'ISBN.
-    Réaliste: majorité après 1990, un peu avant.
-    """
-    # seed stable via hash
-    h = hashlib.sha1(isbn.encode("utf-8", errors="ignore")).hexdigest()
-    seed = int(h[:8], 16)
-    rng = random.Random(seed)
-
-    # années pondérées (beaucoup de récents)
-    # 1950-1989 (10%), 1990-2009 (35%), 2010-2024 (55%)
-    p = rng.random()
-    if p < 0.10:
-        year = rng.randint(1950, 1989)
-    elif p < 0.45:
-        year = rng.randint(1990, 2009)
-    else:
-        year = rng.randint(2010, 2024)
-
-    month = rng.randint(1, 12)
-    day = rng.randint(1, 28)  # safe pour tous les mois
-    return f"{year:04d}-{month:02d}-{day:02d}"
-
-def fill_missing_book_dates(cur, isbns, commit_every=1000):
+def _rng(seed, stream, block=0):
+    return np.random.default_rng([seed, stream, block])
+
+
+def _p(weights):
+    w = np.asarray(weights, dtype=np.float64)
+    return w / w.sum()
+
+
+def fetch_all_isbns(cur, limit=100000):
+    # ORDER BY : même catalogue -> mêmes livres tirés
+    cur.execute("SELECT isbn FROM Livre ORDER BY isbn LIMIT %s", (limit,))
+    return [r[0] for r in cur.fetchall()]
+
+
+# ----------------------------
+# Génération (sans base)
+# ----------------------------
+def make_users(seed, lo, hi, n_admins=0):
     """
-    Met date_publication pour les livres où elle est NULL.
-    Stable et réaliste.
+    Utilisateurs d'index [lo, hi) : (nom_utilisateur, email, age, sexe, pays, role).
+    Tous lecteurs, sauf les `n_admins` premiers (mot de passe commun : pas d'admin par défaut).
     """
-    # On ne met à jour que ceux à NULL
-    cur.execute("SELECT COUNT(*) FROM Livre WHERE date_publication IS NULL")
-    missing = cur.fetchone()[0]
-    if missing == 0:
-        print("✅ date_publication déjà renseignée pour tous les livres.")
-        return 0
-
-    print(f"🛠️ Remplissage date_publication manquante... (à corriger: {missing})")
-    updated = 0
-
-    for i, isbn in enumerate(isbns, start=1):
-        # update uniquement si NULL
-        pub_date = stable_random_date_from_isbn(isbn)
-        cur.execute("""
-            UPDATE Livre
-            SET date_publication = %s
-            WHERE isbn = %s AND date_publication IS NULL
-        """, (pub_date, isbn))
-        updated += cur.rowcount
-
-        # commits batch (optionnel)
-        if commit_every and i % commit_every == 0:
-            print(f"  ...progress {i}/{len(isbns)} (updated={updated})")
-
-    print(f"✅ dates ajoutées: {updated}")
-    return updated
-
-def ensure_friendships(cur, user_ids, min_friends=2, max_friends=6):
+    rows = []
+    for block in range(lo // BLOCK_USERS, (hi - 1) // BLOCK_USERS + 1):
+        rng = _rng(seed, USERS, block)
+        b0 = block * BLOCK_USERS
+        femme = rng.random(BLOCK_USERS) < 0.5
+        prenom = np.where(femme, rng.integers(0, len(FIRST_NAMES_F), BLOCK_USERS),
+                          rng.integers(0, len(FIRST_NAMES_M), BLOCK_USERS))
+        nom = rng.integers(0, len(LAST_NAMES), BLOCK_USERS)
+        age = rng.integers(18, 46, BLOCK_USERS)
+        pays = rng.choice(len(COUNTRIES), BLOCK_USERS, p=_p(COUNTRY_WEIGHTS))
+
+        for k in range(max(lo, b0) - b0, min(hi, b0 + BLOCK_USERS) - b0):
+            first = (FIRST_NAMES_F if femme[k] else FIRST_NAMES_M)[prenom[k]]
+            last = LAST_NAMES[nom[k]]
+            i = b0 + k
+            rows.append((
+                f"{first}{last}{i}",
+                SEED_EMAIL.format(i, first.lower(), last.lower()),
+                int(age[k]),
+                "femelle" if femme[k] else "male",
+                COUNTRIES[pays[k]],
+                "admin" if i < n_admins else "lecteur",
+            ))
+    return rows
+
+
+def make_friendships(seed, block, n_users, min_friends=2, max_friends=6):
     """
-    Remplit Amitie avec des relations acceptées + quelques en_attente.
-    Évite les doublons (u1,u2) et (u2,u1).
+    Amitiés des utilisateurs du bloc : (index a < index b, accepte?). Chaque
+    utilisateur tire `min..max` amis par décalage aléatoire modulo n_users :
+    O(amitiés), jamais de liste de candidats par utilisateur. Une paire tirée
+    deux fois n'est gardée qu'une fois (ici, ou par ux_amitie_pair entre blocs).
     """
-    # Index des relations existantes
-    cur.execute("SELECT utilisateur_1_id, utilisateur_2_id FROM Amitie")
-    existing = set()
-    for u1, u2 in cur.fetchall():
-        existing.add((min(u1,u2), max(u1,u2)))
-
-    inserted = 0
-
-    for u in user_ids:
-        target = random.randint(min_friends, max_friends)
-        candidates = [x for x in user_ids if x != u]
-        random.shuffle(candidates)
-        friends = 0
-
-        for v in candidates:
-            if friends >= target:
-                break
-            a, b = min(u,v), max(u,v)
-            if (a,b) in existing:
-                continue
-
-            statut = "accepte" if random.random() < 0.85 else "en_attente"
-            cur.execute("""
-                INSERT INTO Amitie (utilisateur_1_id, utilisateur_2_id, statut)
-                VALUES (%s, %s, %s)
-            """, (a, b, statut))
-            existing.add((a,b))
-            inserted += 1
-            friends += 1
-
-    return inserted
-
-def seed_user_content(cur, user_ids, isbns):
+    lo, hi = block * BLOCK_USERS, min(n_users, (block + 1) * BLOCK_USERS)
+    if n_users < 2 or lo >= hi:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, bool)
+    rng = _rng(seed, FRIENDS, block)
+    deg = rng.integers(min_friends, max_friends + 1, hi - lo)
+    src = np.repeat(np.arange(lo, hi), deg)
+    dst = (src + rng.integers(1, n_users, src.size)) % n_users
+    pairs = np.unique(np.minimum(src, dst) * n_users + np.maximum(src, dst))
+    accepte = rng.random(pairs.size) < 0.85
+    return pairs // n_users, pairs % n_users, accepte
+
+
+def book_popularity(seed, n_books, skew=0.8):
+    """(livres par rang de popularité, probabilité par rang) : loi de Zipf, quelques livres très lus."""
+    order = _rng(seed, POPULARITY).permutation(n_books)
+    return order, _p(1.0 / np.arange(1, n_books + 1) ** skew)
+
+
+def _sample_books(rng, popularity, size):
+    order, p = popularity
+    return order[rng.choice(order.size, size, p=p)]
+
+
+def make_content(seed, block, n_users, n_books, popularity,
+                 collection_per_user=(15, 40), wishlist_per_user=(5, 20), ratings_per_user=(10, 30)):
     """
-    Remplit Collection, Souhait, Evaluation.
+    Contenu des utilisateurs du bloc, en index (utilisateur, livre) :
+    collection, souhaits (hors collection) et évaluations (70 % tirées de la
+    collection), sans doublon (utilisateur, livre) par table.
     """
-    random.seed(42)
-
-    collection_per_user = (15, 40)
-    wishlist_per_user   = (5, 20)
-    ratings_per_user    = (10, 30)
-
-    inserted_collection = 0
-    inserted_wishlist = 0
-    inserted_ratings = 0
-
-    for uid in user_ids:
-        # Collection
-        col_n = random.randint(*collection_per_user)
-        col_books = set(random.sample(isbns, k=min(col_n, len(isbns))))
-
-        for isbn in col_books:
-            cur.execute("""
-                INSERT IGNORE INTO Collection (utilisateur_id, livre_isbn)
-                VALUES (%s, %s)
-            """, (uid, isbn))
-            inserted_collection += cur.rowcount
-
-        # Wishlist
-        wish_n = random.randint(*wishlist_per_user)
-        remaining = list(set(isbns) - col_books)
-        source = remaining if len(remaining) >= wish_n else isbns
-        wish_books = set(random.sample(source, k=min(wish_n, len(source))))
-
-        for isbn in wish_books:
-            cur.execute("""
-                INSERT IGNORE INTO Souhait (utilisateur_id, livre_isbn)
-                VALUES (%s, %s)
-            """, (uid, isbn))
-            inserted_wishlist += cur.rowcount
-
-        # Evaluations (essentiel pour entraîner)
-        rate_n = random.randint(*ratings_per_user)
-        rated_candidates = list(col_books)
-        if len(rated_candidates) < rate_n:
-            rated_candidates += random.sample(isbns, k=min(rate_n - len(rated_candidates), len(isbns)))
-        rated_books = random.sample(rated_candidates, k=min(rate_n, len(rated_candidates)))
-
-        for isbn in rated_books :
-            # Distribution réaliste
-            note = random.choices(
-                population=[0,1,2,3,4,5,6,7,8,9,10],
-                weights=   [1,1,2,3,6,10,14,18,18,10,5],
-                k=1
-            )[0]
-            if note >= 8:
-                avis = "Très bon livre, je recommande."
-            elif note <= 3:
-                avis = "Je n'ai pas accroché."
-            else:
-                avis = "Lecture correcte."
-
-            cur.execute("""
-                INSERT INTO Evaluation (utilisateur_id, livre_isbn, note, avis)
-                VALUES (%s, %s, %s, %s)
-            """, (uid, isbn, note, avis))
-            inserted_ratings += 1
-
-    return inserted_collection, inserted_wishlist, inserted_ratings
-
-def main():
-    cn = conn()
+    lo, hi = block * BLOCK_USERS, min(n_users, (block + 1) * BLOCK_USERS)
+    rng = _rng(seed, CONTENT, block)
+    users = np.arange(lo, hi)
+
+    def draw(per_user):
+        u = np.repeat(users, rng.integers(per_user[0], per_user[1] + 1, users.size))
+        return np.unique(u * n_books + _sample_books(rng, popularity, u.size))
+
+    collection = draw(collection_per_user)
+    wishlist = draw(wishlist_per_user)
+    wishlist = wishlist[~np.isin(wishlist, collection, assume_unique=True)]
+
+    # évaluations : surtout des livres de la collection (triée par utilisateur)
+    col_user, col_book = collection // n_books, collection % n_books
+    start = np.searchsorted(col_user, users)
+    count = np.searchsorted(col_user, users, side="right") - start
+    u = np.repeat(users, rng.integers(ratings_per_user[0], ratings_per_user[1] + 1, users.size))
+    k = u - lo
+    from_collection = (rng.random(u.size) < 0.7) & (count[k] > 0)
+    pos = np.minimum(start[k] + (rng.random(u.size) * count[k]).astype(np.int64), max(col_book.size - 1, 0))
+    books = np.where(from_collection, col_book[pos] if col_book.size else 0, _sample_books(rng, popularity, u.size))
+    ratings = np.unique(u * n_books + books)
+    notes = rng.choice(len(NOTE_WEIGHTS), ratings.size, p=_p(NOTE_WEIGHTS))
+
+    return (
+        (col_user, col_book),
+        (wishlist // n_books, wishlist % n_books),
+        (ratings // n_books, ratings % n_books, notes),
+    )
+
+
+def avis_for(notes):
+    return np.select([notes >= 8, notes <= 3], ["Très bon livre, je recommande.", "Je n'ai pas accroché."],
+                     "Lecture correcte.")
+
+
+def make_exchanges(seed, block, n_exchanges, n_users, popularity):
+    """Échanges d'index [block*BLOCK_USERS, ...) : (demandeur, destinataire, livre dem., livre dest., statut)."""
+    lo, hi = block * BLOCK_USERS, min(n_exchanges, (block + 1) * BLOCK_USERS)
+    n_books = popularity[0].size
+    rng = _rng(seed, EXCHANGES, block)
+    m = hi - lo
+    dem = rng.integers(0, n_users, m)
+    dst = (dem + rng.integers(1, n_users, m)) % n_users  # jamais soi-même
+    book_dem = _sample_books(rng, popularity, m)
+    book_dst = (book_dem + rng.integers(1, n_books, m)) % n_books  # jamais le même livre
+    statut = rng.choice(len(ECHANGE_STATUTS), m, p=_p(ECHANGE_WEIGHTS))
+    return dem, dst, book_dem, book_dst, statut
+
+
+# ----------------------------
+# Écriture
+# ----------------------------
+class Writer:
+    """Inserts multi-lignes (executemany) par batch, commit par batch, compteurs par table."""
+
+    def __init__(self, cn, batch_size=DEFAULT_BATCH_SIZE):
+        self.cn = cn
+        self.cur = cn.cursor()
+        self.batch_size = batch_size
+        self.stats = {}  # table -> [lignes envoyées, insérées, secondes]
+
+    def insert(self, table, sql, rows):
+        st = self.stats.setdefault(table, [0, 0, 0.0])
+        t0 = time.perf_counter()
+        for i in range(0, len(rows), self.batch_size):
+            batch = rows[i:i + self.batch_size]
+            self.cur.executemany(sql, batch)
+            st[1] += self.cur.rowcount
+            self.cn.commit()
+        st[0] += len(rows)
+        st[2] += time.perf_counter() - t0
+
+    def report(self):
+        print(f"{'table':<12} {'envoyées':>10} {'insérées':>10} {'s':>8} {'lignes/s':>10}")
+        for table, (sent, inserted, seconds) in self.stats.items():
+            print(f"{table:<12} {sent:>10} {inserted:>10} {seconds:>8.1f} {sent / max(seconds, 1e-9):>10.0f}")
+
+
+def load_seed_user_ids(cur, n_users):
+    """id_utilisateur des utilisateurs générés, indexé par leur numéro (email seed<i>.)."""
+    cur.execute("SELECT id_utilisateur, email FROM Utilisateur WHERE email LIKE %s", (SEED_EMAIL_LIKE,))
+    ids = np.full(n_users, -1, dtype=np.int64)
+    for uid, email in cur.fetchall():
+        m = re.match(r"seed(\d+)\.", email)  # LIKE attrape aussi seedbox@test.com...
+        if m and int(m.group(1)) < n_users:
+            ids[int(m.group(1))] = uid
+    if (ids < 0).any():
+        raise RuntimeError(f"{int((ids < 0).sum())} utilisateurs générés introuvables")
+    return ids
+
+
+def count_seed_exchanges(cur):
+    cur.execute("""
+        SELECT COUNT(*)
+        FROM Echange e
+        JOIN Utilisateur u ON u.id_utilisateur = e.demandeur_id
+        WHERE u.email LIKE %s
+    """, (SEED_EMAIL_LIKE,))
+    return cur.fetchone()[0]
+
+
+def seed(cn, isbns, n_users=30, n_exchanges=None, seed_value=42, batch_size=DEFAULT_BATCH_SIZE,
+         password="pass", min_friends=2, max_friends=6, n_admins=0):
+    writer = Writer(cn, batch_size)
+    cur = writer.cur
+    n_books = len(isbns)
+    isbns = np.array(isbns, dtype=object)
+    n_blocks = (n_users + BLOCK_USERS - 1) // BLOCK_USERS
+    n_exchanges = n_users // 10 if n_exchanges is None else n_exchanges
+
+    # 1) utilisateurs : un seul hash (bcrypt, comme /auth) pour tous, email vérifié pour les tests de charge
+    password_hash = hash_password(password)
+    for block in range(n_blocks):
+        users = make_users(seed_value, block * BLOCK_USERS, min(n_users, (block + 1) * BLOCK_USERS), n_admins)
+        writer.insert("Utilisateur", """
+            INSERT IGNORE INTO Utilisateur (nom_utilisateur, email, mot_de_passe, mot_de_passe_hash,
+                                            email_verifie, age, sexe, pays, role)
+            VALUES (%s, %s, '', %s, 1, %s, %s, %s, %s)
+        """, [(name, email, password_hash, age, sexe, pays, role) for name, email, age, sexe, pays, role in users])
+    ids = load_seed_user_ids(cur, n_users)
+    print(f"✔ utilisateurs: {n_users} (dont {writer.stats['Utilisateur'][1]} créés)")
+    if n_admins:
+        print(f"⚠️ {min(n_admins, n_users)} admin(s) avec le mot de passe commun : seed0.* à seed{min(n_admins, n_users) - 1}.*")
+
+    # 2) amitiés, 3) collection / souhaits / évaluations, par bloc d'utilisateurs
+    popularity = book_popularity(seed_value, n_books)
+    for block in range(n_blocks):
+        a, b, accepte = make_friendships(seed_value, block, n_users, min_friends, max_friends)
+        writer.insert("Amitie", """
+            INSERT IGNORE INTO Amitie (utilisateur_1_id, utilisateur_2_id, statut)
+            VALUES (%s, %s, %s)
+        """, list(zip(ids[a].tolist(), ids[b].tolist(), np.where(accepte, "accepte", "en_attente").tolist())))
+
+        (cu, cb), (wu, wb), (ru, rb, notes) = make_content(seed_value, block, n_users, n_books, popularity)
+        writer.insert("Collection", """
+            INSERT IGNORE INTO Collection (utilisateur_id, livre_isbn) VALUES (%s, %s)
+        """, list(zip(ids[cu].tolist(), isbns[cb].tolist())))
+        writer.insert("Souhait", """
+            INSERT IGNORE INTO Souhait (utilisateur_id, livre_isbn) VALUES (%s, %s)
+        """, list(zip(ids[wu].tolist(), isbns[wb].tolist())))
+        writer.insert("Evaluation", """
+            INSERT IGNORE INTO Evaluation (utilisateur_id, livre_isbn, note, avis) VALUES (%s, %s, %s, %s)
+        """, list(zip(ids[ru].tolist(), isbns[rb].tolist(), notes.tolist(), avis_for(notes).tolist())))
+        print(f"  ...bloc {block + 1}/{n_blocks} ({min(n_users, (block + 1) * BLOCK_USERS)} utilisateurs)")
+
+    # 4) échanges : pas de clé unique, on n'ajoute que ceux qui manquent
+    if n_users < 2 or n_books < 2:
+        print("⚠️ échanges ignorés : il faut au moins 2 utilisateurs et 2 livres")
+        return writer
+    done = count_seed_exchanges(cur)
+    statuts = np.array(ECHANGE_STATUTS, dtype=object)
+    for block in range(done // BLOCK_USERS, (n_exchanges + BLOCK_USERS - 1) // BLOCK_USERS):
+        dem, dst, b1, b2, statut = make_exchanges(seed_value, block, n_exchanges, n_users, popularity)
+        skip = max(0, done - block * BLOCK_USERS)
+        writer.insert("Echange", """
+            INSERT INTO Echange (demandeur_id, destinataire_id, livre_demandeur_isbn, livre_destinataire_isbn, statut)
+            VALUES (%s, %s, %s, %s, %s)
+        """, list(zip(ids[dem].tolist(), ids[dst].tolist(), isbns[b1].tolist(), isbns[b2].tolist(),
+                      statuts[statut].tolist()))[skip:])
+
+    return writer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Données de test (utilisateurs, amitiés, contenus, échanges)")
+    parser.add_argument("--users", type=int, default=30, help="nombre d'utilisateurs générés")
+    parser.add_argument("--exchanges", type=int, default=None, help="nombre d'échanges (défaut: users / 10)")
+    parser.add_argument("--books", type=int, default=100000, help="livres de Livre utilisables (par ISBN)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="lignes par INSERT")
+    parser.add_argument("--password", default="pass", help="mot de passe de tous les utilisateurs générés")
+    parser.add_argument("--admins", type=int, default=0,
+                        help="les N premiers utilisateurs générés sont admin (défaut: aucun, tous lecteurs)")
+    args = parser.parse_args(argv)
+
+    cn = get_db_connection()
     cur = cn.cursor()
 
     # 1) livres existants
-    isbns = fetch_all_isbns(cur, limit=10000)
+    isbns = fetch_all_isbns(cur, limit=args.books)
     # 1bis) corriger les dates manquantes dans Livre
-    fill_missing_book_dates(cur, isbns)
+    backfill_publication_dates(cn)
     if not isbns:
         print("❌ Aucun livre dans Livre. Peuple d'abord Livre.")
         cn.close()
         return
 
+    t0 = time.perf_counter()
     try:
-        # 2) utilisateurs
-        user_ids_before = fetch_user_ids(cur)
-        user_ids = ensure_users(cur, target_users=30)
-        created_users = len(user_ids) - len(user_ids_before)
-
-        # 3) amitiés
-        inserted_amitie = ensure_friendships(cur, user_ids)
-
-        # 4) contenus user (collection/wishlist/evals)
-        inserted_collection, inserted_wishlist, inserted_ratings = seed_user_content(cur, user_ids, isbns)
-
-        cn.commit()
-
-        print("✅ Seed terminé.")
-        print(f"Utilisateurs créés: {created_users} (total: {len(user_ids)})")
-        print(f"Amitiés insérées: {inserted_amitie}")
-        print(f"Collection ajoutée: {inserted_collection}")
-        print(f"Wishlist ajoutée: {inserted_wishlist}")
-        print(f"Evaluations ajoutées: {inserted_ratings}")
-
+        writer = seed(cn, isbns, args.users, args.exchanges, args.seed, args.batch_size, args.password,
+                      n_admins=args.admins)
+        print(f"✅ Seed terminé en {time.perf_counter() - t0:.1f} s.")
+        writer.report()
     except MySQLError as e:
         cn.rollback()
         print("❌ Erreur seed:", e)
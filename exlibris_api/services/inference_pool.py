@@ -0,0 +1,162 @@
+"""
+Exécuteur d'inférence ML isolé du trafic CRUD.
+
+Les appels CPU (predict_proba, produits TF-IDF) tiennent le GIL : exécutés
+dans le threadpool de Starlette, ils ralentissent tous les autres endpoints
+du worker uvicorn. Ils partent donc dans un pool de process dédié
+(ML_INFERENCE_WORKERS, 1 par défaut) ; chaque process charge le bundle une
+seule fois (artefacts en mmap, donc pages partagées). Avec 0, le calcul reste
+dans le process API (threadpool) mais la concurrence ML reste bornée.
+
+Une tâche est une fonction de module (picklable) appelée fn(bundle, *args).
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from services.ml_models import ML_DIR, load_model_bundle
+
+
+class InferenceOverloaded(RuntimeError):
+    """File d'attente d'inférence pleine : l'appelant doit répondre 503."""
+
+
+# bundle propre à chaque process worker (rempli par _init_worker)
+_WORKER_BUNDLE = None
+
+
+def _init_worker(ml_dir: str) -> None:
+    global _WORKER_BUNDLE
+    _WORKER_BUNDLE = load_model_bundle(Path(ml_dir), verbose=False)
+
+
+def _run_in_worker(fn: Callable, args: tuple) -> Any:
+    return fn(_WORKER_BUNDLE, *args)
+
+
+def _ping() -> bool:
+    return _WORKER_BUNDLE is not None
+
+
+class InferenceExecutor:
+    def __init__(self, workers: int = 0, max_in_flight: int = 0, max_queue: int = 256):
+        self.workers = max(0, workers)
+        # nombre de tâches ML exécutées simultanément (au-delà: attente)
+        self.max_in_flight = max_in_flight or max(1, self.workers * 2 if self.workers else 4)
+        # nombre de tâches en attente tolérées (au-delà: InferenceOverloaded)
+        self.max_queue = max_queue
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._local_bundle = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self._waiting = 0
+        self._in_flight = 0
+        self._max_waiting_seen = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._wait_s = 0.0
+        self._run_s = 0.0
+
+    def _new_pool(self, ml_dir: Path) -> tuple[ProcessPoolExecutor, list]:
+        # spawn: pas de fork d'un process qui a déjà une boucle asyncio et des threads
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(str(ml_dir),),
+        )
+        # démarre les process (et le chargement des modèles) dès maintenant
+        return pool, [pool.submit(_ping) for _ in range(self.workers)]
+
+    def start(self, local_bundle, ml_dir: Optional[Path] = None) -> None:
+        self._local_bundle = local_bundle
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self.workers:
+            self._pool, _ = self._new_pool(ml_dir or getattr(local_bundle, "ml_dir", None) or ML_DIR)
+            print(f"[ML] Pool d'inférence: {self.workers} process.")
+
+    def set_local_bundle(self, bundle) -> None:
+        self._local_bundle = bundle
+
+    async def reload(self, bundle, ml_dir: Path) -> None:
+        """
+        Bascule sur un nouveau bundle sans interrompre les requêtes : en mode
+        process, un nouveau pool est démarré et chauffé (modèles chargés)
+        avant de remplacer l'ancien, qui termine ses tâches en cours.
+        """
+        if self._pool is not None:
+            pool, warmup = self._new_pool(ml_dir)
+            try:
+                await asyncio.gather(*(asyncio.wrap_future(f) for f in warmup))
+            except Exception:
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            old, self._pool = self._pool, pool
+            old.shutdown(wait=False)
+        self._local_bundle = bundle
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def submit(self, fn: Callable, *args) -> Any:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise InferenceOverloaded("File d'inférence pleine")
+
+        self._submitted += 1
+        self._waiting += 1
+        self._max_waiting_seen = max(self._max_waiting_seen, self._waiting)
+        t0 = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        t1 = time.perf_counter()
+        self._wait_s += t1 - t0
+        try:
+            if self._pool is not None:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._pool, _run_in_worker, fn, args)
+            else:
+                result = await run_in_threadpool(fn, self._local_bundle, *args)
+            self._completed += 1
+            return result
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._in_flight -= 1
+            self._run_s += time.perf_counter() - t1
+            self._semaphore.release()
+
+    def metrics(self) -> dict:
+        done = max(self._completed + self._failed, 1)
+        return {
+            "mode": "process" if self._pool is not None else "thread",
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "queue_depth": self._waiting,
+            "queue_depth_max": self._max_waiting_seen,
+            "in_flight": self._in_flight,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "rejected": self._rejected,
+            "avg_wait_ms": round(1000 * self._wait_s / done, 3),
+            "avg_run_ms": round(1000 * self._run_s / done, 3),
+        }
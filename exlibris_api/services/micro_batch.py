@@ -0,0 +1,118 @@
+"""
+Micro-batching des appels d'inférence concurrents.
+
+Quand beaucoup d'utilisateurs ouvrent l'accueil en même temps, chaque
+/me/recommendations appelle predict_proba sur ~500 lignes : le coût fixe
+(ColumnTransformer, construction du DataFrame) domine. Le MicroBatcher
+retient les jobs pendant au plus `max_wait_ms` (ou jusqu'à `max_batch_rows`
+lignes cumulées), envoie le lot entier en UNE tâche à l'InferenceExecutor,
+puis rend à chaque appelant sa part du résultat.
+
+`batch_fn(bundle, jobs) -> [résultat par job]` doit être une fonction de
+module (picklable), ex: services.reco_scoring.score_candidates_batch. Elle
+peut être donnée sous forme "module:fonction" : le module n'est alors
+importé qu'au premier lot (imports lourds différés).
+"""
+import asyncio
+import importlib
+from typing import Any, Callable, Optional, Union
+
+
+class MicroBatcher:
+    def __init__(self, executor, batch_fn: Union[Callable, str], max_batch_rows: int = 4096, max_wait_ms: float = 2.0):
+        self.executor = executor
+        self._batch_fn = batch_fn
+        self.max_batch_rows = max(1, max_batch_rows)
+        self.max_wait_ms = max(0.0, max_wait_ms)
+
+        self._pending: list[tuple[Any, asyncio.Future]] = []
+        self._pending_rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+        self._batches = 0
+        self._jobs = 0
+        self._rows = 0
+        self._max_jobs_seen = 0
+        self._flush_full = 0
+
+    @property
+    def batch_fn(self) -> Callable:
+        if isinstance(self._batch_fn, str):
+            module, _, name = self._batch_fn.partition(":")
+            self._batch_fn = getattr(importlib.import_module(module), name)
+        return self._batch_fn
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_wait_ms > 0
+
+    async def submit(self, job: Any, rows: int) -> Any:
+        """Ajoute un job (de `rows` lignes) au lot courant et attend son résultat."""
+        if not self.enabled:
+            self._record(1, rows)
+            return (await self.executor.submit(self.batch_fn, [job]))[0]
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((job, future))
+        self._pending_rows += rows
+
+        if self._pending_rows >= self.max_batch_rows:
+            self._flush_full += 1
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000.0, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, rows = self._pending, self._pending_rows
+        self._pending, self._pending_rows = [], 0
+        if not batch:
+            return
+
+        self._record(len(batch), rows)
+
+        # garder une référence: asyncio ne conserve que des références faibles aux tâches
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _record(self, jobs: int, rows: int) -> None:
+        self._batches += 1
+        self._jobs += jobs
+        self._rows += rows
+        self._max_jobs_seen = max(self._max_jobs_seen, jobs)
+
+    async def _run(self, batch: list) -> None:
+        try:
+            results = await self.executor.submit(self.batch_fn, [job for job, _ in batch])
+        except Exception as e:
+            # même erreur pour tout le lot (ex: InferenceOverloaded -> 503 partout)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            # une requête annulée (client parti) a déjà son future "done"
+            if not future.done():
+                future.set_result(result)
+
+    def metrics(self) -> dict:
+        batches = max(self._batches, 1)
+        return {
+            "enabled": self.enabled,
+            "max_wait_ms": self.max_wait_ms,
+            "max_batch_rows": self.max_batch_rows,
+            "batches": self._batches,
+            "jobs": self._jobs,
+            "flushed_full": self._flush_full,
+            "avg_jobs_per_batch": round(self._jobs / batches, 3),
+            "avg_rows_per_batch": round(self._rows / batches, 1),
+            "max_jobs_per_batch": self._max_jobs_seen,
+        }
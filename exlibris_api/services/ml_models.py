@@ -0,0 +1,141 @@
+"""
+Chargement des artefacts ML servis par l'API (un "bundle" cohérent).
+
+Utilisé par main.py (process API) et par les workers d'inférence
+(services/inference_pool.py) : chaque process charge le même répertoire,
+les tableaux volumineux étant mappés en mémoire (mmap) et donc partagés
+via le page cache.
+
+joblib / numpy / scipy (et sklearn via le pickle) ne sont importés qu'au
+premier chargement : importer ce module ne coûte rien à un worker qui ne
+sert que l'auth, les échanges ou Stripe.
+"""
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from core.config import ML_COMPILED_SCORER, ML_DIR as ML_DIR_ENV
+from services.model_registry import current_release_dir, read_manifest, verify_release
+
+
+ML_DIR = Path(ML_DIR_ENV) if ML_DIR_ENV else Path(__file__).resolve().parent.parent / "ml"
+
+VERSIONED_ARTIFACTS = (
+    "reco_pipeline.pkl",
+    "reco_scorer.npz",
+    "tfidf_vectorizer.pkl",
+    "tfidf_index/matrix_data.npy",
+    "tfidf_matrix.npz",
+)
+
+
+def artifacts_version(ml_dir: Path) -> str:
+    """Empreinte courte (taille + date de modif.) des artefacts présents."""
+    h = hashlib.sha1()
+    for name in VERSIONED_ARTIFACTS:
+        path = Path(ml_dir) / name
+        if path.exists():
+            st = path.stat()
+            h.update(f"{name}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()[:12]
+
+
+@dataclass
+class ModelBundle:
+    pipeline: Any = None
+    # version NumPy compilée du pipeline (services/reco_scorer), None si absente
+    scorer: Any = None
+    tfidf_vect: Any = None
+    tfidf_matrix: Any = None
+    tfidf_meta: Any = None
+    tfidf_partitions: dict = field(default_factory=dict)
+    # identifie le jeu d'artefacts chargé (clé du cache de recommandations)
+    version: str = ""
+    ml_dir: Optional[Path] = None
+
+    @property
+    def gbm_model(self):
+        """Modèle utilisé pour predict_proba : le scorer compilé s'il existe, sinon le pipeline sklearn."""
+        return self.scorer if self.scorer is not None else self.pipeline
+
+    @property
+    def has_tfidf(self) -> bool:
+        return self.tfidf_matrix is not None and self.tfidf_meta is not None
+
+
+def load_model_bundle(ml_dir: Optional[Path] = None, verbose: bool = True, verify: bool = False) -> ModelBundle:
+    """
+    Charge reco_pipeline.pkl (et son scorer compilé), le vectorizer et l'index TF-IDF (binaire en mmap,
+    sinon npz/json legacy) ainsi que les partitions. Un artefact absent ou
+    illisible laisse simplement le champ à None (l'endpoint renverra 503).
+
+    Sans `ml_dir`, charge la version courante du registre (ml/CURRENT),
+    ou ml/ à plat. `verify` contrôle les sha256 du manifest avant tout
+    chargement (RegistryError si un fichier ne correspond pas).
+    """
+    import joblib
+
+    from services.reco_scorer import SCORER_NAME, CompiledScorer
+    from services.tfidf_store import (
+        has_tfidf_index,
+        load_legacy_tfidf,
+        load_tfidf_matrix,
+        load_tfidf_meta,
+        load_tfidf_partitions,
+    )
+
+    ml_dir = Path(ml_dir) if ml_dir else current_release_dir(ML_DIR)
+    log = print if verbose else (lambda *_: None)
+    manifest = read_manifest(ml_dir)
+    if verify and manifest is not None:
+        verify_release(ml_dir)
+    bundle = ModelBundle(ml_dir=ml_dir)
+
+    try:
+        # mmap_mode: les tableaux numpy du pickle (arbres, vocabulaire) sont mappés, pas copiés
+        bundle.pipeline = joblib.load(ml_dir / "reco_pipeline.pkl", mmap_mode="r")
+        log("[ML] reco_pipeline chargé.")
+    except Exception as e:
+        bundle.pipeline = None
+        log(f"[ML] Impossible de charger le modèle: {e}")
+
+    scorer_path = ml_dir / SCORER_NAME
+    if bundle.pipeline is not None and ML_COMPILED_SCORER and scorer_path.exists():
+        try:
+            bundle.scorer = CompiledScorer.load(scorer_path)
+            log("[ML] Scorer compilé chargé.")
+        except Exception as e:
+            bundle.scorer = None
+            log(f"[ML] Impossible de charger le scorer compilé: {e}")
+
+    try:
+        bundle.tfidf_vect = joblib.load(ml_dir / "tfidf_vectorizer.pkl")
+        index_dir = ml_dir / "tfidf_index"
+        if has_tfidf_index(index_dir):
+            # format binaire: matrice + méta en mmap, partagées entre workers
+            bundle.tfidf_matrix = load_tfidf_matrix(index_dir)
+            bundle.tfidf_meta = load_tfidf_meta(index_dir)
+        else:
+            bundle.tfidf_matrix, bundle.tfidf_meta = load_legacy_tfidf(
+                ml_dir / "tfidf_matrix.npz", ml_dir / "tfidf_meta.json"
+            )
+        log("[ML] TFIDF modèle livres chargé.")
+    except Exception as e:
+        bundle.tfidf_vect = None
+        bundle.tfidf_matrix = None
+        bundle.tfidf_meta = None
+        log(f"[ML] Impossible de charger TFIDF: {e}")
+
+    try:
+        bundle.tfidf_partitions = load_tfidf_partitions(ml_dir / "tfidf_partitions")
+        if bundle.tfidf_partitions:
+            log(f"[ML] {len(bundle.tfidf_partitions)} partitions TFIDF chargées.")
+    except Exception as e:
+        bundle.tfidf_partitions = {}
+        log(f"[ML] Impossible de charger les partitions TFIDF: {e}")
+
+    bundle.version = manifest["version"] if manifest else artifacts_version(ml_dir)
+    if manifest:
+        log(f"[ML] Version {bundle.version} chargée.")
+    return bundle
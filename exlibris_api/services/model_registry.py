@@ -0,0 +1,257 @@
+"""
+Registre versionné des artefacts ML.
+
+Disposition :
+  ml/releases/<version>/          une version complète et immuable
+      manifest.json               version, date, parent, sha256 par fichier, stats d'entraînement
+      reco_pipeline.pkl
+      reco_scorer.npz             scorer NumPy compilé du pipeline (optionnel)
+      tfidf_vectorizer.pkl
+      tfidf_index/ ...
+      tfidf_partitions/ ...
+  ml/CURRENT                      nom de la version servie (remplacé atomiquement)
+
+Publication (scripts d'entraînement) : les artefacts sont écrits dans un
+répertoire de staging (new_staging_dir), puis publish_release complète ce
+qui n'a pas été reconstruit avec la version courante (liens durs), calcule
+les checksums, renomme le staging en releases/<version> et bascule CURRENT.
+Un lecteur voit donc soit l'ancienne version, soit la nouvelle, jamais un
+mélange.
+
+Sans fichier CURRENT, l'API sert ml/ à plat (ancienne disposition).
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+RELEASES_DIR = "releases"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+
+# éléments de premier niveau d'une version (fichier ou répertoire)
+COMPONENTS = ("reco_pipeline.pkl", "reco_scorer.npz", "tfidf_vectorizer.pkl", "tfidf_index", "tfidf_partitions")
+# index TF-IDF de l'ancienne disposition (converti en tfidf_index/ à la 1re publication)
+LEGACY_TFIDF = ("tfidf_matrix.npz", "tfidf_meta.json")
+
+
+class RegistryError(RuntimeError):
+    """Version absente, manifest illisible ou checksum invalide."""
+
+
+# --------------------------------------------------------------------
+# Lecture
+# --------------------------------------------------------------------
+def releases_dir(ml_dir: Path) -> Path:
+    return Path(ml_dir) / RELEASES_DIR
+
+
+def current_version(ml_dir: Path) -> Optional[str]:
+    path = Path(ml_dir) / CURRENT_FILE
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8").strip() or None
+
+
+def release_dir(ml_dir: Path, version: str) -> Path:
+    path = releases_dir(ml_dir) / version
+    if not (path / MANIFEST_FILE).exists():
+        raise RegistryError(f"Version inconnue: {version}")
+    return path
+
+
+def current_release_dir(ml_dir: Path) -> Path:
+    """Répertoire d'artefacts servi : la version CURRENT, sinon ml/ à plat."""
+    version = current_version(ml_dir)
+    return release_dir(ml_dir, version) if version else Path(ml_dir)
+
+
+def read_manifest(path: Path) -> Optional[dict]:
+    manifest_path = Path(path) / MANIFEST_FILE
+    if not manifest_path.exists():
+        return None
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_releases(ml_dir: Path) -> list[dict]:
+    """Manifests de toutes les versions publiées, de la plus ancienne à la plus récente."""
+    root = releases_dir(ml_dir)
+    if not root.exists():
+        return []
+    manifests = []
+    for path in root.iterdir():
+        if path.is_dir() and not path.name.startswith("."):
+            manifest = read_manifest(path)
+            if manifest:
+                manifests.append(manifest)
+    return sorted(manifests, key=lambda m: m["created_at"])
+
+
+def _sha256(path: Path) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _artifact_files(root: Path) -> list[Path]:
+    files = []
+    for name in COMPONENTS:
+        path = root / name
+        if path.is_file():
+            files.append(path)
+        elif path.is_dir():
+            files.extend(p for p in sorted(path.rglob("*")) if p.is_file())
+    return files
+
+
+def verify_release(path: Path) -> None:
+    """Vérifie les sha256 du manifest (lève RegistryError au premier écart)."""
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise RegistryError(f"Manifest absent: {path}")
+    for rel, expected in manifest["checksums"].items():
+        file = Path(path) / rel
+        if not file.exists():
+            raise RegistryError(f"{manifest['version']}: fichier manquant {rel}")
+        if _sha256(file) != expected:
+            raise RegistryError(f"{manifest['version']}: checksum invalide pour {rel}")
+
+
+# --------------------------------------------------------------------
+# Publication
+# --------------------------------------------------------------------
+def _write_atomic(path: Path, text: str) -> None:
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+def link_tree(src: Path, dst: Path, exclude=()) -> None:
+    """
+    Reprend `src` dans `dst` par liens durs (aucune copie de données).
+    Ne jamais réécrire ensuite un fichier lié : il est partagé avec la
+    version d'origine.
+    """
+    src, dst = Path(src), Path(dst)
+    if src.is_file():
+        _link_or_copy(src, dst)
+        return
+    for path in src.rglob("*"):
+        rel = path.relative_to(src)
+        if path.is_file() and rel.parts[0] not in exclude:
+            _link_or_copy(path, dst / rel)
+
+
+def new_staging_dir(ml_dir: Path) -> Path:
+    root = releases_dir(ml_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(dir=root, prefix=".staging-"))
+
+
+def publish_release(ml_dir: Path, staging: Path, stats: Optional[dict] = None, source: str = "",
+                    drop=()) -> str:
+    """
+    Publie `staging` comme nouvelle version et la rend courante.
+    Les composants absents du staging sont repris de la version courante,
+    sauf ceux de `drop` (dérivés d'un composant réentraîné, ex. le scorer
+    compilé du pipeline). Retourne le nom de la version publiée.
+    """
+    ml_dir, staging = Path(ml_dir), Path(staging)
+    parent = current_version(ml_dir)
+    base = current_release_dir(ml_dir)
+
+    for name in COMPONENTS:
+        if name not in drop and not (staging / name).exists() and (base / name).exists():
+            link_tree(base / name, staging / name)
+
+    # ml/ à plat d'avant le registre : tfidf_matrix.npz + tfidf_meta.json au
+    # lieu de tfidf_index/, que le chargement d'une version attend
+    legacy = (base / LEGACY_TFIDF[0], base / LEGACY_TFIDF[1])
+    if "tfidf_index" not in drop and not (staging / "tfidf_index").exists() and all(p.exists() for p in legacy):
+        from services.tfidf_store import convert_legacy_tfidf  # numpy/scipy : seulement si besoin
+
+        convert_legacy_tfidf(*legacy, staging / "tfidf_index")
+
+    files = _artifact_files(staging)
+    if not files:
+        raise RegistryError("Rien à publier")
+
+    now = datetime.now(timezone.utc)
+    checksums = {str(p.relative_to(staging)): _sha256(p) for p in files}
+    digest = hashlib.sha256("".join(sorted(checksums.values())).encode()).hexdigest()
+    version = f"{now:%Y%m%dT%H%M%S}-{digest[:8]}"
+
+    # stats des composants repris : celles de la version parente
+    parent_stats = (read_manifest(base) or {}).get("stats", {})
+    manifest = {
+        "version": version,
+        "created_at": now.isoformat(),
+        "parent": parent,
+        "source": source,
+        "checksums": checksums,
+        "stats": {**parent_stats, **(stats or {})},
+    }
+    with open(staging / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    final = releases_dir(ml_dir) / version
+    os.rename(staging, final)
+    set_current(ml_dir, version)
+    return version
+
+
+def set_current(ml_dir: Path, version: str) -> None:
+    release_dir(ml_dir, version)  # lève si inconnue
+    _write_atomic(Path(ml_dir) / CURRENT_FILE, version + "\n")
+
+
+def previous_version(ml_dir: Path, version: Optional[str] = None) -> Optional[str]:
+    """
+    Version servie avant `version` (par défaut la courante) : le parent du
+    manifest s'il existe encore, sinon la version publiée juste avant.
+    """
+    version = version or current_version(ml_dir)
+    manifests = list_releases(ml_dir)
+    names = [m["version"] for m in manifests]
+    if version not in names:
+        return None
+    i = names.index(version)
+    parent = manifests[i].get("parent")
+    if parent in names:
+        return parent
+    return names[i - 1] if i > 0 else None
+
+
+def prune_releases(ml_dir: Path, keep: int = 5) -> list[str]:
+    """Supprime les plus anciennes versions (jamais la courante)."""
+    current = current_version(ml_dir)
+    names = [m["version"] for m in list_releases(ml_dir)]
+    removed = []
+    for name in names[: max(0, len(names) - keep)]:
+        if name != current:
+            shutil.rmtree(releases_dir(ml_dir) / name)
+            removed.append(name)
+    # staging abandonnés (script interrompu) de plus d'un jour
+    for path in releases_dir(ml_dir).glob(".staging-*"):
+        if time.time() - path.stat().st_mtime > 86400:
+            shutil.rmtree(path, ignore_errors=True)
+    return removed
@@ -0,0 +1,122 @@
+"""
+Cache par utilisateur des recommandations déjà scorées.
+
+Le résultat de /me/recommendations ne change que si la collection, les
+notes, le profil (age/pays) de l'utilisateur ou le modèle changent : on
+garde donc les `depth` meilleures recommandations par (utilisateur,
+version du modèle, mode, poids contenu), avec une durée de vie (TTL) et
+un nombre maximum d'utilisateurs (LRU).
+
+Invalidation : les écritures qui modifient les entrées du modèle
+(collection, notes, échange terminé) appellent RECO_CACHE.invalidate_user.
+Le cache est propre à chaque process uvicorn ; avec plusieurs workers, une
+écriture traitée par un autre worker n'est visible qu'à expiration du TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from core.config import RECO_CACHE_DEPTH, RECO_CACHE_MAX_USERS, RECO_CACHE_TTL_SECONDS
+
+
+class RecoCache:
+    def __init__(self, ttl_seconds: float = 300, max_users: int = 10000, depth: int = 50):
+        self.ttl_seconds = ttl_seconds
+        self.max_users = max_users
+        self.depth = depth
+        # user_id -> {variante: (expire_à, items, complet)} ; ordre = LRU
+        self._entries: "OrderedDict[int, dict]" = OrderedDict()
+        # user_id -> nombre d'invalidations (détecte une écriture pendant un calcul)
+        self._generations: dict[int, int] = {}
+        # les endpoints sync tournent dans le threadpool
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._expired = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0 and self.max_users > 0
+
+    def get(self, user_id: int, variant: tuple, limit: int) -> Optional[list]:
+        """Les `limit` premières recommandations en cache, None si absentes/expirées/trop courtes."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(user_id, {}).get(variant)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, items, complete = entry
+            if expires_at <= time.monotonic():
+                del self._entries[user_id][variant]
+                self._expired += 1
+                self._misses += 1
+                return None
+            if limit > len(items) and not complete:
+                # la liste en cache a été tronquée à `depth` : il faut recalculer
+                self._misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return items[:limit]
+
+    def generation(self, user_id: int) -> int:
+        with self._lock:
+            return self._generations.get(user_id, 0)
+
+    def put(self, user_id: int, variant: tuple, items: list[Any], complete: bool,
+            generation: Optional[int] = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generations.get(user_id, 0):
+                # invalidé entre le début du calcul et maintenant
+                return
+            variants = self._entries.setdefault(user_id, {})
+            variants[variant] = (time.monotonic() + self.ttl_seconds, items, complete)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_user(self, *user_ids: int) -> None:
+        with self._lock:
+            if len(self._generations) > 2 * self.max_users:
+                self._generations.clear()
+            for user_id in user_ids:
+                self._generations[user_id] = self._generations.get(user_id, 0) + 1
+                if self._entries.pop(user_id, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl_seconds,
+                "max_users": self.max_users,
+                "depth": self.depth,
+                "users": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "expired": self._expired,
+                "invalidations": self._invalidations,
+                "evictions": self._evictions,
+            }
+
+
+RECO_CACHE = RecoCache(
+    ttl_seconds=RECO_CACHE_TTL_SECONDS,
+    max_users=RECO_CACHE_MAX_USERS,
+    depth=RECO_CACHE_DEPTH,
+)
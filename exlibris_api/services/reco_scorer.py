@@ -0,0 +1,200 @@
+"""
+Scorer NumPy compilé depuis le pipeline GBM de train_reco.py.
+
+Au service, on n'a besoin que de predict_proba pour six colonnes connues ;
+passer par Pipeline / ColumnTransformer / DataFrame coûte plus cher que
+les arbres eux-mêmes. compile_pipeline aplatit le pipeline entraîné en
+tableaux :
+  - StandardScaler     : moyennes et écarts-types
+  - OneHotEncoder      : catégories par colonne (-> index de colonne)
+  - TfidfVectorizer    : vocabulaire, idf, motif de tokenisation
+  - GradientBoosting   : arbres concaténés (feature, seuil, fils, valeur)
+                         + prédiction initiale et learning rate
+sauvegardés dans reco_scorer.npz. CompiledScorer.predict_proba redonne les
+mêmes probabilités que le pipeline (mêmes opérations, features converties
+en float32 comme le fait sklearn avant de parcourir les arbres), sans
+sklearn ni pandas.
+
+Seul le backend "gbm" est compilable : compile_pipeline lève ValueError
+pour un autre pipeline (l'API sert alors le pickle sklearn).
+"""
+import re
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+SCORER_NAME = "reco_scorer.npz"
+
+# résumés TF-IDF déjà vectorisés (les candidats sont souvent les mêmes livres)
+TEXT_CACHE_SIZE = 20000
+
+
+def compile_pipeline(pipeline) -> dict:
+    """Tableaux du scorer (dict nom -> ndarray) ; ValueError si le pipeline n'est pas compilable."""
+    from sklearn.dummy import DummyClassifier
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    prep, model = pipeline.named_steps["prep"], pipeline.named_steps["model"]
+    if not isinstance(model, GradientBoostingClassifier) or model.n_classes_ != 2:
+        raise ValueError(f"Modèle non compilable: {type(model).__name__}")
+    if not isinstance(model.init_, DummyClassifier) or model.init_.strategy != "prior":
+        raise ValueError("Prédiction initiale non supportée (init_ doit être DummyClassifier(prior))")
+
+    transformers = {name: (est, cols) for name, est, cols in prep.transformers_ if name != "remainder"}
+    if [name for name, _, _ in prep.transformers_ if name != "remainder"] != ["num", "cat", "txt"]:
+        raise ValueError("ColumnTransformer inattendu (num, cat, txt)")
+    scaler, num_cols = transformers["num"]
+    onehot, cat_cols = transformers["cat"]
+    tfidf, text_col = transformers["txt"]
+    if not isinstance(scaler, StandardScaler) or not isinstance(onehot, OneHotEncoder) \
+            or not isinstance(tfidf, TfidfVectorizer):
+        raise ValueError("Transformations non supportées")
+    if onehot.drop is not None or onehot.handle_unknown != "ignore" or getattr(onehot, "_infrequent_enabled", False):
+        raise ValueError("OneHotEncoder non supporté (drop / infrequent)")
+    if (tfidf.analyzer != "word" or tfidf.ngram_range != (1, 1) or tfidf.tokenizer or tfidf.preprocessor
+            or tfidf.stop_words or tfidf.strip_accents or tfidf.binary or tfidf.sublinear_tf
+            or tfidf.norm != "l2" or not tfidf.use_idf):
+        raise ValueError("TfidfVectorizer non supporté (options de tokenisation / pondération)")
+
+    terms = sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get)
+
+    trees = [est.tree_ for est in model.estimators_[:, 0]]
+    sizes = np.array([t.node_count for t in trees])
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    left = np.concatenate([t.children_left for t in trees]).astype(np.int64)
+    right = np.concatenate([t.children_right for t in trees]).astype(np.int64)
+    node_ids = np.arange(len(left))
+    is_leaf = left == -1
+    shift = np.repeat(offsets, sizes)
+    # feuille : ses deux "fils" pointent sur elle-même (parcours à nombre d'étapes fixe)
+    left = np.where(is_leaf, node_ids, left + shift)
+    right = np.where(is_leaf, node_ids, right + shift)
+
+    prior = float(model.init_.class_prior_[1])
+    return {
+        "num_features": np.array(num_cols, dtype=str),
+        "scaler_mean": np.asarray(scaler.mean_, dtype=np.float64),
+        "scaler_scale": np.asarray(scaler.scale_, dtype=np.float64),
+        "cat_features": np.array(cat_cols, dtype=str),
+        "cat_sizes": np.array([len(c) for c in onehot.categories_], dtype=np.int64),
+        "cat_values": np.concatenate([np.asarray(c).astype(str) for c in onehot.categories_]),
+        "text_feature": np.array(text_col if isinstance(text_col, str) else text_col[0]),
+        "text_lowercase": np.array(bool(tfidf.lowercase)),
+        "text_token_pattern": np.array(tfidf.token_pattern),
+        "text_terms": np.array(terms, dtype=str),
+        "text_idf": np.asarray(tfidf.idf_, dtype=np.float64),
+        "tree_roots": offsets.astype(np.int64),
+        "tree_feature": np.where(is_leaf, 0, np.concatenate([t.feature for t in trees])).astype(np.int64),
+        "tree_threshold": np.concatenate([t.threshold for t in trees]).astype(np.float64),
+        "tree_left": left,
+        "tree_right": right,
+        "tree_value": np.concatenate([t.value[:, 0, 0] for t in trees]).astype(np.float64),
+        "tree_depth": np.array(max(t.max_depth for t in trees), dtype=np.int64),
+        "learning_rate": np.array(float(model.learning_rate)),
+        "raw_init": np.array(np.log(prior / (1.0 - prior))),
+    }
+
+
+def save_scorer(path: Path, arrays: dict) -> None:
+    np.savez(path, **arrays)
+
+
+class CompiledScorer:
+    """predict_proba du pipeline GBM, en NumPy pur."""
+
+    def __init__(self, arrays: dict):
+        self.num_features = [str(c) for c in arrays["num_features"]]
+        self.scaler_mean = arrays["scaler_mean"]
+        self.scaler_scale = arrays["scaler_scale"]
+
+        self.cat_features = [str(c) for c in arrays["cat_features"]]
+        self.cat_index = []  # par colonne : libellé -> index de colonne dans X
+        offset = len(self.num_features)
+        start = 0
+        for size in arrays["cat_sizes"]:
+            values = arrays["cat_values"][start:start + size]
+            self.cat_index.append({str(v): offset + i for i, v in enumerate(values)})
+            offset += int(size)
+            start += int(size)
+
+        self.text_feature = str(arrays["text_feature"])
+        self.text_offset = offset
+        self.lowercase = bool(arrays["text_lowercase"])
+        self.token_re = re.compile(str(arrays["text_token_pattern"]))
+        self.vocabulary = {str(t): i for i, t in enumerate(arrays["text_terms"])}
+        self.idf = arrays["text_idf"]
+        self.n_features = offset + len(self.idf)
+        self._text_row = lru_cache(maxsize=TEXT_CACHE_SIZE)(self._tfidf_row)
+
+        self.roots = arrays["tree_roots"]
+        self.feature = arrays["tree_feature"]
+        self.threshold = arrays["tree_threshold"]
+        # fils gauche / droit entrelacés : children[2 * noeud + va_à_droite]
+        self.children = np.column_stack([arrays["tree_left"], arrays["tree_right"]]).ravel()
+        self.value = arrays["tree_value"]
+        self.depth = int(arrays["tree_depth"])
+        self.learning_rate = float(arrays["learning_rate"])
+        self.raw_init = float(arrays["raw_init"])
+
+    @classmethod
+    def load(cls, path: Path) -> "CompiledScorer":
+        with np.load(path, allow_pickle=False) as data:
+            return cls({k: data[k] for k in data.files})
+
+    def _tfidf_row(self, text: str) -> tuple:
+        """(colonnes de X, valeurs) TF-IDF normalisées L2 d'un texte (comme TfidfVectorizer.transform)."""
+        if self.lowercase:
+            text = text.lower()
+        counts = {}
+        for token in self.token_re.findall(text):
+            j = self.vocabulary.get(token)
+            if j is not None:
+                counts[j] = counts.get(j, 0) + 1
+        cols = np.fromiter(sorted(counts), dtype=np.int64, count=len(counts))
+        values = np.array([counts[j] for j in cols], dtype=np.float64) * self.idf[cols]
+        if len(values):
+            values /= np.sqrt(np.dot(values, values))
+        return cols + self.text_offset, values
+
+    def transform(self, columns) -> np.ndarray:
+        """Matrice de features float32 (n, n_features) ; `columns` : DataFrame ou dict de listes."""
+        n = len(columns[self.num_features[0]])
+        X = np.zeros((n, self.n_features), dtype=np.float64)
+        for j, name in enumerate(self.num_features):
+            X[:, j] = (np.asarray(columns[name], dtype=np.float64) - self.scaler_mean[j]) / self.scaler_scale[j]
+        rows = np.arange(n)
+        for name, index in zip(self.cat_features, self.cat_index):
+            # modalité inconnue : toute la ligne one-hot reste à 0 (handle_unknown="ignore")
+            cols = np.fromiter((index.get(v, -1) for v in columns[name]), dtype=np.int64, count=n)
+            known = cols >= 0
+            X[rows[known], cols[known]] = 1.0
+        text_rows = [self._text_row(text) for text in columns[self.text_feature]]
+        lengths = np.fromiter((len(c) for c, _ in text_rows), dtype=np.int64, count=n)
+        if lengths.any():
+            X[np.repeat(rows, lengths), np.concatenate([c for c, _ in text_rows])] = \
+                np.concatenate([v for _, v in text_rows])
+        # sklearn convertit en float32 avant de parcourir les arbres
+        return X.astype(np.float32)
+
+    def raw_predict(self, X: np.ndarray) -> np.ndarray:
+        n, n_features = X.shape
+        flat = np.ascontiguousarray(X).ravel()
+        # un noeud courant par (ligne, arbre), tous les arbres avancés d'un niveau à la fois
+        node = np.tile(self.roots, n)
+        row_start = np.repeat(np.arange(n) * n_features, len(self.roots))
+        for _ in range(self.depth):
+            go_right = flat[row_start + self.feature[node]] > self.threshold[node]
+            node = self.children[2 * node + go_right]
+        leaf_values = self.value[node].reshape(n, len(self.roots))
+        # même ordre d'accumulation que sklearn (arbre par arbre)
+        raw = np.full(n, self.raw_init)
+        for t in range(leaf_values.shape[1]):
+            raw += self.learning_rate * leaf_values[:, t]
+        return raw
+
+    def predict_proba(self, columns) -> np.ndarray:
+        p = 1.0 / (1.0 + np.exp(-self.raw_predict(self.transform(columns))))
+        return np.column_stack([1.0 - p, p])
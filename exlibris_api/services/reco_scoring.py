@@ -0,0 +1,244 @@
+"""
+Scoring des recommandations : modèle GBM démographique, similarité de
+contenu TF-IDF avec le profil utilisateur, et mélange des deux (hybride).
+
+Un candidat est un tuple issu de CANDIDATES_SQL :
+    (isbn, titre, auteur, langue, categorie, annee_publication, resume)
+
+Les fonctions "tâches" (score_candidates[_batch], similar_books, semantic_search)
+prennent un ModelBundle en premier argument : elles tournent aussi bien
+dans le process API que dans un worker d'inférence.
+"""
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+
+from services.reco_scorer import CompiledScorer
+from services.tfidf_store import candidate_partition_keys
+
+
+CANDIDATES_SQL = """
+    SELECT
+        l.isbn, l.titre, COALESCE(l.auteur, ''),
+        COALESCE(l.langue, 'UNK'),
+        COALESCE(c.nomcat, 'UNK') AS categorie,
+        COALESCE(YEAR(l.date_publication), 0) AS annee_publication,
+        COALESCE(l.resume, '') AS resume
+    FROM Livre l
+    LEFT JOIN Categorie c ON c.id = l.categorie_id
+    ORDER BY l.date_publication DESC
+    LIMIT %s
+"""
+
+# poids d'un livre de la collection dans le profil (une note vaut note / 10)
+COLLECTION_WEIGHT = 1.0
+
+
+def feature_columns(age: int, pays: str, candidates: list) -> dict:
+    """Colonnes attendues par reco_pipeline.pkl (mêmes noms que train_reco.py)."""
+    n = len(candidates)
+    return {
+        "age": [age] * n,
+        "pays": [pays] * n,
+        "langue": [b[3] for b in candidates],
+        "categorie": [b[4] for b in candidates],
+        "annee_publication": [int(b[5] or 0) for b in candidates],
+        "resume": [b[6] for b in candidates],
+    }
+
+
+def build_feature_frame(age: int, pays: str, candidates: list) -> pd.DataFrame:
+    """DataFrame attendu par reco_pipeline.pkl (mêmes colonnes que train_reco.py)."""
+    return pd.DataFrame(feature_columns(age, pays, candidates))
+
+
+def predict_like(model, columns: dict) -> np.ndarray:
+    """P(like) ; `model` = scorer compilé (colonnes brutes) ou pipeline sklearn (DataFrame)."""
+    if not isinstance(model, CompiledScorer):
+        columns = pd.DataFrame(columns)
+    return model.predict_proba(columns)[:, 1]
+
+
+def gbm_scores(model, age: int, pays: str, candidates: list) -> np.ndarray:
+    return predict_like(model, feature_columns(age, pays, candidates))
+
+
+def profile_weights(owned: set, ratings: dict) -> dict:
+    """ISBN -> poids du livre dans le profil de lecture de l'utilisateur."""
+    weights = {isbn: COLLECTION_WEIGHT for isbn in owned}
+    for isbn, note in ratings.items():
+        if note is not None:
+            weights[isbn] = max(weights.get(isbn, 0.0), float(note) / 10.0)
+    return weights
+
+
+def profile_vector(matrix, meta, weights: dict) -> Optional[csr_matrix]:
+    """Moyenne pondérée (normalisée L2) des vecteurs TF-IDF des livres du profil."""
+    rows, w = [], []
+    for isbn, weight in weights.items():
+        idx = meta.index_of(isbn)
+        if idx is not None and weight > 0:
+            rows.append(idx)
+            w.append(weight)
+    if not rows:
+        return None
+    profile = csr_matrix(np.asarray(w)[None, :]) @ matrix[rows]
+    norm = np.sqrt(profile.multiply(profile).sum())
+    if norm == 0:
+        return None
+    return profile / norm
+
+
+def content_scores(matrix, meta, profile, candidate_isbns: list) -> np.ndarray:
+    """Cosinus profil/candidat ; 0 pour les candidats absents de l'index TF-IDF."""
+    scores = np.zeros(len(candidate_isbns), dtype=np.float64)
+    if profile is None:
+        return scores
+    positions, rows = [], []
+    for i, isbn in enumerate(candidate_isbns):
+        idx = meta.index_of(isbn)
+        if idx is not None:
+            positions.append(i)
+            rows.append(idx)
+    if rows:
+        scores[positions] = (matrix[rows] @ profile.T).toarray().ravel()
+    return scores
+
+
+def _minmax(values: np.ndarray) -> np.ndarray:
+    lo, hi = float(values.min()), float(values.max())
+    if hi - lo <= 1e-12:
+        return np.zeros_like(values, dtype=np.float64)
+    return (values - lo) / (hi - lo)
+
+
+def blend_scores(gbm: np.ndarray, content: np.ndarray, content_weight: float):
+    """
+    Score hybride = (1 - w) * gbm + w * contenu, chaque signal étant ramené
+    sur [0, 1] à l'échelle du lot de candidats (le cosinus TF-IDF est
+    naturellement bien plus petit qu'une probabilité).
+
+    Retourne (scores, signal_dominant) où signal_dominant[i] vaut
+    "gbm" ou "contenu" selon la contribution la plus forte.
+    """
+    w = min(max(float(content_weight), 0.0), 1.0)
+    part_gbm = (1.0 - w) * _minmax(gbm)
+    part_content = w * _minmax(content)
+    dominant = np.where(part_content > part_gbm, "contenu", "gbm")
+    return part_gbm + part_content, dominant
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices des k meilleurs scores, triés (argpartition: O(n) au lieu d'un tri complet)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+# --------------------------------------------------------------------
+# Tâches d'inférence
+# --------------------------------------------------------------------
+def score_candidates(
+    bundle,
+    age: int,
+    pays: str,
+    candidates: list,
+    weights: Optional[dict] = None,
+    content_weight: float = 0.0,
+):
+    """
+    Retourne (scores, proba_gbm, contenu, signal_dominant).
+    Sans `weights` (mode gbm), scores = proba_gbm et contenu/signal valent None.
+    """
+    proba = gbm_scores(bundle.gbm_model, age, pays, candidates)
+    return _finish_scores(bundle, proba, candidates, weights, content_weight)
+
+
+def _finish_scores(bundle, proba: np.ndarray, candidates: list, weights: Optional[dict], content_weight: float):
+    if weights is None:
+        return proba, proba, None, None
+
+    profile = profile_vector(bundle.tfidf_matrix, bundle.tfidf_meta, weights)
+    content = content_scores(bundle.tfidf_matrix, bundle.tfidf_meta, profile, [b[0] for b in candidates])
+    scores, dominant = blend_scores(proba, content, content_weight)
+    return scores, proba, content, dominant
+
+
+def score_candidates_batch(bundle, jobs: list) -> list:
+    """
+    Version micro-batch de score_candidates : `jobs` est une liste de tuples
+    (age, pays, candidates, weights, content_weight) venant de requêtes
+    concurrentes. Les lignes de tous les jobs sont empilées -> un seul
+    predict_proba (le coût fixe du ColumnTransformer et de pandas, ou du
+    scorer compilé, est payé une fois par lot), puis redécoupées par job.
+    """
+    columns = {}
+    for age, pays, candidates, _, _ in jobs:
+        for name, values in feature_columns(age, pays, candidates).items():
+            columns.setdefault(name, []).extend(values)
+    proba_all = predict_like(bundle.gbm_model, columns)
+    bounds = np.cumsum([len(candidates) for _, _, candidates, _, _ in jobs])[:-1]
+
+    return [
+        _finish_scores(bundle, proba, candidates, weights, content_weight)
+        for proba, (_, _, candidates, weights, content_weight) in zip(np.split(proba_all, bounds), jobs)
+    ]
+
+
+def _similar_in(matrix, meta, idx: int, limit: int) -> list:
+    sims = (matrix[idx] @ matrix.T).toarray().ravel()
+    # +1 : le livre source est (presque toujours) son propre plus proche voisin
+    results = []
+    for j in top_k(sims, limit + 1):
+        if j == idx:
+            continue
+        results.append((meta[int(j)], float(sims[j])))
+        if len(results) >= limit:
+            break
+    return results
+
+
+def similar_books(bundle, isbn: str, limit: int, widen: bool = False) -> Optional[list]:
+    """
+    [(méta livre, similarité)] des livres proches de `isbn`, None si l'ISBN
+    n'est pas indexé. Sans `widen`, cherche d'abord dans la partition du
+    livre (langue + catégorie, puis langue) et sinon dans l'index global.
+    """
+    meta = bundle.tfidf_meta
+    idx = meta.index_of(isbn)
+    if idx is None:
+        return None
+    limit = max(1, limit)
+
+    if not widen and bundle.tfidf_partitions:
+        src = meta[idx]
+        for key in candidate_partition_keys(src.get("langue"), src.get("categorie")):
+            part = bundle.tfidf_partitions.get(key)
+            if part is None:
+                continue
+            part_matrix, part_meta = part
+            part_idx = part_meta.index_of(isbn)
+            if part_idx is not None:
+                return _similar_in(part_matrix, part_meta, part_idx, limit)
+
+    return _similar_in(bundle.tfidf_matrix, meta, idx, limit)
+
+
+def semantic_search(bundle, q: str, limit: int) -> list:
+    """[(méta livre, score)] pour une requête texte libre, scores > 0 uniquement."""
+    query_vec = bundle.tfidf_vect.transform([q])
+    if query_vec.nnz == 0:
+        # aucun terme de la requête n'est dans le vocabulaire
+        return []
+
+    scores = (bundle.tfidf_matrix @ query_vec.T).toarray().ravel()
+    results = []
+    for j in top_k(scores, limit):
+        if scores[j] <= 0:
+            break
+        results.append((bundle.tfidf_meta[int(j)], float(scores[j])))
+    return results
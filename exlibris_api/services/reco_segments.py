@@ -0,0 +1,52 @@
+"""
+Recommandations de démarrage à froid, précalculées par segment.
+
+En mode gbm, le score d'un candidat ne dépend que de (age, pays) : pour un
+utilisateur sans historique, le résultat est celui de son segment
+(tranche d'âge, pays). scripts/precompute_reco_segments.py score le pool de
+candidats une fois par segment (à l'âge représentatif de la tranche) et
+range les `depth` meilleurs livres dans RecommandationSegment, par version
+de modèle. /me/recommendations lit ce classement (en retirant les livres
+déjà en collection) au lieu de lancer le modèle.
+
+Approximation assumée : tout le segment reçoit le classement de l'âge
+représentatif ; les utilisateurs avec une collection plus fournie passent
+par le scoring complet.
+"""
+from typing import Optional
+
+# (borne basse, borne haute, âge représentatif) ; âge NULL -> 0 dans le modèle
+AGE_BUCKETS = (
+    (1, 17, 15),
+    (18, 24, 21),
+    (25, 34, 30),
+    (35, 44, 40),
+    (45, 54, 50),
+    (55, 64, 60),
+    (65, 150, 70),
+)
+UNKNOWN_AGE = "inconnu"
+
+SEGMENT_SQL = """
+    SELECT s.livre_isbn, l.titre, COALESCE(l.auteur, ''), s.score
+    FROM RecommandationSegment s
+    JOIN Livre l ON l.isbn = s.livre_isbn
+    WHERE s.version_modele = %s AND s.tranche_age = %s AND s.pays = %s
+    ORDER BY s.rang
+"""
+
+
+def age_bucket(age: Optional[int]) -> str:
+    """Libellé de la tranche d'âge ("25-34"), "inconnu" pour un âge absent (0)."""
+    if age is not None:
+        for low, high, _ in AGE_BUCKETS:
+            if low <= age <= high:
+                return f"{low}-{high}"
+    return UNKNOWN_AGE
+
+
+def representative_ages() -> dict:
+    """Tranche -> âge utilisé pour scorer le segment."""
+    ages = {f"{low}-{high}": rep for low, high, rep in AGE_BUCKETS}
+    ages[UNKNOWN_AGE] = 0
+    return ages
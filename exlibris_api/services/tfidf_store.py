@@ -0,0 +1,225 @@
+"""
+Stockage binaire de l'index TF-IDF (matrice + métadonnées livres).
+
+Disposition d'un répertoire d'index (ex: ml/tfidf_index/) :
+  - matrix_data.npy / matrix_indices.npy / matrix_indptr.npy / matrix_shape.npy
+      -> composantes CSR, chargées en mmap (pages partagées entre workers)
+  - meta_<colonne>_blob.npy + meta_<colonne>_offsets.npy
+      -> une colonne texte = un blob UTF-8 + une table d'offsets (int64)
+  - meta_isbn_sorted.npy + meta_isbn_order.npy
+      -> ISBN triés (bytes fixes) + permutation, pour une recherche binaire
+
+Les sous-index par langue (et éventuellement catégorie) utilisent exactement
+la même disposition, dans ml/tfidf_partitions/<clé>/ (+ partitions.json).
+"""
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix, load_npz
+
+
+META_COLUMNS = ("isbn", "titre", "auteur", "editeur", "image", "langue", "categorie")
+
+MATRIX_PARTS = ("data", "indices", "indptr")
+
+
+class TfidfMeta:
+    """
+    Métadonnées des livres indexés, stockées par colonnes.
+
+    Chaque colonne est un blob UTF-8 unique + un tableau d'offsets :
+    la valeur de la ligne i est blob[offsets[i]:offsets[i + 1]].
+    Les tableaux peuvent être des np.memmap (aucune copie par worker).
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, tuple[np.ndarray, np.ndarray]],
+        isbn_sorted: np.ndarray,
+        isbn_order: np.ndarray,
+    ):
+        self._columns = columns
+        self._isbn_sorted = isbn_sorted
+        self._isbn_order = isbn_order
+        self._size = len(next(iter(columns.values()))[1]) - 1 if columns else 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, i: int) -> dict[str, str]:
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        return {col: self.value(col, i) for col in self._columns}
+
+    def __iter__(self):
+        for i in range(self._size):
+            yield self[i]
+
+    def value(self, column: str, i: int) -> str:
+        blob, offsets = self._columns[column]
+        start, end = int(offsets[i]), int(offsets[i + 1])
+        return bytes(blob[start:end]).decode("utf-8")
+
+    def index_of(self, isbn: str) -> Optional[int]:
+        """Index de ligne d'un ISBN (recherche binaire), None si absent."""
+        key = str(isbn).encode("utf-8")
+        if not len(self._isbn_sorted) or len(key) > self._isbn_sorted.dtype.itemsize:
+            return None
+        pos = int(np.searchsorted(self._isbn_sorted, key))
+        if pos < len(self._isbn_sorted) and self._isbn_sorted[pos] == key:
+            return int(self._isbn_order[pos])
+        return None
+
+    @classmethod
+    def from_records(cls, records: Iterable[dict[str, Any]]) -> "TfidfMeta":
+        """Construit la structure en mémoire depuis une liste de dicts (format JSON legacy)."""
+        records = list(records)
+        columns = {
+            col: _encode_column([r.get(col) for r in records])
+            for col in META_COLUMNS
+        }
+        isbn_sorted, isbn_order = _build_isbn_lookup([r.get("isbn") for r in records])
+        return cls(columns, isbn_sorted, isbn_order)
+
+
+def _encode_column(values: list) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [("" if v is None else str(v)).encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return blob, offsets
+
+
+def _build_isbn_lookup(isbns: list) -> tuple[np.ndarray, np.ndarray]:
+    keys = np.array([("" if v is None else str(v)).encode("utf-8") for v in isbns])
+    if keys.dtype.kind != "S":
+        keys = keys.astype("S1")
+    order = np.argsort(keys, kind="stable").astype(np.int32)
+    return keys[order], order
+
+
+# --------------------------------------------------------------------
+# Écriture
+# --------------------------------------------------------------------
+def save_tfidf_matrix(index_dir: Path, matrix) -> None:
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    matrix = csr_matrix(matrix)
+    matrix.sort_indices()
+    for part in MATRIX_PARTS:
+        np.save(index_dir / f"matrix_{part}.npy", np.ascontiguousarray(getattr(matrix, part)))
+    np.save(index_dir / "matrix_shape.npy", np.array(matrix.shape, dtype=np.int64))
+
+
+def save_tfidf_meta(index_dir: Path, records: list[dict[str, Any]]) -> None:
+    index_dir = Path(index_dir)
+    index_dir.mkdir(parents=True, exist_ok=True)
+    for col in META_COLUMNS:
+        blob, offsets = _encode_column([r.get(col) for r in records])
+        np.save(index_dir / f"meta_{col}_blob.npy", blob)
+        np.save(index_dir / f"meta_{col}_offsets.npy", offsets)
+    isbn_sorted, isbn_order = _build_isbn_lookup([r.get("isbn") for r in records])
+    np.save(index_dir / "meta_isbn_sorted.npy", isbn_sorted)
+    np.save(index_dir / "meta_isbn_order.npy", isbn_order)
+
+
+def save_tfidf_index(index_dir: Path, matrix, records: list[dict[str, Any]]) -> None:
+    save_tfidf_matrix(index_dir, matrix)
+    save_tfidf_meta(index_dir, records)
+
+
+# --------------------------------------------------------------------
+# Lecture
+# --------------------------------------------------------------------
+def has_tfidf_index(index_dir: Path) -> bool:
+    return (Path(index_dir) / "matrix_shape.npy").exists()
+
+
+def load_tfidf_matrix(index_dir: Path, mmap: bool = True) -> csr_matrix:
+    """
+    Recompose la matrice CSR sans copie : les tableaux restent des np.memmap
+    en lecture seule, donc partagés via le page cache entre workers uvicorn.
+    """
+    index_dir = Path(index_dir)
+    mode = "r" if mmap else None
+    parts = [np.load(index_dir / f"matrix_{p}.npy", mmap_mode=mode) for p in MATRIX_PARTS]
+    shape = tuple(int(x) for x in np.load(index_dir / "matrix_shape.npy"))
+    return csr_matrix(tuple(parts), shape=shape, copy=False)
+
+
+def load_tfidf_meta(index_dir: Path, mmap: bool = True) -> TfidfMeta:
+    index_dir = Path(index_dir)
+    mode = "r" if mmap else None
+    # tolère un index construit avant l'ajout de colonnes (langue, categorie)
+    columns = {
+        col: (
+            np.load(index_dir / f"meta_{col}_blob.npy", mmap_mode=mode),
+            np.load(index_dir / f"meta_{col}_offsets.npy", mmap_mode=mode),
+        )
+        for col in META_COLUMNS
+        if (index_dir / f"meta_{col}_blob.npy").exists()
+    }
+    return TfidfMeta(
+        columns,
+        np.load(index_dir / "meta_isbn_sorted.npy", mmap_mode=mode),
+        np.load(index_dir / "meta_isbn_order.npy", mmap_mode=mode),
+    )
+
+
+# --------------------------------------------------------------------
+# Partitions (langue / langue + catégorie)
+# --------------------------------------------------------------------
+PARTITIONS_MANIFEST = "partitions.json"
+
+
+def _slug(value: Optional[str]) -> str:
+    value = (value or "").strip().lower()
+    return re.sub(r"[^0-9a-z]+", "-", value).strip("-") or "unk"
+
+
+def partition_key(langue: Optional[str], categorie: Optional[str] = None) -> str:
+    """Clé (et nom de répertoire) d'une partition : 'fr' ou 'fr__fiction'."""
+    if categorie is None:
+        return _slug(langue)
+    return f"{_slug(langue)}__{_slug(categorie)}"
+
+
+def candidate_partition_keys(langue: Optional[str], categorie: Optional[str]) -> list[str]:
+    """Partitions à essayer pour un livre, de la plus spécifique à la plus large."""
+    return [partition_key(langue, categorie or ""), partition_key(langue)]
+
+
+def load_tfidf_partitions(root_dir: Path, mmap: bool = True) -> dict[str, tuple[csr_matrix, TfidfMeta]]:
+    root_dir = Path(root_dir)
+    manifest_path = root_dir / PARTITIONS_MANIFEST
+    if not manifest_path.exists():
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    partitions = {}
+    for key in manifest:
+        part_dir = root_dir / key
+        if has_tfidf_index(part_dir):
+            partitions[key] = (load_tfidf_matrix(part_dir, mmap), load_tfidf_meta(part_dir, mmap))
+    return partitions
+
+
+def load_legacy_tfidf(matrix_path: Path, meta_path: Path) -> tuple[csr_matrix, TfidfMeta]:
+    """Ancien format (npz compressé + JSON indenté) : tout est copié en mémoire."""
+    matrix = load_npz(matrix_path).tocsr()
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = TfidfMeta.from_records(json.load(f))
+    return matrix, meta
+
+
+def convert_legacy_tfidf(matrix_path: Path, meta_path: Path, index_dir: Path) -> None:
+    """Convertit des artefacts existants (npz + json) vers le format binaire."""
+    matrix = load_npz(matrix_path)
+    with open(meta_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    save_tfidf_index(index_dir, matrix, records)
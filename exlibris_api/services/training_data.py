@@ -0,0 +1,120 @@
+"""
+Chargement en flux des données d'entraînement depuis MariaDB.
+
+Un curseur serveur non bufferisé (SSCursor) lit le résultat par paquets de
+`chunk_size` lignes ; chaque paquet est versé dans des colonnes typées
+(entiers NumPy, codes de catégories int32) puis libéré. On ne garde donc
+jamais en mémoire la liste complète des tuples/dicts pymysql en plus du
+DataFrame final.
+
+Les colonnes texte répétitives (pays, langue, catégorie, isbn, résumé d'un
+livre noté par plusieurs lecteurs) deviennent des pandas.Categorical :
+une chaîne par valeur distincte + un code int32 par ligne.
+"""
+import resource
+import time
+from typing import Callable, Optional
+
+import numpy as np
+import pandas as pd
+import pymysql
+
+# types acceptés dans un schéma de colonnes : dtype NumPy ou "category"
+CATEGORY = "category"
+
+
+def peak_rss_mb() -> float:
+    """Pic de mémoire résidente du process depuis son démarrage (Linux: ru_maxrss en Ko)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def clean_label(value) -> str:
+    """Libellé catégoriel nettoyé : espaces retirés, vide / NULL -> 'UNK'."""
+    if value is None:
+        return "UNK"
+    value = str(value).strip()
+    return value or "UNK"
+
+
+def _finalize_category(codes: list, lookup: dict, normalize: Optional[Callable]) -> pd.Categorical:
+    labels = list(lookup)
+    codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int32)
+    if normalize is not None:
+        # normaliser les libellés distincts (et non les lignes), puis fusionner les doublons
+        cleaned = [normalize(v) for v in labels]
+        uniques = list(dict.fromkeys(cleaned))
+        position = {v: i for i, v in enumerate(uniques)}
+        remap = np.fromiter((position[v] for v in cleaned), dtype=np.int32, count=len(cleaned))
+        codes = remap[codes] if len(codes) else codes
+        labels = uniques
+    return pd.Categorical.from_codes(codes, categories=labels)
+
+
+def to_category(values, normalize: Optional[Callable] = None) -> pd.Categorical:
+    """
+    Série texte (sans NULL) -> Categorical, `normalize` appliqué aux valeurs
+    distinctes comme dans stream_frame (pour les données lues d'un snapshot).
+    """
+    values = pd.Categorical(values)
+    codes = values.codes.astype(np.int32, copy=False)
+    return _finalize_category([codes], dict.fromkeys(values.categories), normalize)
+
+
+def stream_frame(
+    conn,
+    sql: str,
+    params: tuple,
+    schema: dict[str, str],
+    chunk_size: int = 50_000,
+    normalize: Optional[dict[str, Callable]] = None,
+    verbose: bool = True,
+) -> pd.DataFrame:
+    """
+    Exécute `sql` avec un SSCursor et construit un DataFrame colonne par
+    colonne. `schema` donne, dans l'ordre du SELECT, le dtype de chaque
+    colonne ("int16", "float32", ... ou "category"). Les colonnes numériques
+    ne doivent pas contenir de NULL (filtrer/COALESCE côté SQL).
+    `normalize[col]` est appliqué aux valeurs distinctes d'une catégorie.
+    """
+    normalize = normalize or {}
+    numeric = {c: [] for c, kind in schema.items() if kind != CATEGORY}
+    codes = {c: [] for c, kind in schema.items() if kind == CATEGORY}
+    lookups = {c: {} for c in codes}
+
+    t0 = time.perf_counter()
+    n_rows = 0
+    cur = conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            for (name, kind), values in zip(schema.items(), zip(*rows)):
+                if kind == CATEGORY:
+                    lookup = lookups[name]
+                    codes[name].append(np.fromiter(
+                        (lookup.setdefault(v, len(lookup)) for v in values),
+                        dtype=np.int32,
+                        count=len(values),
+                    ))
+                else:
+                    numeric[name].append(np.asarray(values, dtype=kind))
+            n_rows += len(rows)
+            del rows
+            if verbose:
+                print(f"  {n_rows} lignes lues ({n_rows / (time.perf_counter() - t0):.0f} lignes/s, "
+                      f"pic RSS {peak_rss_mb():.0f} Mo)", end="\r")
+    finally:
+        cur.close()
+    if verbose and n_rows:
+        print()
+
+    columns = {}
+    for name, kind in schema.items():
+        if kind == CATEGORY:
+            columns[name] = _finalize_category(codes.pop(name), lookups.pop(name), normalize.get(name))
+        else:
+            parts = numeric.pop(name)
+            columns[name] = np.concatenate(parts) if parts else np.empty(0, dtype=kind)
+    return pd.DataFrame(columns, copy=False)
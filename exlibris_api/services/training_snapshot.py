@@ -0,0 +1,418 @@
+"""
+Snapshots locaux des données d'entraînement (Parquet, via pyarrow).
+
+Les scripts d'entraînement relisaient toute la jointure
+Evaluation ⋈ Utilisateur ⋈ Livre sur la base de production à chaque run.
+Ici, les tables utiles sont exportées une fois, puis seules les lignes
+nouvelles ou modifiées sont ajoutées (delta) :
+  - Evaluation : id_evaluation > max déjà exporté OU date_derniere_maj récente
+  - Livre / Utilisateur : date_derniere_maj récente (migration 003)
+  - Categorie : toujours complète (quelques centaines de lignes)
+La jointure est refaite localement à la lecture.
+
+Disposition (TRAINING_SNAPSHOT_DIR, par défaut exlibris_api/data/snapshots) :
+  parts/<part>/                 export immuable (base complète ou delta)
+      evaluations.parquet
+      utilisateurs.parquet
+      livres.parquet
+      categories.parquet
+  snapshots/<id>.json           liste ordonnée des parts + filigranes du delta suivant
+  CURRENT                       dernier snapshot
+
+Un snapshot est figé : le relire (read_table(..., snapshot_id)) redonne
+exactement les mêmes lignes, ce qui rend un entraînement reproductible.
+Les suppressions (utilisateur ou livre supprimé en cascade) ne sont pas
+vues par un delta : refresh le signale et un export complète (--full) les
+prend en compte.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import pymysql
+
+from core.config import TRAINING_SNAPSHOT_DIR
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+SNAPSHOT_DIR = Path(TRAINING_SNAPSHOT_DIR) if TRAINING_SNAPSHOT_DIR else BASE_DIR / "data" / "snapshots"
+
+PARTS_DIR = "parts"
+SNAPSHOTS_DIR = "snapshots"
+CURRENT_FILE = "CURRENT"
+
+
+class SnapshotError(RuntimeError):
+    """Snapshot absent ou illisible."""
+
+
+# nom -> (clé de dédoublonnage, schéma Parquet, SELECT, filtre delta)
+# le filtre delta reçoit (max id_evaluation, marqueur date_derniere_maj)
+TABLES = {
+    "evaluations": (
+        "id_evaluation",
+        pa.schema([
+            ("id_evaluation", pa.int32()),
+            ("utilisateur_id", pa.int32()),
+            ("isbn", pa.string()),
+            ("note", pa.int8()),
+        ]),
+        "SELECT e.id_evaluation, e.utilisateur_id, e.livre_isbn, e.note FROM Evaluation e",
+        " WHERE e.id_evaluation > %(max_id)s OR e.date_derniere_maj >= %(marqueur)s",
+    ),
+    "utilisateurs": (
+        "id_utilisateur",
+        pa.schema([
+            ("id_utilisateur", pa.int32()),
+            ("age", pa.int16()),
+            ("pays", pa.string()),
+        ]),
+        "SELECT u.id_utilisateur, u.age, u.pays FROM Utilisateur u",
+        " WHERE u.date_derniere_maj >= %(marqueur)s",
+    ),
+    "livres": (
+        "isbn",
+        pa.schema([
+            ("isbn", pa.string()),
+            ("titre", pa.string()),
+            ("auteur", pa.string()),
+            ("editeur", pa.string()),
+            ("resume", pa.string()),
+            ("langue", pa.string()),
+            ("categorie_id", pa.int32()),
+            ("image", pa.string()),
+            ("annee_publication", pa.int16()),
+        ]),
+        """
+        SELECT l.isbn, l.titre, l.auteur, l.editeur, l.resume, l.langue, l.categorie_id,
+               COALESCE(l.image_moyenne, l.image_petite), YEAR(l.date_publication)
+        FROM Livre l
+        """,
+        " WHERE l.date_derniere_maj >= %(marqueur)s",
+    ),
+    "categories": (
+        "id",
+        pa.schema([
+            ("id", pa.int32()),
+            ("nomcat", pa.string()),
+        ]),
+        "SELECT c.id, c.nomcat FROM Categorie c",
+        None,  # toujours exportée en entier
+    ),
+}
+
+# colonnes texte très répétées à la lecture -> pandas.Categorical
+DICTIONARY_COLUMNS = {"evaluations": ["isbn"], "utilisateurs": ["pays"]}
+
+
+# --------------------------------------------------------------------
+# Lecture
+# --------------------------------------------------------------------
+def current_snapshot_id(root: Path = SNAPSHOT_DIR) -> Optional[str]:
+    path = Path(root) / CURRENT_FILE
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8").strip() or None
+
+
+def read_snapshot(snapshot_id: Optional[str] = None, root: Path = SNAPSHOT_DIR) -> dict:
+    """Manifest du snapshot `snapshot_id` (None ou "latest" = le dernier)."""
+    if snapshot_id in (None, "latest"):
+        snapshot_id = current_snapshot_id(root)
+        if snapshot_id is None:
+            raise SnapshotError(f"Aucun snapshot dans {root} (lancer scripts.training_snapshot refresh)")
+    path = Path(root) / SNAPSHOTS_DIR / f"{snapshot_id}.json"
+    if not path.exists():
+        raise SnapshotError(f"Snapshot inconnu: {snapshot_id}")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def list_snapshots(root: Path = SNAPSHOT_DIR) -> list[dict]:
+    """Manifests de tous les snapshots, du plus ancien au plus récent."""
+    directory = Path(root) / SNAPSHOTS_DIR
+    if not directory.exists():
+        return []
+    manifests = []
+    for path in directory.glob("*.json"):
+        with open(path, "r", encoding="utf-8") as f:
+            manifests.append(json.load(f))
+    return sorted(manifests, key=lambda m: m["created_at"])
+
+
+def read_table(
+    name: str,
+    snapshot_id: Optional[str] = None,
+    root: Path = SNAPSHOT_DIR,
+    columns: Optional[list] = None,
+    categories: bool = True,
+) -> pd.DataFrame:
+    """
+    Table `name` telle qu'au snapshot : parts concaténées dans l'ordre, puis
+    une seule ligne par clé (la plus récente l'emporte). Les entiers
+    nullables (age, note, ...) reviennent en float64 (NaN = NULL).
+    """
+    key = TABLES[name][0]
+    if columns is not None and key not in columns:
+        columns = [key, *columns]
+    manifest = read_snapshot(snapshot_id, root)
+    dictionary = [c for c in DICTIONARY_COLUMNS.get(name, []) if columns is None or c in columns] if categories else None
+    tables = [
+        pq.read_table(Path(root) / PARTS_DIR / part / f"{name}.parquet", columns=columns,
+                      read_dictionary=dictionary)
+        for part in manifest["parts"]
+    ]
+    df = pa.concat_tables(tables).to_pandas()
+    if len(tables) > 1:
+        df = df.drop_duplicates(subset=key, keep="last")
+    return df.reset_index(drop=True)
+
+
+def read_books(snapshot_id: Optional[str] = None, root: Path = SNAPSHOT_DIR) -> pd.DataFrame:
+    """Livres du snapshot avec le nom de catégorie (jointure gauche sur Categorie)."""
+    books = read_table("livres", snapshot_id, root)
+    cats = read_table("categories", snapshot_id, root).rename(columns={"id": "categorie_id", "nomcat": "categorie"})
+    books = books.merge(cats, on="categorie_id", how="left")
+    return books.sort_values("isbn", kind="stable").reset_index(drop=True)
+
+
+# --------------------------------------------------------------------
+# Écriture
+# --------------------------------------------------------------------
+def _write_json_atomic(path: Path, data) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        if isinstance(data, str):
+            f.write(data)
+        else:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _export_table(conn, name: str, path: Path, params: Optional[dict], chunk_size: int, verbose: bool) -> dict:
+    """SELECT (complet si params est None) -> Parquet, un row group par paquet."""
+    _key, schema, sql, delta = TABLES[name]
+    if params is not None and delta:
+        sql += delta
+    else:
+        params = None
+
+    t0 = time.perf_counter()
+    n_rows, max_id = 0, None
+    cur = conn.cursor(pymysql.cursors.SSCursor)
+    writer = pq.ParquetWriter(path, schema, compression="zstd")
+    try:
+        cur.execute(sql, params)
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            arrays = [pa.array(values, type=field.type) for field, values in zip(schema, zip(*rows))]
+            batch = pa.Table.from_arrays(arrays, schema=schema)
+            writer.write_table(batch)
+            if name == "evaluations":
+                chunk_max = pc.max(batch.column("id_evaluation")).as_py()
+                max_id = chunk_max if max_id is None else max(max_id, chunk_max)
+            n_rows += len(rows)
+    finally:
+        writer.close()
+        cur.close()
+
+    elapsed = time.perf_counter() - t0
+    if verbose:
+        print(f"  {name}: {n_rows} lignes en {elapsed:.1f} s ({n_rows / max(elapsed, 1e-9):.0f} lignes/s)")
+    return {"lignes": n_rows, "max_id": max_id}
+
+
+def _snapshot_id(now: datetime, parts: list) -> str:
+    digest = hashlib.sha256("\n".join(parts).encode()).hexdigest()
+    return f"{now:%Y%m%dT%H%M%S}-{digest[:8]}"
+
+
+def _save_snapshot(root: Path, parts: list, parent: Optional[str], watermarks: dict, rows: dict, kind: str) -> str:
+    now = datetime.now(timezone.utc)
+    snapshot_id = _snapshot_id(now, parts)
+    manifest = {
+        "id": snapshot_id,
+        "created_at": now.isoformat(),
+        "parent": parent,
+        "type": kind,
+        "parts": parts,
+        "watermarks": watermarks,
+        "lignes": rows,
+    }
+    _write_json_atomic(Path(root) / SNAPSHOTS_DIR / f"{snapshot_id}.json", manifest)
+    _write_json_atomic(Path(root) / CURRENT_FILE, snapshot_id + "\n")
+    return snapshot_id
+
+
+def _new_part_dir(root: Path, kind: str) -> Path:
+    parts = Path(root) / PARTS_DIR
+    parts.mkdir(parents=True, exist_ok=True)
+    return Path(tempfile.mkdtemp(dir=parts, prefix=f".{kind}-"))
+
+
+def refresh(
+    conn,
+    root: Path = SNAPSHOT_DIR,
+    full: bool = False,
+    chunk_size: int = 50_000,
+    margin_seconds: int = 300,
+    verbose: bool = True,
+) -> str:
+    """
+    Exporte un delta depuis le dernier snapshot (ou tout si `full` ou s'il
+    n'y en a pas encore) et enregistre un nouveau snapshot courant.
+    Retourne l'id du snapshot courant (inchangé si rien n'a bougé).
+
+    Le marqueur du delta suivant est pris au début de l'export, moins
+    `margin_seconds` : une transaction encore ouverte pendant l'export a pu
+    écrire une date_derniere_maj antérieure. Les lignes relues deux fois
+    sont dédoublonnées par clé à la lecture.
+    """
+    root = Path(root)
+    parent = current_snapshot_id(root)
+    previous = read_snapshot(parent, root) if parent and not full else None
+    kind = "delta" if previous else "base"
+
+    cur = conn.cursor()
+    # mêmes données pour les quatre tables (lecture cohérente InnoDB)
+    cur.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    cur.execute("SELECT NOW() - INTERVAL %s SECOND", (margin_seconds,))
+    marker = cur.fetchone()[0].strftime("%Y-%m-%d %H:%M:%S")
+    cur.close()
+
+    params = None
+    if previous:
+        params = {"max_id": previous["watermarks"]["max_id_evaluation"],
+                  "marqueur": previous["watermarks"]["date_derniere_maj"]}
+
+    part_dir = _new_part_dir(root, kind)
+    t0 = time.perf_counter()
+    try:
+        if verbose:
+            print(f"Export {kind} -> {root}")
+        rows, max_id = {}, None
+        for name in TABLES:
+            result = _export_table(conn, name, part_dir / f"{name}.parquet", params, chunk_size, verbose)
+            rows[name] = result["lignes"]
+            if name == "evaluations":
+                max_id = result["max_id"]
+        conn.rollback()
+    except BaseException:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        raise
+
+    if previous and not any(rows[n] for n in ("evaluations", "utilisateurs", "livres")):
+        old_cats = read_table("categories", parent, root)
+        new_cats = pq.read_table(part_dir / "categories.parquet").to_pandas()
+        if new_cats.sort_values("id").reset_index(drop=True).equals(old_cats.sort_values("id").reset_index(drop=True)):
+            shutil.rmtree(part_dir)
+            if verbose:
+                print(f"Aucun changement : snapshot {parent} inchangé.")
+            return parent
+
+    if previous and max_id is None:
+        max_id = previous["watermarks"]["max_id_evaluation"]
+    part_name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{kind}-{part_dir.name.rsplit('-', 1)[-1]}"
+    os.rename(part_dir, root / PARTS_DIR / part_name)
+
+    parts = (previous["parts"] if previous else []) + [part_name]
+    watermarks = {"max_id_evaluation": max_id or 0, "date_derniere_maj": marker}
+    snapshot_id = _save_snapshot(root, parts, parent, watermarks, rows, kind)
+    if verbose:
+        print(f"✅ Snapshot {snapshot_id} ({len(parts)} part(s), {time.perf_counter() - t0:.1f} s)")
+    if previous:
+        check_deletions(conn, snapshot_id, root)
+    return snapshot_id
+
+
+def check_deletions(conn, snapshot_id: Optional[str] = None, root: Path = SNAPSHOT_DIR) -> int:
+    """
+    Évaluations présentes dans le snapshot mais supprimées en base (compte
+    sur l'index primaire, sans relire les lignes). > 0 : prévoir un --full.
+    """
+    manifest = read_snapshot(snapshot_id, root)
+    max_id = manifest["watermarks"]["max_id_evaluation"]
+    local = read_table("evaluations", manifest["id"], root, columns=["id_evaluation"])
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT COUNT(*) FROM Evaluation WHERE id_evaluation <= %s", (max_id,))
+        remote = cur.fetchone()[0]
+    finally:
+        cur.close()
+    missing = int((local["id_evaluation"] <= max_id).sum()) - remote
+    if missing > 0:
+        print(f"⚠️ {missing} évaluations supprimées en base depuis l'export de base : relancer avec --full.")
+    return max(missing, 0)
+
+
+def compact(snapshot_id: Optional[str] = None, root: Path = SNAPSHOT_DIR, verbose: bool = True) -> str:
+    """
+    Fusionne les parts d'un snapshot en une seule base (mêmes lignes, lecture
+    plus rapide) et l'enregistre comme nouveau snapshot courant.
+    """
+    root = Path(root)
+    manifest = read_snapshot(snapshot_id, root)
+    part_dir = _new_part_dir(root, "base")
+    try:
+        rows = {}
+        for name, (_key, schema, _sql, _delta) in TABLES.items():
+            df = read_table(name, manifest["id"], root, categories=False)
+            pq.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False),
+                           part_dir / f"{name}.parquet", compression="zstd")
+            rows[name] = len(df)
+    except BaseException:
+        shutil.rmtree(part_dir, ignore_errors=True)
+        raise
+    part_name = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-base-{part_dir.name.rsplit('-', 1)[-1]}"
+    os.rename(part_dir, root / PARTS_DIR / part_name)
+    new_id = _save_snapshot(root, [part_name], manifest["id"], manifest["watermarks"], rows, "compact")
+    if verbose:
+        print(f"✅ Snapshot {new_id} : {len(manifest['parts'])} part(s) -> 1")
+    return new_id
+
+
+def prune(root: Path = SNAPSHOT_DIR, keep: int = 5, protect=()) -> list[str]:
+    """
+    Supprime les plus anciens snapshots (jamais le courant ni ceux de
+    `protect`, ex. les snapshots cités par des versions du registre ML),
+    puis les parts qui ne sont plus référencées.
+    """
+    root = Path(root)
+    current = current_snapshot_id(root)
+    manifests = list_snapshots(root)
+    protected = set(protect) | {current}
+    removed = []
+    for manifest in manifests[: max(0, len(manifests) - keep)]:
+        if manifest["id"] not in protected:
+            (root / SNAPSHOTS_DIR / f"{manifest['id']}.json").unlink()
+            removed.append(manifest["id"])
+
+    used = {part for m in list_snapshots(root) for part in m["parts"]}
+    for path in (root / PARTS_DIR).iterdir() if (root / PARTS_DIR).exists() else []:
+        if path.name.startswith("."):
+            # export interrompu de plus d'un jour
+            if time.time() - path.stat().st_mtime > 86400:
+                shutil.rmtree(path, ignore_errors=True)
+        elif path.name not in used:
+            shutil.rmtree(path)
+    return removed
+
+
+def parts_nbytes(snapshot_id: Optional[str] = None, root: Path = SNAPSHOT_DIR) -> int:
+    manifest = read_snapshot(snapshot_id, root)
+    return sum(p.stat().st_size for part in manifest["parts"]
+               for p in (Path(root) / PARTS_DIR / part).glob("*.parquet"))
@@ -0,0 +1,16 @@
+import numpy as np
+
+from scripts.backfill_publication_dates import stable_dates
+
+
+def test_stable_dates_are_stable_valid_and_mostly_recent():
+    isbns = [f"{i:010d}" for i in range(20000)]
+    dates = stable_dates(isbns)
+    assert np.array_equal(dates, stable_dates(isbns))
+    assert stable_dates(isbns[:3]).tolist() == dates[:3].tolist()  # ne dépend que de l'ISBN
+
+    years = dates.astype("M8[Y]").astype(int) + 1970
+    days = dates.astype("M8[D]") - dates.astype("M8[M]").astype("M8[D]")
+    assert years.min() >= 1950 and years.max() <= 2024 and days.max() <= np.timedelta64(27, "D")
+    assert 0.50 < (years >= 2010).mean() < 0.60 and 0.07 < (years < 1990).mean() < 0.13
+    assert stable_dates([]).size == 0
@@ -0,0 +1,196 @@
+import csv
+import json
+import sqlite3
+from pathlib import Path
+
+import pymysql
+import pytest
+
+from ingestion.cleaning import CATEGORY_POS
+from ingestion.pipeline import load_checkpoint, run
+from ingestion.sinks import CategoryResolver, MariaDBBulkSink, MariaDBSink, RejectFile, SQLiteSink
+
+
+class FakeConn:
+    """Livre en mémoire ; refuse les ISBN de `bad`, coupe la connexion après `crash_after` commits."""
+
+    def __init__(self, livres, bad=(), crash_after=None):
+        self.livres, self.bad, self.crash_after = livres, set(bad), crash_after
+        self.pending, self.commits = {}, 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.crash_after is not None and self.commits >= self.crash_after:
+            raise pymysql.err.OperationalError(2013, "Lost connection")
+        self.livres.update(self.pending)
+        self.pending = {}
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = {}
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.connection = conn
+
+    def execute(self, sql, params=None):
+        self.rows = []  # SELECT Categorie
+
+    def fetchall(self):
+        return self.rows
+
+    def executemany(self, sql, batch):
+        for row in batch:
+            if row[0] in self.connection.bad:
+                raise pymysql.err.DataError(1406, f"Data too long ({row[0]})")
+            self.connection.pending[row[0]] = row
+
+    def close(self):
+        pass
+
+
+def _write_csv(path, n):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["isbn", "book_title", "book_author", "Summary"])
+        for i in range(n):
+            w.writerow([f"{i:010d}", f"Titre {i}", "Auteur", f"Résumé\nsur deux lignes, {i}"])
+
+
+def test_bisection_rejects_only_bad_rows_and_resume(tmp_path):
+    path = tmp_path / "books.csv"
+    _write_csv(path, 100)
+    livres = {}
+    bad = {f"{i:010d}" for i in (7, 42, 43)}
+    rejects = RejectFile(f"{path}.rejets.csv")
+
+    # batchs de 10 : le 1er passe en 3 commits (bisection autour de l'ISBN 7),
+    # le 2e en un ; crash au commit du 3e
+    sink = MariaDBSink(FakeConn(livres, bad, crash_after=4), rejects, verbose=False)
+    with pytest.raises(pymysql.err.OperationalError):
+        run(str(path), sink, batch_size=10)
+    state = load_checkpoint(str(path))
+    assert state["lues"] == 20 and sink.stats["rejected"] == 1 and len(livres) == 19
+
+    sink = MariaDBSink(FakeConn(livres, bad), rejects, verbose=False)
+    stats = run(str(path), sink, batch_size=10, resume=True)
+    rejects.close()
+    assert stats["lues"] == 80 and stats["rejected"] == 2
+    assert len(livres) == 97 and not bad & set(livres)
+    assert load_checkpoint(str(path)) is None
+
+    with open(f"{path}.rejets.csv", encoding="utf-8") as f:
+        rejected = list(csv.DictReader(f))
+    assert sorted(r["isbn"] for r in rejected) == sorted(bad)
+    assert rejected[0]["resume"].startswith("Résumé\nsur deux lignes")
+
+
+@pytest.mark.parametrize("kind", ["set", "bloom"])
+def test_dedup_sends_each_isbn_once(tmp_path, monkeypatch, kind):
+    path = tmp_path / "ratings.csv"
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["user_id", "isbn", "rating", "book_title"])
+        for user in range(20):
+            for book in range(50):
+                w.writerow([user, f"{book:010d}", user % 10, f"Titre {book}"])
+
+    sent = []
+    monkeypatch.setattr(FakeCursor, "executemany", lambda self, sql, batch: sent.extend(batch))
+    sink = MariaDBSink(FakeConn({}), verbose=False)
+    stats = run(str(path), sink, batch_size=100, dedup=kind, expected_books=1000)
+    assert stats["lues"] == 1000 and stats["doublons"] == 950
+    assert sorted(row[0] for row in sent) == [f"{book:010d}" for book in range(50)]
+
+
+def test_categories_resolved_once_per_batch():
+    class CategoryCursor:
+        def __init__(self):
+            self.connection = FakeConn({})
+            self.table = {"roman": (1, "Roman")}
+            self.calls = []
+
+        def executemany(self, sql, rows):
+            self.calls.append("INSERT")
+            for (name,) in rows:
+                self.table.setdefault(name.lower(), (len(self.table) + 1, name))
+
+        def execute(self, sql, names=None):
+            self.calls.append("SELECT")
+            keys = [n.lower() for n in names] if names else list(self.table)
+            self.rows = [self.table[k] for k in keys]
+
+        def fetchall(self):
+            return self.rows
+
+    cur = CategoryCursor()
+    resolver = CategoryResolver(cur)  # relit Categorie
+    cur.calls = []
+    books = [("1",) * CATEGORY_POS + (name,) for name in ["Roman", "Poésie", "poésie", None, "Histoire", "Poésie", 9]]
+    resolved = resolver.resolve(books)
+    assert cur.calls == ["INSERT", "SELECT"]
+    ids = [b[CATEGORY_POS] for b in resolved]
+    assert ids[0] == 1 and ids[3] is None and ids[6] == 9
+    cache = resolver.cache
+    assert ids[1] == ids[2] == ids[5] == cache["poésie"] and ids[4] == cache["histoire"] != ids[1]
+
+    resolver.resolve(books)
+    assert cur.calls == ["INSERT", "SELECT"]  # tout est dans le cache
+
+
+def test_bulk_sink_failure_propagates(tmp_path, monkeypatch):
+    def execute(self, sql, params=None):
+        if "LOAD DATA" in sql:
+            raise pymysql.err.OperationalError(1148, "The used command is not allowed with this MariaDB version")
+
+    monkeypatch.setattr(FakeCursor, "execute", execute)
+    path = tmp_path / "books.csv"
+    _write_csv(path, 30)
+    livres = {}
+    sink = MariaDBBulkSink(FakeConn(livres))
+    with pytest.raises(pymysql.err.OperationalError):
+        run(str(path), sink, batch_size=10)
+    assert sink.stats["inserted"] == 0 and sink.stats["rejected"] == 30 and not livres
+    assert not Path(sink.tsv_path).exists()
+
+
+def test_jsonl_with_mapping_to_sqlite(tmp_path):
+    db = tmp_path / "exlibris.db"
+    schema = Path(__file__).resolve().parent.parent / "moha" / "schema.sql"
+    with sqlite3.connect(db) as conn:
+        conn.executescript(schema.read_text(encoding="utf-8"))
+
+    path = tmp_path / "books.jsonl"
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(30):
+            f.write(json.dumps({"isbn": f"{i % 20:010d}", "name": f"Titre {i}", "year_of_publication": 1990.0,
+                                "Category": "['Fiction']", "Language": "en"}) + "\n")
+        f.write(json.dumps({"isbn": "x", "name": ""}) + "\n")  # sans titre : ignorée
+
+    stats = run(str(path), SQLiteSink(str(db)), batch_size=7, mapping=["titre=name"])
+    assert stats["lues"] == 31 and stats["skipped"] == 1 and stats["doublons"] == 10
+    assert stats["inserted"] == 20
+    with sqlite3.connect(db) as conn:
+        rows = conn.execute("SELECT titre, annee_publication, langue FROM Livre ORDER BY isbn").fetchall()
+    assert len(rows) == 20 and rows[0] == ("Titre 0", 1990, "en")
+
+
+@pytest.mark.parametrize("argv", [
+    ["books", "x.csv", "--jobs", "4", "--sink", "sqlite"],
+    ["books", "x.parquet", "--jobs", "4"],
+    ["books", "x.csv", "--scaling", "1,2", "--resume"],
+    ["books", "x.csv", "--dry-run"],
+    ["ratings", "x.csv", "--sink", "mariadb-bulk"],
+])
+def test_cli_rejects_ignored_options(argv):
+    from scripts.ingest import main
+
+    with pytest.raises(SystemExit) as exc:
+        main(argv)
+    assert exc.value.code == 2
@@ -0,0 +1,45 @@
+import asyncio
+
+import numpy as np
+
+from services.inference_pool import InferenceExecutor
+from services.micro_batch import MicroBatcher
+from services.ml_models import ModelBundle
+from services.reco_scoring import score_candidates, score_candidates_batch
+
+
+class RowPipeline:
+    """predict_proba dépendant uniquement de la ligne (âge + année)."""
+
+    def predict_proba(self, df):
+        p = ((df["age"] * 7 + df["annee_publication"]) % 100 / 100.0).to_numpy()
+        return np.column_stack([1 - p, p])
+
+
+def _candidates(n: int, offset: int) -> list:
+    return [(f"isbn{offset + i}", "T", "A", "fr", "Fiction", 1990 + offset + i, "") for i in range(n)]
+
+
+def test_micro_batch_splits_results_per_request():
+    bundle = ModelBundle(pipeline=RowPipeline())
+    jobs = [
+        (25, "france", _candidates(3, 0), None, 0.0),
+        (40, "usa", _candidates(5, 10), None, 0.0),
+        (61, "UNK", _candidates(1, 20), None, 0.0),
+    ]
+
+    async def run():
+        executor = InferenceExecutor(workers=0)
+        executor.start(bundle)
+        batcher = MicroBatcher(executor, score_candidates_batch, max_batch_rows=1000, max_wait_ms=20)
+        results = await asyncio.gather(*(batcher.submit(job, len(job[2])) for job in jobs))
+        return results, batcher.metrics()
+
+    results, metrics = asyncio.run(run())
+
+    assert metrics["batches"] == 1 and metrics["jobs"] == 3
+    for job, (scores, proba, content, dominant) in zip(jobs, results):
+        expected = score_candidates(bundle, *job)[0]
+        assert len(scores) == len(job[2])
+        np.testing.assert_allclose(scores, expected)
+        assert content is None and dominant is None
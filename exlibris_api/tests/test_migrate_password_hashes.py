@@ -0,0 +1,56 @@
+import pytest
+
+from scripts.migrate_password_hashes import migrate_password_hashes
+
+
+class FakeUsers:
+    """Utilisateur en mémoire : id -> [mot_de_passe, mot_de_passe_hash] ; commit impossible après `crash_after`."""
+
+    def __init__(self, users, crash_after=None):
+        self.users, self.crash_after = users, crash_after
+        self.pending, self.commits, self.updates = {}, 0, 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params):
+        if sql.lstrip().startswith("SELECT"):
+            after, limit = params
+            self.rows = [(i, u[0]) for i, u in sorted(self.users.items())
+                         if i > after and u[1] is None and u[0]][:limit]
+            return
+        self.updates += 1
+        n = len(params) // 3
+        self.pending = dict(zip(params[0:2 * n:2], params[1:2 * n:2]))
+        self.rowcount = len(self.pending)
+
+    def fetchall(self):
+        return self.rows
+
+    def commit(self):
+        if self.crash_after is not None and self.commits >= self.crash_after:
+            raise RuntimeError("connexion perdue")
+        for i, h in self.pending.items():
+            self.users[i][1] = h
+        self.commits += 1
+
+    def rollback(self):
+        self.pending = {}
+
+    def close(self):
+        pass
+
+
+def test_chunks_are_hashed_in_parallel_and_resumable():
+    users = {i: [f"pwd{i}", None] for i in range(1, 26)}
+    users[3] = ["", None]  # utilisateur fantôme (import) : jamais haché
+    users[4] = ["pwd4", "déjà"]
+
+    with pytest.raises(RuntimeError):
+        migrate_password_hashes(FakeUsers(users, crash_after=2), jobs=2, chunk_size=10, hasher=str.upper)
+    assert sum(u[1] is not None for u in users.values()) == 1 + 20
+
+    conn = FakeUsers(users)
+    assert migrate_password_hashes(conn, jobs=2, chunk_size=10, hasher=str.upper) == 3
+    assert conn.updates == 1
+    assert users[25][1] == "PWD25" and users[4][1] == "déjà" and users[3][1] is None
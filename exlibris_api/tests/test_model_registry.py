@@ -0,0 +1,71 @@
+import json
+
+import pytest
+from scipy.sparse import csr_matrix, save_npz
+
+from services.model_registry import (
+    RegistryError,
+    current_release_dir,
+    current_version,
+    new_staging_dir,
+    previous_version,
+    publish_release,
+    read_manifest,
+    set_current,
+    verify_release,
+)
+from services.tfidf_store import has_tfidf_index, load_tfidf_matrix, load_tfidf_meta
+
+
+def _publish(ml_dir, files: dict, stats: dict) -> str:
+    staging = new_staging_dir(ml_dir)
+    for rel, content in files.items():
+        path = staging / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(content)
+    return publish_release(ml_dir, staging, stats=stats)
+
+
+def test_publish_carries_over_components_and_rolls_back(tmp_path):
+    v1 = _publish(tmp_path, {
+        "reco_pipeline.pkl": b"gbm-1",
+        "tfidf_index/matrix_data.npy": b"index-1",
+    }, {"gbm": {"auc": 0.7}, "tfidf": {"livres": 10}})
+    # seul le GBM est réentraîné : l'index TF-IDF est repris de v1
+    v2 = _publish(tmp_path, {"reco_pipeline.pkl": b"gbm-2"}, {"gbm": {"auc": 0.8}})
+
+    assert current_version(tmp_path) == v2
+    release = current_release_dir(tmp_path)
+    assert (release / "reco_pipeline.pkl").read_bytes() == b"gbm-2"
+    assert (release / "tfidf_index/matrix_data.npy").read_bytes() == b"index-1"
+
+    manifest = read_manifest(release)
+    assert manifest["parent"] == v1
+    assert manifest["stats"] == {"gbm": {"auc": 0.8}, "tfidf": {"livres": 10}}
+    verify_release(release)
+
+    assert previous_version(tmp_path) == v1
+    set_current(tmp_path, v1)
+    assert (current_release_dir(tmp_path) / "reco_pipeline.pkl").read_bytes() == b"gbm-1"
+
+    (release / "reco_pipeline.pkl").write_bytes(b"corrompu")
+    with pytest.raises(RegistryError):
+        verify_release(release)
+
+
+def test_first_publish_converts_flat_legacy_tfidf(tmp_path):
+    # ml/ à plat, sans registre
+    (tmp_path / "tfidf_vectorizer.pkl").write_bytes(b"vect")
+    save_npz(tmp_path / "tfidf_matrix.npz", csr_matrix([[0.0, 1.0], [0.5, 0.0]]))
+    records = [{"isbn": "0000000001", "titre": "A"}, {"isbn": "0000000002", "titre": "B"}]
+    (tmp_path / "tfidf_meta.json").write_text(json.dumps(records), encoding="utf-8")
+
+    # réentraînement du GBM seul
+    _publish(tmp_path, {"reco_pipeline.pkl": b"gbm"}, {"gbm": {"auc": 0.8}})
+
+    release = current_release_dir(tmp_path)
+    assert (release / "tfidf_vectorizer.pkl").read_bytes() == b"vect"
+    assert has_tfidf_index(release / "tfidf_index")
+    assert load_tfidf_matrix(release / "tfidf_index").toarray().tolist() == [[0.0, 1.0], [0.5, 0.0]]
+    assert load_tfidf_meta(release / "tfidf_index").index_of("0000000002") == 1
+    verify_release(release)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.reco_scorer import CompiledScorer, compile_pipeline, save_scorer
+from train_reco import make_pipeline
+
+
+def _training_frame(n=3000, seed=0):
+    rng = np.random.default_rng(seed)
+    words = np.array("amour guerre paris enquête dragon science histoire famille mer roi".split())
+    X = pd.DataFrame({
+        "age": rng.integers(15, 80, n),
+        "pays": pd.Categorical(rng.choice(["France", "Belgique", "Canada", "UNK"], n)),
+        "langue": pd.Categorical(rng.choice(["fr", "en"], n)),
+        "categorie": pd.Categorical(rng.choice(["Roman", "Histoire", "Science"], n)),
+        "annee_publication": rng.integers(1950, 2024, n),
+        "resume": pd.Categorical([" ".join(rng.choice(words, 4)) for _ in range(n)]),
+    })
+    y = ((X["age"] > 40) ^ (X["langue"] == "fr") ^ X["resume"].astype(str).str.contains("dragon")).astype(int)
+    return X, y
+
+
+def test_compiled_scorer_matches_sklearn_pipeline(tmp_path):
+    X, y = _training_frame()
+    pipeline = make_pipeline("gbm").fit(X, y)
+
+    save_scorer(tmp_path / "reco_scorer.npz", compile_pipeline(pipeline))
+    scorer = CompiledScorer.load(tmp_path / "reco_scorer.npz")
+
+    # colonnes brutes comme au service, dont modalités inconnues et résumés vides
+    columns = {
+        "age": [30, 55, 90, 0] * 50,
+        "pays": ["France", "Canada", "Japon", "UNK"] * 50,
+        "langue": ["fr", "en", "de", "fr"] * 50,
+        "categorie": ["Roman", "Science", "Poésie", "UNK"] * 50,
+        "annee_publication": [2001, 0, 1990, 2023] * 50,
+        "resume": ["dragon PARIS été", "", "mots inconnus", "Roi mer guerre guerre"] * 50,
+    }
+    expected = pipeline.predict_proba(pd.DataFrame(columns))
+    np.testing.assert_allclose(scorer.predict_proba(columns), expected, rtol=0, atol=1e-12)
+
+    sample = X.head(500).astype({"pays": str, "langue": str, "categorie": str, "resume": str})
+    np.testing.assert_allclose(scorer.predict_proba(sample), pipeline.predict_proba(sample), rtol=0, atol=1e-12)
+
+
+def test_hist_gradient_boosting_is_not_compiled():
+    X, y = _training_frame(n=500)
+    with pytest.raises(ValueError):
+        compile_pipeline(make_pipeline("hgb").fit(X, y))
@@ -0,0 +1,71 @@
+import numpy as np
+
+import seed_fake_data as seed
+
+
+def test_generation_is_deterministic_and_block_stable():
+    n_users, n_books = seed.BLOCK_USERS + 500, 2000
+    popularity = seed.book_popularity(7, n_books)
+
+    # le 2e bloc ne dépend pas du nombre total d'utilisateurs générés
+    users = seed.make_users(7, seed.BLOCK_USERS, seed.BLOCK_USERS + 500)
+    assert users == seed.make_users(7, 0, n_users)[seed.BLOCK_USERS:]
+    assert len({email for _, email, *_ in users}) == 500
+
+    a, b, _ = seed.make_friendships(7, 1, n_users)
+    assert (a < b).all() and np.unique(a * n_users + b).size == a.size
+    assert 0.9 * 2 * 500 <= a.size <= 6 * 500  # 2 à 6 amis tirés par utilisateur du bloc
+
+    first = seed.make_content(7, 1, n_users, n_books, popularity)
+    second = seed.make_content(7, 1, n_users, n_books, popularity)
+    for x, y in zip(first, second):
+        for col_x, col_y in zip(x, y):
+            assert np.array_equal(col_x, col_y)
+
+    (cu, cb), (wu, wb), (ru, rb, notes) = first
+    assert set(cu) == set(range(seed.BLOCK_USERS, n_users))
+    collection = set(zip(cu.tolist(), cb.tolist()))
+    assert not collection & set(zip(wu.tolist(), wb.tolist()))  # souhaits hors collection
+    assert np.unique(ru * n_books + rb).size == ru.size and notes.max() <= 10
+
+    dem, dst, b1, b2, _ = seed.make_exchanges(7, 0, 1000, n_users, popularity)
+    assert (dem != dst).all() and (b1 != b2).all()
+
+
+class FakeDB:
+    """Utilisateur en mémoire (id, email, role) ; les autres tables ne font que compter."""
+
+    def __init__(self, emails=()):
+        self.users = {email: (i + 1, "lecteur") for i, email in enumerate(emails)}
+        self.rowcount = 0
+
+    def cursor(self):
+        return self
+
+    def executemany(self, sql, rows):
+        self.rowcount = len(rows)
+        if "INTO Utilisateur" in sql:
+            for row in rows:
+                self.users.setdefault(row[1], (len(self.users) + 1, row[-1]))
+
+    def execute(self, sql, params=None):
+        self.rows = [(uid, email) for email, (uid, _) in self.users.items()] if "Utilisateur WHERE" in sql else [(0,)]
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def commit(self):
+        pass
+
+
+def test_seed_skips_exchanges_and_foreign_seed_emails(monkeypatch):
+    monkeypatch.setattr(seed, "hash_password", lambda pwd: "hash")
+    db = FakeDB(["seedbox@test.com", "seed.x@test.com"])
+
+    writer = seed.seed(db, ["0000000001"], n_users=30, n_admins=2)  # un seul livre : pas d'échange possible
+    assert "Echange" not in writer.stats and writer.stats["Utilisateur"][0] == 30
+    roles = [role for email, (_, role) in db.users.items() if email.startswith("seed") and email[4].isdigit()]
+    assert roles.count("admin") == 2 and roles.count("lecteur") == 28
@@ -0,0 +1,61 @@
+import numpy as np
+from scipy.sparse import random as sparse_random
+
+from services.tfidf_store import (
+    TfidfMeta,
+    load_tfidf_matrix,
+    load_tfidf_meta,
+    save_tfidf_index,
+)
+
+
+def test_tfidf_index_roundtrip_mmap(tmp_path):
+    matrix = sparse_random(40, 25, density=0.2, format="csr", random_state=0)
+    records = [
+        {"isbn": f"97800000{i:05d}", "titre": f"Livre é{i}", "auteur": "Auteur", "editeur": None, "image": ""}
+        for i in range(40)
+    ]
+
+    save_tfidf_index(tmp_path, matrix, records)
+    loaded = load_tfidf_matrix(tmp_path)
+    meta = load_tfidf_meta(tmp_path)
+
+    assert loaded.shape == matrix.shape
+    assert abs(loaded - matrix).max() == 0
+    assert not loaded.data.flags.writeable  # mmap lecture seule, pas de copie
+
+    assert len(meta) == 40
+    assert meta.index_of("9780000000017") == 17
+    assert meta.index_of("0000000000000") is None
+    assert meta[17]["titre"] == "Livre é17"
+    assert meta[17]["editeur"] == ""
+
+
+def test_tfidf_meta_from_legacy_records():
+    meta = TfidfMeta.from_records([
+        {"isbn": "B", "titre": "Deux"},
+        {"isbn": "A", "titre": "Un"},
+    ])
+
+    assert meta.index_of("A") == 1
+    assert meta.index_of("B") == 0
+    assert meta[1]["titre"] == "Un"
+
+
+def test_partition_groups_merge_colliding_keys():
+    import pandas as pd
+
+    from train_reco_content import partition_groups
+
+    df = pd.DataFrame({
+        "langue": ["fr", "FR ", "fr", "en", "fr"],
+        "categorie": ["Science-Fiction", "Science Fiction", "Policier", "Policier", "policier "],
+    })
+    groups = {key: (langue, categorie, len(part)) for key, langue, categorie, part in partition_groups(df, True)}
+    assert groups == {
+        "en": ("en", None, 1),
+        "en__policier": ("en", "Policier", 1),
+        "fr": ("fr", None, 4),
+        "fr__policier": ("fr", "Policier", 2),
+        "fr__science-fiction": ("fr", "Science Fiction", 2),
+    }
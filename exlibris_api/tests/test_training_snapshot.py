@@ -0,0 +1,94 @@
+from datetime import datetime, timedelta
+
+from services.training_snapshot import read_books, read_snapshot, read_table, refresh
+
+T0 = datetime(2026, 1, 1, 12, 0, 0)
+
+
+class FakeDB:
+    """Tables en mémoire, lignes = (colonnes du SELECT..., date_derniere_maj)."""
+
+    def __init__(self):
+        self.now = T0 + timedelta(minutes=1)
+        self.tables = {
+            "Evaluation": [(1, 10, "111", 8, T0), (2, 11, "111", 3, T0)],
+            "Utilisateur": [(10, 30, "France", T0), (11, 40, "Belgique", T0)],
+            "Livre": [("111", "Titre", "Auteur", None, "Résumé", "fr", 1, None, 2001, T0)],
+            "Categorie": [(1, "Roman")],
+        }
+
+    def cursor(self, *_):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        if sql.startswith("START"):
+            return
+        if "COUNT(*)" in sql:
+            self.rows = [(sum(1 for r in self.db.tables["Evaluation"] if r[0] <= params[0]),)]
+            return
+        if "NOW()" in sql:
+            self.rows = [(self.db.now - timedelta(seconds=params[0]),)]
+            return
+        table = next(t for t in self.db.tables if f"FROM {t} " in sql + " ")
+        rows = self.db.tables[table]
+        if table == "Categorie":
+            self.rows = list(rows)
+            return
+        if params:
+            marker = datetime.strptime(params["marqueur"], "%Y-%m-%d %H:%M:%S")
+            rows = [r for r in rows if r[-1] >= marker or (table == "Evaluation" and r[0] > params["max_id"])]
+        self.rows = [r[:-1] for r in rows]
+
+    def fetchmany(self, size):
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def close(self):
+        pass
+
+
+def test_delta_refresh_and_pinned_snapshot(tmp_path):
+    db = FakeDB()
+    base = refresh(db, tmp_path, margin_seconds=0, verbose=False)
+
+    # une note modifiée, une nouvelle évaluation, un livre modifié
+    db.now = T0 + timedelta(hours=1)
+    changed = T0 + timedelta(minutes=30)
+    db.tables["Evaluation"][1] = (2, 11, "111", 9, changed)
+    db.tables["Evaluation"].append((3, 10, "222", None, changed))
+    db.tables["Livre"].append(("222", "Autre", None, None, None, "en", None, None, None, changed))
+    db.tables["Livre"][0] = ("111", "Titre 2", "Auteur", None, "Résumé", "fr", 1, None, 2001, changed)
+    delta = refresh(db, tmp_path, margin_seconds=0, verbose=False)
+
+    manifest = read_snapshot(delta, tmp_path)
+    assert manifest["parent"] == base
+    assert len(manifest["parts"]) == 2
+    assert manifest["lignes"]["evaluations"] == 2
+    assert manifest["lignes"]["utilisateurs"] == 0
+
+    ratings = read_table("evaluations", root=tmp_path).set_index("id_evaluation")
+    assert ratings["note"].tolist()[:2] == [8, 9]
+    assert ratings["note"].isna().tolist() == [False, False, True]
+    books = read_books(root=tmp_path)
+    assert books["titre"].tolist() == ["Titre 2", "Autre"]
+    assert books["categorie"].tolist()[0] == "Roman"
+
+    # le snapshot épinglé redonne les données d'origine
+    pinned = read_table("evaluations", base, tmp_path)
+    assert pinned["note"].tolist() == [8, 3]
+
+    # rien de nouveau : pas de nouveau snapshot
+    db.now = T0 + timedelta(hours=2)
+    assert refresh(db, tmp_path, margin_seconds=0, verbose=False) == delta
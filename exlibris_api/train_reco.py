@@ -1,15 +1,25 @@
+import argparse
+import time
+from pathlib import Path
+
 import joblib
 import numpy as np
 import pandas as pd
 import pymysql
+import sklearn
 
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.model_selection import GridSearchCV, StratifiedKFold, train_test_split
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.metrics import classification_report, accuracy_score
+from sklearn.ensemble import GradientBoostingClassifier, HistGradientBoostingClassifier
+from sklearn.metrics import classification_report, accuracy_score, roc_auc_score
+
+from services.model_registry import new_staging_dir, publish_release
+from services.reco_scorer import SCORER_NAME, CompiledScorer, compile_pipeline, save_scorer
+from services.training_data import CATEGORY, clean_label, peak_rss_mb, stream_frame, to_category
+from services.training_snapshot import read_books, read_snapshot, read_table
 
 DB_HOST = "87.106.141.247"
 DB_PORT = 3306
@@ -17,6 +27,8 @@ DB_USER = "exlibris"
 DB_PASSWORD = "exlibris2b"
 DB_NAME = "exlibris"
 
+ML_DIR = Path(__file__).parent / "ml"
+
 def get_conn():
     return pymysql.connect(
         host=DB_HOST,
@@ -24,19 +36,64 @@ def get_conn():
         user=DB_USER,
         password=DB_PASSWORD,
         database=DB_NAME,
-        cursorclass=pymysql.cursors.DictCursor,
+        charset="utf8mb4",
     )
 
-def load_training_data(limit=500000):
+# ordre = ordre du SELECT ; texte répétitif -> category (une chaîne par valeur distincte)
+TRAINING_SCHEMA = {
+    "id_utilisateur": "int32",
+    "age": "int16",
+    "pays": CATEGORY,
+    "isbn": CATEGORY,
+    "langue": CATEGORY,
+    "categorie": CATEGORY,
+    "annee_publication": "int16",
+    "resume": CATEGORY,
+    "note": "int8",
+}
+
+TRAINING_NORMALIZE = {
+    "pays": clean_label,
+    "langue": clean_label,
+    "categorie": clean_label,
+    "resume": lambda v: "" if v is None else str(v).strip(),
+}
+
+
+FEATURES = ["age", "pays", "langue", "categorie", "annee_publication", "resume"]
+NUMERIC_FEATURES = ["age", "annee_publication"]
+CATEGORICAL_FEATURES = ["pays", "langue", "categorie"]
+TEXT_FEATURE = "resume"
+
+BACKENDS = ("gbm", "hgb")
+
+# grilles de --search (préfixe model__ : paramètres du classifieur du Pipeline)
+PARAM_GRIDS = {
+    "gbm": {
+        "model__n_estimators": [100, 200],
+        "model__max_depth": [3, 5],
+        "model__learning_rate": [0.05, 0.1],
+    },
+    "hgb": {
+        "model__max_iter": [100, 200, 400],
+        "model__max_leaf_nodes": [15, 31, 63],
+        "model__learning_rate": [0.05, 0.1],
+    },
+}
+
+
+def load_training_data(limit=500000, chunk_size=50000):
     """
     Dataset d'entraînement basé sur les évaluations réelles:
     Utilisateur(age, pays) + Livre(langue, categorie, année, résumé) -> note
-    """
-    conn = get_conn()
-    cur = conn.cursor()
 
-    cur.execute(
-        """
+    Lecture en flux (curseur serveur, paquets de `chunk_size` lignes) vers
+    des colonnes typées : la mémoire reste proportionnelle au DataFrame
+    final, pas aux tuples renvoyés par MariaDB. Les lignes incomplètes sont
+    écartées côté SQL (mêmes colonnes critiques que clean_df).
+    `limit` = 0 : toutes les évaluations.
+    """
+    sql = """
         SELECT
             u.id_utilisateur,
             u.age AS age,
@@ -50,14 +107,53 @@ def load_training_data(limit=500000):
         FROM Evaluation e
         JOIN Utilisateur u ON u.id_utilisateur = e.utilisateur_id
         JOIN Livre l ON l.isbn = e.livre_isbn
-        LEFT JOIN Categorie c ON c.id = l.categorie_id
-        LIMIT %s
-        """,
-        (limit,),
+        JOIN Categorie c ON c.id = l.categorie_id
+        WHERE u.age IS NOT NULL
+          AND u.pays IS NOT NULL
+          AND l.langue IS NOT NULL
+          AND l.date_publication IS NOT NULL
+          AND l.resume IS NOT NULL
+          AND e.note IS NOT NULL
+    """
+    params = ()
+    if limit:
+        sql += " LIMIT %s"
+        params = (limit,)
+
+    conn = get_conn()
+    try:
+        return stream_frame(conn, sql, params, TRAINING_SCHEMA, chunk_size, TRAINING_NORMALIZE)
+    finally:
+        conn.close()
+
+def load_training_snapshot(snapshot_id=None, limit=500000):
+    """
+    Même dataset que load_training_data, lu depuis un snapshot Parquet local
+    (services/training_snapshot) au lieu de MariaDB : jointure refaite en
+    local, mêmes filtres que le SQL. Avec `limit`, les évaluations les plus
+    anciennes (id_evaluation croissant) : le résultat est stable pour un
+    snapshot donné.
+    """
+    ratings = read_table("evaluations", snapshot_id)
+    users = read_table("utilisateurs", snapshot_id)
+    books = read_books(snapshot_id)[["isbn", "langue", "categorie", "annee_publication", "resume"]]
+
+    df = (
+        ratings.merge(users, left_on="utilisateur_id", right_on="id_utilisateur")
+        .merge(books, on="isbn")
+        .dropna(subset=["age", "pays", "langue", "categorie", "annee_publication", "resume", "note"])
+        .sort_values("id_evaluation", kind="stable")
     )
-    rows = cur.fetchall()
-    conn.close()
-    return pd.DataFrame(rows)
+    if limit:
+        df = df.head(limit)
+
+    columns = {}
+    for name, kind in TRAINING_SCHEMA.items():
+        if kind == CATEGORY:
+            columns[name] = to_category(df[name], TRAINING_NORMALIZE.get(name))
+        else:
+            columns[name] = df[name].to_numpy(dtype=kind)
+    return pd.DataFrame(columns, copy=False)
 
 def clean_df(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -65,83 +161,256 @@ def clean_df(df: pd.DataFrame) -> pd.DataFrame:
     - suppression lignes avec manquants critiques
     - normalisation types
     - valeurs par défaut (UNK/0)
+    Les colonnes déjà typées par load_training_data (entiers, category
+    aux libellés nettoyés) ne sont pas reconverties.
     """
     # Colonnes critiques pour apprendre correctement
     critical = ["age", "pays", "langue", "categorie", "annee_publication", "resume", "note"]
     df = df.dropna(subset=critical)
 
     # Cast / nettoyage texte
-    df["age"] = pd.to_numeric(df["age"], errors="coerce").fillna(0).astype(int)
-    df["annee_publication"] = pd.to_numeric(df["annee_publication"], errors="coerce").fillna(0).astype(int)
-    df["note"] = pd.to_numeric(df["note"], errors="coerce").fillna(0).astype(int)
+    for col in ["age", "annee_publication", "note"]:
+        if not pd.api.types.is_integer_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0).astype(int)
 
     # Remplacer valeurs manquantes / vides par UNK
     for col in ["pays", "langue", "categorie"]:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
         df[col] = df[col].astype(str).replace({"None": "UNK", "nan": "UNK"}).fillna("UNK")
         df[col] = df[col].str.strip()
         df.loc[df[col] == "", col] = "UNK"
 
     # Résumé texte
-    df["resume"] = df["resume"].astype(str).replace({"None": "", "nan": ""}).fillna("")
-    df["resume"] = df["resume"].str.strip()
+    if not isinstance(df["resume"].dtype, pd.CategoricalDtype):
+        df["resume"] = df["resume"].astype(str).replace({"None": "", "nan": ""}).fillna("")
+        df["resume"] = df["resume"].str.strip()
 
     # Dédoublonnage (si répétitions exactes)
     df = df.drop_duplicates()
 
     return df
 
-def main():
-    df = load_training_data()
+def make_pipeline(backend: str = "gbm") -> Pipeline:
+    """
+    gbm : GradientBoostingClassifier (un seul cœur, splits exacts) sur le
+          one-hot creux, comme avant.
+    hgb : HistGradientBoostingClassifier (histogrammes, tous les cœurs) ;
+          il ne prend pas de creux : catégories encodées en entiers
+          (support catégoriel natif) et TF-IDF dense float32.
+    """
+    if backend == "hgb":
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ("num", "passthrough", NUMERIC_FEATURES),
+                # 255 = max_bins : au-delà, les modalités rares sont regroupées
+                ("cat", OrdinalEncoder(
+                    handle_unknown="use_encoded_value",
+                    unknown_value=np.nan,
+                    max_categories=255,
+                ), CATEGORICAL_FEATURES),
+                ("txt", TfidfVectorizer(max_features=100, dtype=np.float32), TEXT_FEATURE),
+            ],
+            remainder="drop",
+            sparse_threshold=0,
+        )
+        n_num, n_cat = len(NUMERIC_FEATURES), len(CATEGORICAL_FEATURES)
+        model = HistGradientBoostingClassifier(
+            max_iter=200,
+            learning_rate=0.1,
+            max_leaf_nodes=31,
+            categorical_features=list(range(n_num, n_num + n_cat)),
+            early_stopping=False,
+            random_state=42,
+        )
+    else:
+        # Preprocessing stable (gère valeurs inconnues)
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ("num", StandardScaler(), NUMERIC_FEATURES),
+                ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
+                ("txt", TfidfVectorizer(max_features=100), TEXT_FEATURE),
+            ],
+            remainder="drop",
+            sparse_threshold=0.3,
+        )
+        model = GradientBoostingClassifier(
+            n_estimators=100,
+            learning_rate=0.1,
+            max_depth=3,
+            random_state=42,
+        )
+
+    return Pipeline(steps=[
+        ("prep", preprocessor),
+        ("model", model),
+    ])
+
+
+def latency_500(pipeline, X: pd.DataFrame, repeat: int = 20) -> float:
+    """Latence médiane (ms) de predict_proba sur 500 lignes, comme un appel /me/recommendations."""
+    batch = X.head(500).astype({c: object for c in CATEGORICAL_FEATURES + [TEXT_FEATURE]})
+    pipeline.predict_proba(batch)  # premier appel hors mesure
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        pipeline.predict_proba(batch)
+        timings.append(time.perf_counter() - t0)
+    return 1000 * float(np.median(timings))
+
+
+def fit_backend(backend, X_train, y_train, X_test, y_test, search=False, cv=3, n_jobs=-1) -> dict:
+    """
+    Entraîne un backend (avec recherche d'hyperparamètres en validation
+    croisée si `search`, réparties sur `n_jobs` process joblib) puis mesure
+    AUC et latence d'inférence sur le jeu de test.
+    """
+    pipeline = make_pipeline(backend)
+    params = {}
+    t0 = time.perf_counter()
+    if search:
+        grid = GridSearchCV(
+            pipeline,
+            PARAM_GRIDS[backend],
+            scoring="roc_auc",
+            cv=StratifiedKFold(n_splits=cv, shuffle=True, random_state=42),
+            n_jobs=n_jobs,
+            refit=True,
+        )
+        grid.fit(X_train, y_train)
+        pipeline = grid.best_estimator_
+        params = {k.removeprefix("model__"): v for k, v in grid.best_params_.items()}
+        print(f"[{backend}] meilleurs paramètres (AUC CV {grid.best_score_:.4f}) : {params}")
+    else:
+        pipeline.fit(X_train, y_train)
+    train_s = time.perf_counter() - t0
+
+    auc = roc_auc_score(y_test, pipeline.predict_proba(X_test)[:, 1])
+    return {
+        "backend": backend,
+        "pipeline": pipeline,
+        "train_s": round(train_s, 2),
+        "latency_500_ms": round(latency_500(pipeline, X_test), 2),
+        "auc": round(float(auc), 4),
+        "params": params,
+    }
+
+
+def print_backend_report(results: list) -> None:
+    print(f"{'backend':<8} {'entraînement':>13} {'500 lignes':>11} {'AUC':>7}  paramètres")
+    for r in results:
+        print(f"{r['backend']:<8} {r['train_s']:>12.1f}s {r['latency_500_ms']:>9.1f}ms {r['auc']:>7.4f}  {r['params'] or '-'}")
+
+
+def export_scorer(pipeline, X_check: pd.DataFrame, path: Path) -> bool:
+    """
+    Compile le pipeline en scorer NumPy (services/reco_scorer) et vérifie
+    qu'il redonne les mêmes probabilités sur `X_check` avant de l'écrire.
+    False si le pipeline n'est pas compilable ou si la parité échoue.
+    """
+    try:
+        arrays = compile_pipeline(pipeline)
+    except ValueError as e:
+        print(f"Scorer compilé non exporté: {e}")
+        return False
+    columns = {c: X_check[c].astype(object if c in CATEGORICAL_FEATURES + [TEXT_FEATURE] else "int64").tolist()
+               for c in FEATURES}
+    expected = pipeline.predict_proba(pd.DataFrame(columns))[:, 1]
+    got = CompiledScorer(arrays).predict_proba(columns)[:, 1]
+    gap = float(np.max(np.abs(expected - got))) if len(got) else 0.0
+    if gap > 1e-9:
+        print(f"⚠️ Scorer compilé non exporté: écart de probabilité {gap:.2e}")
+        return False
+    save_scorer(path, arrays)
+    print(f"Scorer compilé exporté (écart max {gap:.1e} sur {len(got)} lignes)")
+    return True
+
+
+def main(limit=500000, chunk_size=50000, load_only=False, snapshot=None,
+         backend="gbm", compare=False, search=False, cv=3, n_jobs=-1):
+    t0 = time.perf_counter()
+    if snapshot:
+        # id figé tout de suite : un refresh concurrent ne change pas les données lues
+        snapshot = read_snapshot(snapshot)["id"]
+        print(f"Snapshot {snapshot}")
+        df = load_training_snapshot(snapshot, limit)
+    else:
+        df = load_training_data(limit, chunk_size)
     if df.empty:
         raise SystemExit("Aucune donnée d'entraînement: table Evaluation vide.")
 
     df = clean_df(df)
+    print(
+        f"Données: {len(df)} lignes, {df.memory_usage(deep=True).sum() / 1e6:.1f} Mo "
+        f"en {time.perf_counter() - t0:.1f} s (pic RSS {peak_rss_mb():.0f} Mo)"
+    )
+    if load_only:
+        return
 
     # Target binaire "like"
     # NOTE: votre DB est 0..10 actuellement. Si vous passez à 0..5, garde >=4.
     y = (df["note"] >= 4).astype(int)
 
-    X = df[["age", "pays", "langue", "categorie", "annee_publication", "resume"]].copy()
-
-    numeric_features = ["age", "annee_publication"]
-    categorical_features = ["pays", "langue", "categorie"]
-    text_feature = "resume"
-
-    # Preprocessing stable (gère valeurs inconnues)
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ("num", StandardScaler(), numeric_features),
-            ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features),
-            ("txt", TfidfVectorizer(max_features=100), text_feature),
-        ],
-        remainder="drop",
-        sparse_threshold=0.3,
-    )
-
-    model = GradientBoostingClassifier(
-        n_estimators=100,
-        learning_rate=0.1,
-        max_depth=3,
-        random_state=42,
-    )
-
-    pipeline = Pipeline(steps=[
-        ("prep", preprocessor),
-        ("model", model),
-    ])
+    X = df[FEATURES].copy()
 
     X_train, X_test, y_train, y_test = train_test_split(
         X, y, test_size=0.2, random_state=42, stratify=y
     )
 
-    pipeline.fit(X_train, y_train)
-    y_pred = pipeline.predict(X_test)
+    if compare:
+        results = [fit_backend(name, X_train, y_train, X_test, y_test, search, cv, n_jobs) for name in BACKENDS]
+        print_backend_report(results)
+        result = next(r for r in results if r["backend"] == backend)
+    else:
+        result = fit_backend(backend, X_train, y_train, X_test, y_test, search, cv, n_jobs)
+    pipeline = result.pop("pipeline")
 
-    print("Accuracy:", accuracy_score(y_test, y_pred))
+    y_pred = pipeline.predict(X_test)
+    accuracy = accuracy_score(y_test, y_pred)
+    print("Backend:", backend)
+    print("Accuracy:", accuracy)
+    print("AUC:", result["auc"])
     print(classification_report(y_test, y_pred))
 
-    joblib.dump(pipeline, "reco_pipeline.pkl")
-    print("✅ Sauvegardé : reco_pipeline.pkl (pipeline complet prêt pour API)")
+    # publication atomique dans le registre (ml/releases/<version> + ml/CURRENT)
+    staging = new_staging_dir(ML_DIR)
+    joblib.dump(pipeline, staging / "reco_pipeline.pkl")
+    scorer = export_scorer(pipeline, X_test.head(5000), staging / SCORER_NAME)
+    stats = {
+        "lignes": int(len(df)),
+        "taux_positifs": round(float(y.mean()), 4),
+        "accuracy": round(float(accuracy), 4),
+        "auc": result["auc"],
+        "backend": backend,
+        "entrainement_s": result["train_s"],
+        "latence_500_ms": result["latency_500_ms"],
+        "params": result["params"],
+        "scorer": scorer,
+        "sklearn": sklearn.__version__,
+        "pic_rss_mo": round(peak_rss_mb()),
+        "snapshot": snapshot,
+    }
+    # un scorer de la version précédente ne correspond plus au nouveau pipeline
+    version = publish_release(ML_DIR, staging, stats={"gbm": stats}, source="train_reco.py", drop=(SCORER_NAME,))
+    print(f"✅ Version publiée : {version} (pipeline complet prêt pour API)")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Entraîne le pipeline GBM de recommandation.")
+    parser.add_argument("--limit", type=int, default=500000, help="nombre max d'évaluations (0 = toutes)")
+    parser.add_argument("--chunk-size", type=int, default=50000, help="lignes lues par paquet depuis MariaDB")
+    parser.add_argument("--load-only", action="store_true",
+                        help="charge les données et affiche mémoire / pic RSS, sans entraîner")
+    parser.add_argument("--snapshot", nargs="?", const="latest", metavar="ID",
+                        help="lit un snapshot local (scripts.training_snapshot) au lieu de MariaDB ; "
+                             "sans ID : le dernier")
+    parser.add_argument("--backend", choices=BACKENDS, default="gbm",
+                        help="modèle publié : gbm (GradientBoosting) ou hgb (HistGradientBoosting, multi-cœurs)")
+    parser.add_argument("--compare", action="store_true",
+                        help="entraîne tous les backends et affiche temps d'entraînement / latence 500 lignes / AUC")
+    parser.add_argument("--search", action="store_true",
+                        help="recherche d'hyperparamètres en validation croisée (GridSearchCV, scoring AUC)")
+    parser.add_argument("--cv", type=int, default=3, help="nombre de plis pour --search")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="process joblib pour --search (-1 = tous les cœurs)")
+    args = parser.parse_args()
+    main(limit=args.limit, chunk_size=args.chunk_size, load_only=args.load_only, snapshot=args.snapshot,
+         backend=args.backend, compare=args.compare, search=args.search, cv=args.cv, n_jobs=args.n_jobs)
@@ -1,15 +1,22 @@
 import os
 import json
+import argparse
 from pathlib import Path
 
+import numpy as np
 import pymysql
 import pandas as pd
 from dotenv import load_dotenv
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from scipy.sparse import save_npz
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import ENGLISH_STOP_WORDS, TfidfVectorizer
+from sklearn.preprocessing import normalize
 import joblib
 
+from services.model_registry import current_release_dir, link_tree, new_staging_dir, publish_release
+from services.tfidf_store import PARTITIONS_MANIFEST, partition_key, save_tfidf_index
+from services.training_snapshot import read_books, read_snapshot
+
 load_dotenv(".env.local")
 
 DB_HOST = os.getenv("DB_HOST", "127.0.0.1")
@@ -22,9 +29,31 @@ BASE_DIR = Path(__file__).parent
 ML_DIR = BASE_DIR / "ml"
 ML_DIR.mkdir(exist_ok=True)
 
-VECT_PATH = ML_DIR / "tfidf_vectorizer.pkl"
-MATRIX_PATH = ML_DIR / "tfidf_matrix.npz"
-META_PATH = ML_DIR / "tfidf_meta.json"
+# noms dans une version du registre (ml/releases/<version>/)
+VECT_NAME = "tfidf_vectorizer.pkl"
+INDEX_NAME = "tfidf_index"
+PARTITIONS_NAME = "tfidf_partitions"
+
+# en dessous, min_df/max_df n'ont plus de sens : ces livres restent servis par l'index global
+MIN_PARTITION_BOOKS = 50
+
+FRENCH_STOP_WORDS = frozenset("""
+    a ai aie aient aies ait alors as au aucun aura aurai auraient aurais aurait
+    aux avaient avais avait avec avez aviez avions avoir avons ayant c ce ceci
+    cela celle celles celui ces cet cette ceux chaque comme d dans de des donc
+    dont du elle elles en encore est et etaient etais etait ete etre eu eux
+    fait fois furent fut ici il ils j je jusqu l la le les leur leurs lui m ma
+    mais me meme mes moi mon n ne ni nos notre nous on ont ou par pas peu peut
+    plus pour pourquoi qu quand que quel quelle quelles quels qui s sa sans se
+    sera serait ses si son sont sous sur t ta te tes toi ton tous tout toute
+    toutes tres tu un une unes uns vos votre vous y à ça déjà été être très où
+""".split())
+
+# stop words par langue (valeur Livre.langue) ; les autres langues n'en ont pas
+STOP_WORDS_BY_LANG = {
+    "en": ENGLISH_STOP_WORDS,
+    "fr": FRENCH_STOP_WORDS,
+}
 
 
 def get_db_connection():
@@ -39,7 +68,12 @@ def get_db_connection():
     )
 
 
-def load_books():
+def load_books(snapshot=None):
+    """Livres depuis MariaDB, ou depuis un snapshot Parquet local si `snapshot` est donné."""
+    if snapshot:
+        df = read_books(snapshot)[["isbn", "titre", "auteur", "editeur", "resume", "langue", "categorie", "image"]]
+        return prepare_books(df.fillna(""))
+
     conn = get_db_connection()
     cur = conn.cursor()
 
@@ -59,7 +93,10 @@ def load_books():
     rows = cur.fetchall()
     conn.close()
 
-    df = pd.DataFrame(rows)
+    return prepare_books(pd.DataFrame(rows))
+
+
+def prepare_books(df: pd.DataFrame) -> pd.DataFrame:
     if df.empty:
         return df
 
@@ -81,37 +118,248 @@ def load_books():
     return df
 
 
-def build_and_save():
-    df = load_books()
-    if df.empty:
-        print("Aucun livre trouvé en base (table Livre vide).")
-        return
-
-    tfidf = TfidfVectorizer(
-        stop_words="english",
+def make_vectorizer(stop_words) -> TfidfVectorizer:
+    return TfidfVectorizer(
+        stop_words=sorted(stop_words) if stop_words else None,
         max_features=10000,
         min_df=2,
         max_df=0.8,
     )
 
+
+def matrix_nbytes(matrix) -> int:
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+def reduce_matrix(matrix, dtype: str = "float64", top_terms=None) -> csr_matrix:
+    """
+    Variante allégée de la matrice TF-IDF :
+      - top_terms : ne garde que les M termes les plus lourds de chaque livre
+        (puis renormalise L2 pour que linear_kernel reste un cosinus)
+      - dtype : float32 divise par deux la taille de `data`
+    """
+    matrix = csr_matrix(matrix)
+    if top_terms:
+        rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+        # tri par ligne puis poids décroissant -> rang du terme dans sa ligne
+        order = np.lexsort((-matrix.data, rows))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - matrix.indptr[rows[order]]
+        keep = rank < top_terms
+        matrix = csr_matrix(
+            (matrix.data[keep], (rows[keep], matrix.indices[keep])),
+            shape=matrix.shape,
+        )
+        matrix = normalize(matrix, norm="l2", copy=False)
+    return matrix.astype(dtype)
+
+
+def ranking_drift(full, reduced, k: int = 10, sample: int = 500, seed: int = 42) -> float:
+    """Recouvrement moyen des top-k voisins (1.0 = classements identiques)."""
+    n = full.shape[0]
+    if n <= 1:
+        return 1.0
+    k = min(k, n - 1)
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(n, size=min(sample, n), replace=False)
+
+    def topk(matrix):
+        sims = (matrix[queries] @ matrix.T).toarray()
+        sims[np.arange(len(queries)), queries] = -np.inf
+        return np.argpartition(-sims, k - 1, axis=1)[:, :k]
+
+    top_full, top_reduced = topk(full), topk(reduced)
+    overlaps = [len(np.intersect1d(a, b)) / k for a, b in zip(top_full, top_reduced)]
+    return float(np.mean(overlaps))
+
+
+def report_reduction(name: str, full, reduced) -> None:
+    full_b, red_b = matrix_nbytes(full), matrix_nbytes(reduced)
+    print(
+        f"[{name}] matrice {full_b / 1e6:.1f} MB -> {red_b / 1e6:.1f} MB "
+        f"(-{100 * (1 - red_b / max(full_b, 1)):.0f}%), "
+        f"recouvrement top-10: {ranking_drift(full, reduced):.3f}"
+    )
+
+
+def tradeoff_report(df: pd.DataFrame, top_terms_grid=(None, 200, 100, 50, 20)) -> None:
+    """Tableau mémoire / dérive pour choisir une variante selon la taille du déploiement."""
+    full = make_vectorizer(ENGLISH_STOP_WORDS | FRENCH_STOP_WORDS).fit_transform(df["combined"])
+    print(f"{'dtype':<8} {'top_terms':>9} {'MB':>8} {'gain':>6} {'top10':>6}")
+    for dtype in ("float64", "float32"):
+        for m in top_terms_grid:
+            reduced = reduce_matrix(full, dtype=dtype, top_terms=m)
+            gain = 1 - matrix_nbytes(reduced) / matrix_nbytes(full)
+            print(
+                f"{dtype:<8} {str(m or '-'):>9} {matrix_nbytes(reduced) / 1e6:>8.1f} "
+                f"{100 * gain:>5.0f}% {ranking_drift(full, reduced):>6.3f}"
+            )
+
+
+def build_index(
+    df: pd.DataFrame,
+    index_dir: Path,
+    vect_path: Path,
+    stop_words,
+    dtype: str = "float64",
+    top_terms=None,
+) -> int:
+    tfidf = make_vectorizer(stop_words)
     tfidf_matrix = tfidf.fit_transform(df["combined"])
 
     # save vectorizer
-    joblib.dump(tfidf, VECT_PATH)
+    joblib.dump(tfidf, vect_path)
+
+    if dtype != "float64" or top_terms:
+        reduced = reduce_matrix(tfidf_matrix, dtype=dtype, top_terms=top_terms)
+        report_reduction(index_dir.name, tfidf_matrix, reduced)
+        tfidf_matrix = reduced
+
+    # save matrice CSR (.npy mmap-ables) + métadonnées colonnaires index -> book info
+    meta = df[["isbn", "titre", "auteur", "editeur", "image", "langue", "categorie"]].to_dict(orient="records")
+    save_tfidf_index(index_dir, tfidf_matrix, meta)
+    return tfidf_matrix.shape[0]
+
 
-    # save sparse matrix
-    save_npz(MATRIX_PATH, tfidf_matrix)
+def partition_groups(df: pd.DataFrame, by_category: bool):
+    """
+    (clé, langue, catégorie, sous-DataFrame) pour chaque partition. Regroupé
+    sur partition_key (nom de répertoire) : "Science-Fiction" et "science
+    fiction" forment une seule partition, libellée par la valeur la plus
+    fréquente.
+    """
+    langues = df["langue"].str.strip().str.lower()
+    for key, part in df.groupby(langues.map(partition_key), sort=True):
+        langue = langues.loc[part.index].mode()[0]
+        yield key, langue, None, part
+        if by_category:
+            cat_keys = part["categorie"].map(lambda c: partition_key(langue, c))
+            for cat_key, sub in part.groupby(cat_keys, sort=True):
+                yield cat_key, langue, sub["categorie"].mode()[0], sub
 
-    # save metadata index -> book info
-    meta = df[["isbn", "titre", "auteur", "editeur", "image"]].to_dict(orient="records")
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
 
-    print(f"✅ Sauvegardé : {VECT_PATH}")
-    print(f"✅ Sauvegardé : {MATRIX_PATH}")
-    print(f"✅ Sauvegardé : {META_PATH}")
-    print(f"Livres indexés: {len(df)}")
+def build_partitions(
+    df: pd.DataFrame,
+    out_dir: Path,
+    by_category: bool = False,
+    only=None,
+    **matrix_opts,
+) -> int:
+    """
+    Un sous-index par langue (+ par langue/catégorie si demandé), chacun avec
+    son vectorizer et ses stop words, dans out_dir/tfidf_partitions. `only`
+    limite la reconstruction à certaines clés : les autres partitions sont
+    reprises telles quelles de la version courante.
+    """
+    partitions_dir = out_dir / PARTITIONS_NAME
+    partitions_dir.mkdir(exist_ok=True)
+    manifest_path = partitions_dir / PARTITIONS_MANIFEST
+    manifest = {}
+    current = current_release_dir(ML_DIR) / PARTITIONS_NAME
+    if only and (current / PARTITIONS_MANIFEST).exists():
+        with open(current / PARTITIONS_MANIFEST, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        # liens durs : les fichiers repris ne sont jamais réécrits
+        link_tree(current, partitions_dir, exclude=set(only) | {PARTITIONS_MANIFEST})
+
+    for key, langue, categorie, part in partition_groups(df, by_category):
+        if only and key not in only:
+            continue
+        if len(part) < MIN_PARTITION_BOOKS:
+            manifest.pop(key, None)
+            continue
+
+        part_dir = partitions_dir / key
+        part_dir.mkdir(exist_ok=True)
+        try:
+            n = build_index(
+                part.reset_index(drop=True),
+                part_dir,
+                part_dir / "tfidf_vectorizer.pkl",
+                STOP_WORDS_BY_LANG.get(langue),
+                **matrix_opts,
+            )
+        except ValueError as e:
+            # vocabulaire vide après min_df/max_df
+            print(f"⚠️ Partition {key} ignorée: {e}")
+            manifest.pop(key, None)
+            continue
+
+        manifest[key] = {"langue": langue, "categorie": categorie, "livres": n}
+        print(f"✅ Partition {key}: {n} livres")
+
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    print(f"✅ {len(manifest)} partitions")
+    return len(manifest)
+
+
+def build_and_save(
+    by_category: bool = False,
+    only=None,
+    skip_partitions: bool = False,
+    dtype: str = "float64",
+    top_terms=None,
+    snapshot=None,
+):
+    if snapshot:
+        # id figé : la version publiée cite exactement les données utilisées
+        snapshot = read_snapshot(snapshot)["id"]
+        print(f"Snapshot {snapshot}")
+    df = load_books(snapshot)
+    if df.empty:
+        print("Aucun livre trouvé en base (table Livre vide).")
+        return
+
+    matrix_opts = {"dtype": dtype, "top_terms": top_terms}
+    stats = {"livres": len(df), "dtype": dtype, "top_terms": top_terms, "snapshot": snapshot}
+
+    # tout est écrit dans un staging puis publié d'un bloc (ml/releases/<version>)
+    staging = new_staging_dir(ML_DIR)
+
+    if not only:
+        # index global multilingue (repli de /reco/similar?widen=true)
+        n = build_index(df, staging / INDEX_NAME, staging / VECT_NAME, ENGLISH_STOP_WORDS | FRENCH_STOP_WORDS, **matrix_opts)
+        stats["livres_indexes"] = n
+        print(f"Livres indexés: {n}")
+
+    if not skip_partitions:
+        stats["partitions"] = build_partitions(df, staging, by_category=by_category, only=only, **matrix_opts)
+
+    version = publish_release(ML_DIR, staging, stats={"tfidf": stats}, source="train_reco_content.py")
+    print(f"✅ Version publiée : {version} (ml/releases/{version})")
 
 
 if __name__ == "__main__":
-    build_and_save()
+    parser = argparse.ArgumentParser(description="Construit l'index TF-IDF des livres (global + partitions).")
+    parser.add_argument("--by-category", action="store_true",
+                        help="ajoute des sous-index langue + catégorie")
+    parser.add_argument("--only", action="append", metavar="CLE",
+                        help="reconstruit uniquement cette partition (ex: fr, fr__fiction) ; répétable")
+    parser.add_argument("--skip-partitions", action="store_true",
+                        help="ne construit que l'index global")
+    parser.add_argument("--dtype", choices=["float64", "float32"], default="float64",
+                        help="précision de la matrice servie (float32 = moitié de mémoire pour data)")
+    parser.add_argument("--top-terms", type=int, default=None, metavar="M",
+                        help="ne garde que les M termes les plus lourds par livre")
+    parser.add_argument("--tradeoff-report", action="store_true",
+                        help="affiche mémoire / dérive top-10 pour plusieurs variantes, sans rien sauvegarder")
+    parser.add_argument("--snapshot", nargs="?", const="latest", metavar="ID",
+                        help="lit un snapshot local (scripts.training_snapshot) au lieu de MariaDB ; "
+                             "sans ID : le dernier")
+    args = parser.parse_args()
+
+    if args.tradeoff_report:
+        books = load_books(args.snapshot)
+        if books.empty:
+            raise SystemExit("Aucun livre trouvé en base (table Livre vide).")
+        tradeoff_report(books)
+    else:
+        build_and_save(
+            by_category=args.by_category,
+            only=args.only,
+            skip_partitions=args.skip_partitions,
+            dtype=args.dtype,
+            top_terms=args.top_terms,
+            snapshot=args.snapshot,
+        )